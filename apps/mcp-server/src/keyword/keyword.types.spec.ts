@@ -1,12 +1,22 @@
 import { describe, it, expect } from 'vitest';
+import { readFileSync } from 'fs';
+import * as path from 'path';
 import {
   isValidLanguageCode,
+  KEYWORDS,
+  LOCALIZED_KEYWORD_MAP,
   SUPPORTED_LANGUAGE_CODES,
   SUPPORTED_LANGUAGES,
   DEFAULT_LANGUAGE_CODE,
+  type KeywordModesConfig,
   type SupportedLanguageCode,
 } from './keyword.types';
 
+const KEYWORD_MODES_FILE = path.resolve(
+  __dirname,
+  '../../../../packages/rules/.ai-rules/keyword-modes.json',
+);
+
 describe('keyword.types', () => {
   describe('isValidLanguageCode', () => {
     describe('valid language codes', () => {
@@ -88,4 +98,28 @@ describe('keyword.types', () => {
       expect(DEFAULT_LANGUAGE_CODE).toBe(SUPPORTED_LANGUAGE_CODES[0]);
     });
   });
+
+  describe('keyword parity with keyword-modes.json', () => {
+    // The plugin's mode hook detects the "keywords" of keyword-modes.json;
+    // parse_mode must resolve exactly the same keywords to the same modes.
+    const config = JSON.parse(
+      readFileSync(KEYWORD_MODES_FILE, 'utf-8'),
+    ) as KeywordModesConfig;
+
+    it('lists every mode of KEYWORDS', () => {
+      expect(Object.keys(config.modes).sort()).toEqual([...KEYWORDS].sort());
+    });
+
+    it('matches English keywords and LOCALIZED_KEYWORD_MAP', () => {
+      const localized: Record<string, string> = {};
+      for (const [mode, modeConfig] of Object.entries(config.modes)) {
+        for (const keyword of modeConfig.keywords ?? []) {
+          if (keyword.toUpperCase() === mode) continue;
+          localized[keyword] = mode;
+        }
+        expect(modeConfig.keywords).toContain(mode);
+      }
+      expect(localized).toEqual(LOCALIZED_KEYWORD_MAP);
+    });
+  });
 });
@@ -111,7 +111,13 @@ export const ACT_AGENT_DISPLAY_INFO: Record<ActPrimaryAgent, AgentDisplayInfo> =
     },
   };
 
-/** Localized keywords mapped to their English equivalents */
+/**
+ * Localized keywords mapped to their English equivalents.
+ *
+ * Must match the "keywords" lists in packages/rules/.ai-rules/keyword-modes.json,
+ * which the plugin's mode hook (packages/claude-code-plugin) detects;
+ * keyword.types.spec.ts fails when they drift apart.
+ */
 export const LOCALIZED_KEYWORD_MAP: Record<string, Mode> = {
   // Korean (한국어)
   계획: 'PLAN',
@@ -419,6 +425,8 @@ export interface ParseModeResult {
 }
 
 export interface ModeConfig {
+  /** Prompt keywords (all locales) detected by the plugin's mode hook */
+  keywords?: string[];
   description: string;
   instructions: string;
   rules: string[];
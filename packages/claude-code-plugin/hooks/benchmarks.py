@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the CodingBuddy hooks (stdlib only).
+
+Run with:
+    python3 benchmarks.py [benchmark ...]             # print JSON results
+    python3 benchmarks.py --save baseline.json        # store a baseline
+    python3 benchmarks.py --compare baseline.json     # exit 1 on regression
+
+--quick uses smaller inputs (up to 1 MB prompts, 100 cached versions).
+A metric regresses when its median is more than --tolerance (relative)
+and --min-delta-ms (absolute) slower than the baseline median.
+"""
+
+import io
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from unittest.mock import patch
+
+from codingbuddy_hooks import budget, install_stamp, mode_detect, session_start, session_state
+
+HOOKS_DIR = Path(__file__).parent
+
+BASELINE_FORMAT = 1
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_DELTA_MS = 0.5
+
+# Prompt heads per language, plus one that never matches
+PROMPT_HEADS = {
+    "en": "PLAN: design the login form ",
+    "ko": "계획: 로그인 폼 설계 ",
+    "ja": "計画：ログインフォームを設計 ",
+    "zh": "计划: 设计登录表单 ",
+    "es": "PLANIFICAR: diseñar el formulario ",
+    "fullwidth": "ＰＬＡＮ：ログイン ",
+    "nomatch": "Please look at this stack trace ",
+}
+
+Metrics = Dict[str, Dict[str, float]]
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Time repeated calls of func and summarize in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "max_ms": round(max(samples), 4),
+    }
+
+
+def _size_label(size: int) -> str:
+    for unit, factor in (("MB", 1 << 20), ("KB", 1 << 10)):
+        if size >= factor:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def _make_prompt(head: str, size: int) -> str:
+    """Build a prompt of about size UTF-8 bytes starting with head."""
+    filler = "log line: value=42 status=ok\n"
+    text = head + filler * (max(size - len(head.encode("utf-8")), 0) // len(filler) + 1)
+    return text.encode("utf-8")[:max(size, 1)].decode("utf-8", "ignore")
+
+
+def bench_detect_mode(quick: bool = False) -> Metrics:
+    """
+    detect_mode() and full payload handling for multilingual prompts.
+
+    detect_mode/<lang>/<size> times detection on an in-memory prompt;
+    process_input/<size> includes streaming the JSON payload.
+    """
+    hook = mode_detect
+    sizes = [10, 1 << 10, 100 << 10, 1 << 20] + ([] if quick else [50 << 20])
+    results: Metrics = {}
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            patch.dict(os.environ, {session_state.STORE_ENV: os.path.join(tmpdir, "sessions.map")}):
+        for size in sizes:
+            for lang, head in PROMPT_HEADS.items():
+                prompt = _make_prompt(head, size)
+                results[f"detect_mode/{lang}/{_size_label(size)}"] = measure(
+                    lambda: hook.detect_mode(prompt), 200
+                )
+            payload = json.dumps({"prompt": _make_prompt(PROMPT_HEADS["ko"], size), "session_id": "x"})
+            repeat = 3 if size >= (10 << 20) else 20
+            results[f"process_input/{_size_label(size)}"] = measure(
+                lambda: hook.process_input(io.StringIO(payload)), repeat
+            )
+    return results
+
+
+def bench_hook_subprocess(quick: bool = False) -> Metrics:
+    """
+    The user-prompt-submit.py hook as Claude Code runs it (python3 -I -S).
+
+    cold runs use an empty bytecode cache (-X pycache_prefix), so every
+    import is compiled from source; warm runs reuse the normal caches.
+    """
+    hook_path = str(HOOKS_DIR / "user-prompt-submit.py")
+    payload = json.dumps({"prompt": "PLAN: design the login form"})
+    repeat = 5 if quick else 20
+
+    def run(env: Dict[str, str], *args: str) -> None:
+        subprocess.run(
+            [sys.executable, "-I", "-S", *args, hook_path], input=payload, capture_output=True, text=True, env=env
+        )
+
+    # -I ignores PYTHON* variables, so warm runs always populate the cache
+    env = {**os.environ, "CODINGBUDDY_LATENCY": "0"}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prefixes = itertools.count()
+
+        def cold() -> None:
+            run(env, "-X", f"pycache_prefix={os.path.join(tmpdir, str(next(prefixes)))}")
+
+        cold_result = measure(cold, repeat)
+    run(env)
+    return {
+        "hook/cold": cold_result,
+        "hook/warm": measure(lambda: run(env), repeat),
+    }
+
+
+def _add_version(root: Path, name: str, source_filename: str, package: bool = False) -> None:
+    """
+    Add a cached plugin version under root.
+
+    Discovery only looks at the launcher; with package set the version
+    also ships this tree's hook package and support files, so it can be
+    installed.
+    """
+    hooks_dir = root / name / "hooks"
+    hooks_dir.mkdir(parents=True)
+    if not package:
+        (hooks_dir / source_filename).write_text('HOOK_VERSION = "0.0.0"\n')
+        return
+    shutil.copyfile(HOOKS_DIR / source_filename, hooks_dir / source_filename)
+    package_dir = hooks_dir / install_stamp.PACKAGE_NAME
+    package_dir.mkdir()
+    for module in install_stamp.HOOK_PACKAGE_MODULES:
+        shutil.copyfile(HOOKS_DIR / install_stamp.PACKAGE_NAME / module, package_dir / module)
+    for support in install_stamp.SUPPORT_FILENAMES:
+        if (HOOKS_DIR / support).exists():
+            shutil.copyfile(HOOKS_DIR / support, hooks_dir / support)
+
+
+def _write_settings(settings_file: Path, size: int, hook_command: str) -> None:
+    """Write a settings.json of about size bytes with the hook registered."""
+    settings = {
+        "hooks": {"UserPromptSubmit": [{"hooks": [{"type": "command", "command": hook_command}]}]},
+        "permissions": {"allow": []},
+    }
+    base = len(json.dumps(settings, indent=2))
+    entry = "Bash(npm run test:*)"
+    count = max(size - base, 0) // (len(entry) + 8)
+    settings["permissions"]["allow"] = [entry] * count
+    settings_file.parent.mkdir(parents=True, exist_ok=True)
+    settings_file.write_text(json.dumps(settings, indent=2))
+
+
+@contextmanager
+def _session_start_home(session_hook, versions: int, settings_size: int) -> Iterator[Path]:
+    """A temporary home with cached plugin versions and a settings.json."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        home = Path(tmpdir)
+        root = home / session_hook.PLUGIN_CACHE_PATHS[0]
+        # Only the newest version is installed, so only it ships the package
+        for i in range(versions):
+            _add_version(root, f"1.{i // 100}.{i % 100}", session_hook.SOURCE_FILENAME, package=i == versions - 1)
+        _write_settings(home / ".claude" / "settings.json", settings_size, session_hook.HOOK_COMMAND)
+        env = {
+            "CLAUDE_PLUGIN_DIR": "",
+            install_stamp.HOOK_MODE_ENV: session_hook.HOOK_MODE_CLASSIC,
+            # Garbage collection would delete the cached versions under test
+            session_hook.CACHE_RETENTION_ENV: "0",
+            "CODINGBUDDY_LATENCY": "0",
+            # Measure the whole install, not what fits in the budget
+            budget.BUDGET_ENVS["session-start"]: "0",
+        }
+        with open(os.devnull, "w") as devnull, patch.dict(os.environ, env), \
+                patch.object(Path, "home", return_value=home), patch("sys.stdout", new=devnull):
+            yield home
+
+
+def _run_session_start(session_hook) -> None:
+    """Run session_start.main() once and fail unless it left a current install."""
+    try:
+        session_hook.main()
+    except SystemExit:
+        pass
+    hooks_dir = Path.home() / ".claude" / "hooks"
+    for name in (session_hook.STAMP_FILENAME, session_hook.HOOK_FILENAME):
+        if not (hooks_dir / name).exists():
+            raise RuntimeError(f"session_start did not install {name}")
+
+
+def bench_session_start(quick: bool = False) -> Metrics:
+    """
+    session_start.main() in-process, fast path and slow path.
+
+    The fast path finds a current install stamp. The slow path removes
+    the stamp and discovery caches first, so it rescans the plugin cache,
+    checks the installed files and re-reads settings.json under the lock.
+    """
+    session_hook = session_start
+    settings_sizes = [1 << 10, 100 << 10, 1 << 20, 5 << 20]
+    version_counts = [1, 10, 100] + ([] if quick else [1000])
+    cases: List[Tuple[int, int]] = [(1, size) for size in settings_sizes]
+    cases += [(versions, 1 << 10) for versions in version_counts if versions != 1]
+    repeat = 5 if quick else 20
+
+    results: Metrics = {}
+    for versions, settings_size in cases:
+        label = f"versions={versions},settings={_size_label(settings_size)}"
+        with _session_start_home(session_hook, versions, settings_size) as home:
+            hooks_dir = home / ".claude" / "hooks"
+
+            def slow() -> None:
+                for name in (session_hook.STAMP_FILENAME, session_hook.SOURCE_CACHE_FILENAME,
+                             session_hook.VERSION_INDEX_FILENAME):
+                    try:
+                        (hooks_dir / name).unlink()
+                    except FileNotFoundError:
+                        pass
+                _run_session_start(session_hook)
+
+            results[f"session_start/slow/{label}"] = measure(slow, repeat)
+            _run_session_start(session_hook)
+            results[f"session_start/fast/{label}"] = measure(
+                lambda: _run_session_start(session_hook), repeat
+            )
+    return results
+
+
+def bench_version_discovery(quick: bool = False) -> Metrics:
+    """
+    Plugin source discovery over a cache root with many version directories.
+
+    Compares a full scan (no index), a lookup through an up-to-date
+    version index, and an incremental rescan after one new release.
+    """
+    session_hook = session_start
+    versions = 100 if quick else 1000
+    repeat = 20
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        home = Path(tmpdir)
+        root = home / session_hook.PLUGIN_CACHE_PATHS[0]
+
+        for i in range(versions):
+            _add_version(root, f"1.{i // 100}.{i % 100}", session_hook.SOURCE_FILENAME)
+
+        full_scan = measure(lambda: session_hook._find_source_from_cache(home), repeat)
+
+        index: Dict = {}
+        session_hook._find_source_from_cache(home, index)
+        indexed = measure(lambda: session_hook._find_source_from_cache(home, index), repeat)
+
+        releases = itertools.count()
+
+        def incremental() -> None:
+            # Includes creating the new release directory
+            _add_version(root, f"2.0.{next(releases)}", session_hook.SOURCE_FILENAME)
+            session_hook._find_source_from_cache(home, index)
+
+        incremental_result = measure(incremental, repeat)
+
+    return {
+        f"full_scan/{versions}": full_scan,
+        f"indexed/{versions}": indexed,
+        f"incremental_rescan/{versions}": incremental_result,
+    }
+
+
+def bench_session_state(quick: bool = False) -> Metrics:
+    """
+    Session store lookups and updates in a full table.
+
+    Every slot is taken first, so follow-up updates probe a full window
+    and new sessions evict the least recently updated entry.
+    """
+    repeat = 200 if quick else 2000
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = session_state.SessionStore(os.path.join(tmpdir, "sessions.map"))
+        for i in range(store.slots * 2):
+            store.update(f"{i:08x}-0000-4000-8000-000000000000", "PLAN")
+        session_id = f"{store.slots * 2 - 1:08x}-0000-4000-8000-000000000000"
+        sessions = itertools.count()
+
+        return {
+            "lookup": measure(lambda: store.lookup(session_id), repeat),
+            "follow_up": measure(lambda: store.update(session_id, None), repeat),
+            "new_session": measure(
+                lambda: store.update(f"new-{next(sessions)}", "ACT"), repeat
+            ),
+        }
+
+
+# Words of synthetic skill descriptions, on top of the shipped ones
+SKILL_WORDS = (
+    "cache queue stream batch schema index shard replica lock retry timeout budget token prompt "
+    "render layout route form auth session cookie payment invoice report export import upload "
+    "search filter sort page scroll image video audio chart metric trace alert deploy rollback "
+    "release branch merge review lint format test mock fixture snapshot coverage profile memory"
+).split()
+
+
+def synthetic_skills(count: int, seed: int = 0) -> Dict[str, str]:
+    """Return count skill descriptions in the style of the shipped SKILL.md files."""
+    import random
+
+    rng = random.Random(seed)
+    skills = {}
+    for i in range(count):
+        words = rng.sample(SKILL_WORDS, 8)
+        skills[f"custom-{words[0]}-{i}"] = (
+            f"Use when working on {words[0]} {words[1]} or {words[2]} - covers {', '.join(words[3:])}"
+        )
+    return skills
+
+
+def bench_skill_match(quick: bool = False) -> Metrics:
+    """
+    Skill index loading and prompt matching for growing skill counts.
+
+    load/<n> parses the index as the hook does once per process;
+    match/<n> scores a prompt against every skill; total/<n> is both, the
+    figure skill_index.MATCH_BUDGET_MS bounds up to BUDGET_SKILLS skills.
+    cold/<lang>/<n> adds what the first prompt of a hook process pays on
+    top: executing the module's bytecode, as installed precompiled, and
+    compiling its patterns (the regex cache is purged before every sample).
+    """
+    import re
+
+    from codingbuddy_hooks import skill_index
+
+    prompt = "design the payment invoice export with retry and timeout handling, add tests " * 4
+    cold_prompts = {"en": prompt, "ko": "결제 인보이스 내보내기 설계, 재시도와 타임아웃 처리 " * 4}
+    counts = [15, 100, skill_index.BUDGET_SKILLS] + ([] if quick else [2000])
+    repeat = 50 if quick else 200
+    results: Metrics = {}
+    for count in counts:
+        data = skill_index.build_skill_index(synthetic_skills(count))
+        index = skill_index.SkillIndex(data)
+        results[f"load/{count}"] = measure(lambda: skill_index.SkillIndex(data), repeat)
+        results[f"match/{count}"] = measure(lambda: index.suggest(prompt), repeat)
+        results[f"total/{count}"] = measure(lambda: skill_index.SkillIndex(data).suggest(prompt), repeat)
+    data = skill_index.build_skill_index(synthetic_skills(skill_index.BUDGET_SKILLS))
+    code = skill_index.__spec__.loader.get_code(skill_index.__name__)
+    for lang, cold_prompt in cold_prompts.items():
+
+        def cold() -> None:
+            re.purge()
+            module: Dict[str, object] = {"__name__": skill_index.__name__, "__package__": skill_index.__package__}
+            exec(code, module)
+            module["SkillIndex"](data).suggest(cold_prompt)
+
+        results[f"cold/{lang}/{skill_index.BUDGET_SKILLS}"] = measure(cold, repeat)
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[..., Metrics]] = {
+    "detect_mode": bench_detect_mode,
+    "hook_subprocess": bench_hook_subprocess,
+    "session_start": bench_session_start,
+    "session_state": bench_session_state,
+    "skill_match": bench_skill_match,
+    "version_discovery": bench_version_discovery,
+}
+
+
+def compare_results(
+    baseline: Dict[str, Metrics],
+    current: Dict[str, Metrics],
+    tolerance: float = DEFAULT_TOLERANCE,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+) -> List[str]:
+    """
+    Compare median timings against a baseline.
+
+    Metrics missing from either side are skipped.
+
+    Returns:
+        One message per regressed metric (empty if none regressed)
+    """
+    regressions = []
+    for bench, metrics in sorted(current.items()):
+        for metric, result in sorted(metrics.items()):
+            base = baseline.get(bench, {}).get(metric)
+            if base is None:
+                continue
+            before, after = base["median_ms"], result["median_ms"]
+            if after > before * (1 + tolerance) and after - before > min_delta_ms:
+                regressions.append(
+                    f"{bench}/{metric}: {before:.3f} ms -> {after:.3f} ms "
+                    f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)"
+                )
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Metrics]:
+    """Load baseline results written by --save."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != BASELINE_FORMAT:
+        raise ValueError(f"{path}: unsupported baseline format {data.get('format')!r}")
+    return data["results"]
+
+
+def save_baseline(path: str, results: Dict[str, Metrics], quick: bool) -> None:
+    """Store results together with the environment they were measured in."""
+    data = {
+        "format": BASELINE_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "results": results,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the selected (default: all) benchmarks. Returns the exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the CodingBuddy hooks")
+    parser.add_argument("benchmarks", nargs="*", help=f"Subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="Use smaller inputs")
+    parser.add_argument("--save", metavar="FILE", help="Store results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="Fail if slower than this baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown (default: %(default)s)")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="Ignore slowdowns below this many ms (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    names = args.benchmarks or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    results = {name: BENCHMARKS[name](quick=args.quick) for name in names}
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        save_baseline(args.save, results, args.quick)
+    if baseline is not None:
+        regressions = compare_results(baseline, results, args.tolerance, args.min_delta_ms)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
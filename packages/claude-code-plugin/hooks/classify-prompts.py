@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+CodingBuddy Prompt Corpus Classifier
+
+Counts PLAN/ACT/EVAL/AUTO usage in JSONL prompt files and Claude Code
+transcripts with the hook's own matcher; see codingbuddy_hooks/batch.py.
+
+Usage:
+    python3 hooks/classify-prompts.py ~/.claude/projects
+    python3 hooks/classify-prompts.py --json --jobs 8 prompts/*.jsonl
+"""
+
+import os
+import sys
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from codingbuddy_hooks import batch
+
+    sys.exit(batch.main())
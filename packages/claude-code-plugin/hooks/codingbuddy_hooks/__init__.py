@@ -0,0 +1,58 @@
+"""
+CodingBuddy hook package.
+
+The hook logic lives here as importable modules so Python can cache its
+bytecode; the scripts Claude Code runs (session-start.py and the installed
+~/.claude/hooks/codingbuddy-mode-detect.py) are minimal launchers.
+
+    mode_detect      UserPromptSubmit mode detection (and resident daemon)
+    agent_index      Primary agent recommendation from an inverted index
+    skill_index      Skill suggestions from a TF-IDF matrix
+    checklist_index  EVAL checklist item pre-selection
+    tokenizer        Stemming and CJK bigrams shared by the indexes
+    session_state    Per-session active mode store
+    budget           Per-run latency budget and hard stop
+    session_start    SessionStart installer
+    install_stamp    Install stamp check, the session-start fast path
+    doctor           session-start --doctor report
+    batch            Offline batch classifier (classify-prompts.py)
+    latency          Phase latency ring buffer and report CLI
+    profiling        Opt-in CODINGBUDDY_PROFILE support
+
+Importing the package itself must stay cheap: the launchers import it on
+every hook run.
+"""
+
+import os
+import sys
+
+# (kept in sync with the plugin version by scripts/sync-version.js)
+HOOK_VERSION = "3.1.0"
+
+# Latency recording switch (see latency.py)
+LATENCY_ENV = "CODINGBUDDY_LATENCY"
+
+# Session mode store switch (see session_state.py)
+SESSION_STATE_ENV = "CODINGBUDDY_SESSION_STATE"
+
+
+def latency_enabled() -> bool:
+    """Check CODINGBUDDY_LATENCY without importing the latency recorder."""
+    return os.environ.get(LATENCY_ENV, "1").lower() not in ("0", "false", "off")
+
+
+def session_state_enabled() -> bool:
+    """Check CODINGBUDDY_SESSION_STATE without importing the session store."""
+    return os.environ.get(SESSION_STATE_ENV, "1").lower() not in ("0", "false", "off")
+
+
+def interpreter_args() -> list:
+    """Return the interpreter flags to re-exec this process with (-I, -S)."""
+    args = []
+    if sys.flags.isolated:
+        args.append("-I")
+    elif sys.flags.no_user_site:
+        args.append("-s")
+    if sys.flags.no_site:
+        args.append("-S")
+    return args
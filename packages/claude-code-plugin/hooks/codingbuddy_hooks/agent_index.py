@@ -0,0 +1,180 @@
+"""
+CodingBuddy Agent Pre-Resolver
+
+Recommends a primary agent (backend-developer, data-engineer, ...) for a
+prompt with a detected mode, so the common case needs no round trip to
+the MCP server's primary-agent resolver.
+
+compile-rules-bundle.py builds an inverted index from the primary agents
+in packages/rules/.ai-rules/agents/*.json (role.type "primary"): the
+terms of each agent's name, title, description, expertise,
+responsibilities and supported_* lists, each weighted by its inverse
+document frequency across the agents. The index is stored in the rules
+bundle and parsed on the first detected mode.
+
+A prompt scores, per agent, the summed weight of its distinct terms that
+the agent lists. The best agent is recommended when it scores at least
+MIN_SCORE and strictly more than the runner-up; otherwise the mode's
+default (DELEGATES_TO) stands. Terms are lowercase words; runs of Han,
+kana and Hangul are split into character bigrams (tokenizer.py), so
+agents described in Korean, Japanese or Chinese match prompts written
+in those languages.
+
+Index layout (JSON):
+    {"agents": [name, ...], "terms": {term: [weight * 1000, agent, ...]}}
+"""
+
+from __future__ import annotations
+
+import math
+import re
+
+from .tokenizer import cjk_bigrams, stem
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+INDEX_FORMAT = 1
+
+# Lowercase words; keeps node.js, c++ and c# whole
+TERM_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+# Words that say nothing about which agent fits
+STOPWORDS = frozenset("""
+    a an and are as at be by can for from in into is it its of on or the this that to with
+    your you our we not all any each other etc e.g i.e via using use used
+    agent agents senior specialist expert primary support supports supported including
+    mode modes planning implementation evaluation plan review verification
+    see md project note
+""".split())
+
+# Minimum summed term weight for a recommendation (ln 11 for a term only
+# one of 11 agents lists, ln 11/3 ~ 1.3 for a term three of them list)
+MIN_SCORE = 1.0
+
+RECOMMENDATION_TEMPLATE = """<codingbuddy-primary-agent>
+SUGGESTED_PRIMARY_AGENT: {agent}
+MATCHED_TERMS: {terms}
+A local match of the prompt against the agents' expertise, not a parse_mode result.
+Consider this agent over DELEGATES_TO; the user's choice and parse_mode's resolved agent take precedence.
+</codingbuddy-primary-agent>"""
+
+
+def terms(text: str) -> Set[str]:
+    """Return the distinct index terms of a text."""
+    result = set()
+    text = text.lower()
+    for word in TERM_PATTERN.findall(text):
+        word = word.rstrip(".")
+        if len(word) > 1 and word not in STOPWORDS:
+            result.add(stem(word))
+    if not text.isascii():
+        result.update(cjk_bigrams(text))
+    return result
+
+
+def _strings(value: object) -> Iterable[str]:
+    """Yield every string in a JSON value, skipping "note" entries."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if key != "note":
+                yield from _strings(item)
+
+
+def agent_terms(name: str, agent: dict) -> Set[str]:
+    """Return the index terms of one agent definition."""
+    role = agent.get("role") if isinstance(agent.get("role"), dict) else {}
+    texts = [name.replace("-", " "), agent.get("description", "")]
+    texts.extend(_strings(role.get("title", "")))
+    texts.extend(_strings(role.get("expertise", [])))
+    texts.extend(_strings(role.get("responsibilities", [])))
+    for key, value in role.items():
+        if key.startswith("supported_"):
+            texts.extend(_strings(value))
+    result: Set[str] = set()
+    for text in texts:
+        if isinstance(text, str):
+            result |= terms(text)
+    return result
+
+
+def build_index(agents: Dict[str, dict]) -> dict:
+    """
+    Build the inverted index of the primary agents among agents.
+
+    Args:
+        agents: Agent definitions by name (the agent file's stem)
+
+    Returns:
+        Index in the layout described in the module docstring. Terms every
+        agent lists carry no weight and are left out.
+    """
+    names = sorted(
+        name for name, agent in agents.items()
+        if isinstance(agent.get("role"), dict) and agent["role"].get("type") == "primary"
+    )
+    postings: Dict[str, List[int]] = {}
+    for position, name in enumerate(names):
+        for term in agent_terms(name, agents[name]):
+            postings.setdefault(term, []).append(position)
+    index_terms = {}
+    for term in sorted(postings):
+        weight = round(math.log(len(names) / len(postings[term])) * 1000)
+        if weight > 0:
+            index_terms[term] = [weight, *postings[term]]
+    return {"format": INDEX_FORMAT, "agents": names, "terms": index_terms}
+
+
+class AgentIndex:
+    """Scores prompts against a built index."""
+
+    def __init__(self, data: dict):
+        """
+        Raises:
+            ValueError: If data is not an index of this format
+        """
+        if not isinstance(data, dict) or data.get("format") != INDEX_FORMAT:
+            raise ValueError("not an agent index of this format")
+        agents, index_terms = data.get("agents"), data.get("terms")
+        if not isinstance(agents, list) or not isinstance(index_terms, dict):
+            raise ValueError("incomplete agent index")
+        self.agents: List[str] = agents
+        self._terms: Dict[str, list] = index_terms
+
+    def scores(self, prompt: str) -> Dict[str, Tuple[float, List[str]]]:
+        """Return (score, matched terms) per agent that matches the prompt."""
+        totals: Dict[int, float] = {}
+        matched: Dict[int, List[str]] = {}
+        for term in sorted(terms(prompt)):
+            posting = self._terms.get(term)
+            if not posting:
+                continue
+            weight = posting[0] / 1000
+            for position in posting[1:]:
+                totals[position] = totals.get(position, 0.0) + weight
+                matched.setdefault(position, []).append(term)
+        return {self.agents[position]: (total, matched[position]) for position, total in totals.items()}
+
+    def recommend(self, prompt: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        Return (agent, matched terms) for the clearly best-matching agent,
+        or None if no agent scores MIN_SCORE or the top score is tied.
+        """
+        ranked = sorted(self.scores(prompt).items(), key=lambda item: item[1][0], reverse=True)
+        if not ranked or ranked[0][1][0] < MIN_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[1][1][0] >= ranked[0][1][0]:
+            return None
+        agent, (_, matched) = ranked[0]
+        return agent, matched
+
+
+def render_recommendation(agent: str, matched: List[str]) -> str:
+    """Render the block appended to the mode context."""
+    return RECOMMENDATION_TEMPLATE.format(agent=agent, terms=", ".join(matched))
@@ -0,0 +1,452 @@
+"""
+CodingBuddy Batch Mode Classifier
+
+Classifies prompt corpora offline with the matcher the UserPromptSubmit
+hook uses (mode_detect.match_keyword()), to audit how PLAN/ACT/EVAL/AUTO
+are used across teams.
+
+Inputs are JSONL files, or directories searched recursively for *.jsonl:
+- prompt files: one object per line with a "prompt" string (the hook
+  payload format)
+- Claude Code transcripts (~/.claude/projects/*/*.jsonl): user messages
+  with text content; tool results and meta messages are ignored
+
+Files are split into byte-range shards that a process pool classifies
+independently; a shard owns every line that starts inside its range.
+Lines are read one at a time and capped at max_line_bytes (longer lines
+are skipped and counted), and per-shard results are counters of bounded
+size, so memory stays flat however large the corpus is.
+
+The report counts prompts per mode, per mode and language, and per mode
+and keyword, and lists the prompts that most often almost matched:
+    marked  the first word is a keyword wrapped in markup ("**PLAN**:")
+    bare    the prompt is only a keyword, with nothing after it ("PLAN")
+    typo    the first word is one edit away from a keyword ("PALN:")
+    late    a keyword followed by a colon appears after the first word
+
+Usage:
+    python3 hooks/classify-prompts.py ~/.claude/projects
+    python3 hooks/classify-prompts.py --json --jobs 8 prompts/*.jsonl
+"""
+
+import json
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .mode_detect import DETECT_WINDOW, MODE_KEYWORDS, get_keyword_table, match_keyword, normalize_keyword
+
+# Language of each position in the MODE_KEYWORDS tuples; keywords that
+# only exist in a rules bundle are reported as "other"
+KEYWORD_LANGUAGES = ("en", "ko", "ja", "zh", "es")
+OTHER_LANGUAGE = "other"
+NO_MODE = "none"
+
+DEFAULT_SHARD_BYTES = 64 << 20
+DEFAULT_MAX_LINE_BYTES = 8 << 20
+DEFAULT_TOP = 20
+# Distinct near-miss prompts tracked per shard (Space-Saving counter)
+NEAR_MISS_CAPACITY = 1000
+# Characters of a near-miss prompt kept in the report
+NEAR_MISS_CHARS = 80
+_READ_CHUNK = 1 << 20
+
+# Markup that wraps a keyword in "marked" near misses
+_MARKUP = "*_#>`~[](){}<>\"'-=|"
+
+Shard = Tuple[str, int, int]
+
+
+def keyword_languages() -> Dict[str, str]:
+    """Map each built-in normalized keyword to its language code."""
+    return {
+        normalize_keyword(keyword): KEYWORD_LANGUAGES[i]
+        for keywords in MODE_KEYWORDS.values()
+        for i, keyword in enumerate(keywords)
+    }
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Check whether a and b differ by one insertion, deletion, substitution or swap."""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        rest = a[i + 1:] == b[i + 1:]
+        swapped = a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1]
+        return rest or swapped
+    return a[i:] == b[i + 1:]
+
+
+def extract_prompt(entry: object) -> Optional[str]:
+    """
+    Return the user prompt of a prompt-file or transcript entry, or None.
+
+    Transcript user messages with list content contribute their text
+    parts; entries with only tool results carry no prompt.
+    """
+    if not isinstance(entry, dict):
+        return None
+    prompt = entry.get("prompt")
+    if isinstance(prompt, str):
+        return prompt
+    if entry.get("type") != "user" or entry.get("isMeta"):
+        return None
+    message = entry.get("message")
+    if not isinstance(message, dict):
+        return None
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        texts = [
+            part["text"] for part in content
+            if isinstance(part, dict) and part.get("type") == "text" and isinstance(part.get("text"), str)
+        ]
+        return "\n".join(texts) if texts else None
+    return None
+
+
+def new_counts() -> dict:
+    """Return empty classification counters."""
+    return {
+        "lines": 0,
+        "prompts": 0,
+        "skipped_lines": 0,
+        "modes": Counter(),
+        "languages": Counter(),
+        "keywords": Counter(),
+        "near_misses": Counter(),
+    }
+
+
+def _count_bounded(counter: Counter, key: tuple, capacity: int) -> None:
+    """Space-Saving update: a new key evicts the rarest one when full."""
+    if key in counter or len(counter) < capacity:
+        counter[key] += 1
+        return
+    victim = min(counter, key=counter.__getitem__)
+    counter[key] = counter.pop(victim) + 1
+
+
+def merge_counts(total: dict, part: dict, capacity: int = NEAR_MISS_CAPACITY) -> dict:
+    """Add part into total, keeping the near-miss counter bounded."""
+    for key in ("lines", "prompts", "skipped_lines"):
+        total[key] += part[key]
+    for key in ("modes", "languages", "keywords", "near_misses"):
+        total[key].update(part[key])
+    if len(total["near_misses"]) > capacity:
+        total["near_misses"] = Counter(dict(total["near_misses"].most_common(capacity)))
+    return total
+
+
+class Classifier:
+    """Accumulates mode counts and near misses for a stream of prompts."""
+
+    def __init__(self, keyword_table: Optional[Dict[str, str]] = None,
+                 near_miss_capacity: int = NEAR_MISS_CAPACITY):
+        self.keyword_table = get_keyword_table() if keyword_table is None else keyword_table
+        self.languages = keyword_languages()
+        self.near_miss_capacity = near_miss_capacity
+        keywords = sorted(self.keyword_table, key=len, reverse=True)
+        self._late = re.compile(
+            r"(?:^|[\s,.;!?])(" + "|".join(map(re.escape, keywords)) + r")\s*:"
+        ) if keywords else None
+        self.counts = new_counts()
+
+    def near_miss(self, prompt: str) -> Optional[Tuple[str, str]]:
+        """Return (reason, keyword) if an unmatched prompt almost matched."""
+        head = prompt[:DETECT_WINDOW]
+        if not head.isascii():
+            head = unicodedata.normalize("NFKC", head)
+        head = head.lower()
+        words = head.split(None, 1)
+        if not words:
+            return None
+        first = words[0]
+        stripped = first.strip(_MARKUP + ":")
+        if stripped in self.keyword_table:
+            if stripped == first.rstrip(":") and len(words) == 1:
+                return ("bare", stripped)
+            return ("marked", stripped)
+        token = first.rstrip(":")
+        if len(token) >= 3:
+            for keyword in self.keyword_table:
+                if len(keyword) >= 3 and _within_one_edit(token, keyword):
+                    return ("typo", keyword)
+        if self._late is not None and len(words) > 1:
+            match = self._late.search(words[1])
+            if match:
+                return ("late", match.group(1))
+        return None
+
+    def add(self, prompt: str) -> Optional[str]:
+        """Classify one prompt. Returns the detected mode or None."""
+        counts = self.counts
+        counts["prompts"] += 1
+        matched = match_keyword(prompt, self.keyword_table)
+        if matched is None:
+            counts["modes"][NO_MODE] += 1
+            miss = self.near_miss(prompt)
+            if miss is not None:
+                head = " ".join(prompt[:NEAR_MISS_CHARS * 2].split())[:NEAR_MISS_CHARS]
+                _count_bounded(counts["near_misses"], (*miss, head), self.near_miss_capacity)
+            return None
+        mode, keyword = matched
+        counts["modes"][mode] += 1
+        counts["languages"][(mode, self.languages.get(keyword, OTHER_LANGUAGE))] += 1
+        counts["keywords"][(mode, keyword)] += 1
+        return mode
+
+    def add_line(self, line: bytes) -> None:
+        """Classify the prompt on one JSONL line, if it has one."""
+        self.counts["lines"] += 1
+        # Cheap filter: transcripts are mostly assistant and tool lines
+        if b'"prompt"' not in line and b'"user"' not in line:
+            return
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            self.counts["skipped_lines"] += 1
+            return
+        prompt = extract_prompt(entry)
+        if prompt is not None:
+            self.add(prompt)
+
+
+def iter_input_files(inputs: Iterable[str]) -> Iterator[str]:
+    """Yield JSONL files: files as given, directories searched for *.jsonl."""
+    for path in inputs:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".jsonl"):
+                    yield os.path.join(root, name)
+
+
+def plan_shards(files: Iterable[str], shard_bytes: int = DEFAULT_SHARD_BYTES) -> List[Shard]:
+    """Split files into (path, start, end) byte ranges of about shard_bytes."""
+    if shard_bytes <= 0:
+        raise ValueError("shard_bytes must be positive")
+    shards = []
+    for path in files:
+        size = os.path.getsize(path)
+        for start in range(0, max(size, 1), shard_bytes):
+            shards.append((path, start, min(start + shard_bytes, size)))
+    return shards
+
+
+def _skip_line(f) -> int:
+    """Consume the rest of the current line. Returns the bytes consumed."""
+    skipped = 0
+    while True:
+        chunk = f.readline(_READ_CHUNK)
+        skipped += len(chunk)
+        if not chunk or chunk.endswith(b"\n"):
+            return skipped
+
+
+def iter_shard_lines(shard: Shard, max_line_bytes: int = DEFAULT_MAX_LINE_BYTES) -> Iterator[Optional[bytes]]:
+    """
+    Yield the lines that start inside a shard's byte range.
+
+    A line longer than max_line_bytes is skipped without being held in
+    memory and yields None.
+    """
+    path, start, end = shard
+    with open(path, "rb") as f:
+        pos = start
+        if start:
+            # The line running into start belongs to the previous shard
+            f.seek(start - 1)
+            pos += _skip_line(f) - 1
+        while pos < end:
+            line = f.readline(max_line_bytes + 1)
+            if not line:
+                return
+            pos += len(line)
+            if len(line) > max_line_bytes and not line.endswith(b"\n"):
+                pos += _skip_line(f)
+                yield None
+                continue
+            yield line
+
+
+# Per-process classifier settings (set by _init_worker)
+_worker_settings: dict = {}
+
+
+def _init_worker(keyword_table: Dict[str, str], max_line_bytes: int, capacity: int) -> None:
+    _worker_settings.update(
+        keyword_table=keyword_table, max_line_bytes=max_line_bytes, capacity=capacity
+    )
+
+
+def classify_shard(shard: Shard) -> dict:
+    """Classify one shard with the settings from _init_worker()."""
+    classifier = Classifier(_worker_settings["keyword_table"], _worker_settings["capacity"])
+    for line in iter_shard_lines(shard, _worker_settings["max_line_bytes"]):
+        if line is None:
+            classifier.counts["lines"] += 1
+            classifier.counts["skipped_lines"] += 1
+        else:
+            classifier.add_line(line)
+    return classifier.counts
+
+
+def classify_paths(
+    inputs: Iterable[str],
+    jobs: Optional[int] = None,
+    shard_bytes: int = DEFAULT_SHARD_BYTES,
+    max_line_bytes: int = DEFAULT_MAX_LINE_BYTES,
+    keyword_table: Optional[Dict[str, str]] = None,
+    near_miss_capacity: int = NEAR_MISS_CAPACITY,
+) -> dict:
+    """
+    Classify every prompt in the given files and directories.
+
+    Args:
+        inputs: JSONL files and directories of them
+        jobs: Worker processes (default: CPU count; 1 runs in-process)
+        shard_bytes: Target size of the byte range handled by one task
+        max_line_bytes: Longer lines are skipped
+        keyword_table: Keyword lookup table (default: get_keyword_table())
+        near_miss_capacity: Distinct near-miss prompts tracked
+
+    Returns:
+        Merged counters (see new_counts()) plus "files", "shards" and "bytes"
+
+    Raises:
+        OSError: If an input cannot be read
+    """
+    files = list(iter_input_files(inputs))
+    shards = plan_shards(files, shard_bytes)
+    settings = (
+        get_keyword_table() if keyword_table is None else keyword_table,
+        max_line_bytes,
+        near_miss_capacity,
+    )
+    jobs = jobs or os.cpu_count() or 1
+
+    total = new_counts()
+    if jobs == 1 or len(shards) <= 1:
+        _init_worker(*settings)
+        for shard in shards:
+            merge_counts(total, classify_shard(shard), near_miss_capacity)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(shards)), initializer=_init_worker, initargs=settings
+        ) as executor:
+            for part in executor.map(classify_shard, shards):
+                merge_counts(total, part, near_miss_capacity)
+
+    total["files"] = len(files)
+    total["shards"] = len(shards)
+    total["bytes"] = sum(end - start for _, start, end in shards)
+    return total
+
+
+def build_report(counts: dict, top: int = DEFAULT_TOP) -> dict:
+    """Turn merged counters into a JSON-serializable report."""
+    languages: Dict[str, Dict[str, int]] = {}
+    for (mode, language), count in sorted(counts["languages"].items()):
+        languages.setdefault(mode, {})[language] = count
+    keywords: Dict[str, Dict[str, int]] = {}
+    for (mode, keyword), count in sorted(counts["keywords"].items()):
+        keywords.setdefault(mode, {})[keyword] = count
+    near_misses = [
+        {"prompt": head, "reason": reason, "keyword": keyword, "count": count}
+        for (reason, keyword, head), count in sorted(
+            counts["near_misses"].items(), key=lambda item: (-item[1], item[0])
+        )[:top]
+    ]
+    return {
+        "files": counts.get("files", 0),
+        "shards": counts.get("shards", 0),
+        "bytes": counts.get("bytes", 0),
+        "lines": counts["lines"],
+        "prompts": counts["prompts"],
+        "skipped_lines": counts["skipped_lines"],
+        "modes": dict(counts["modes"].most_common()),
+        "languages": languages,
+        "keywords": keywords,
+        "near_misses": near_misses,
+    }
+
+
+def format_report(report: dict) -> str:
+    """Format a report as a plain-text summary."""
+    prompts = report["prompts"]
+    lines = [
+        f"{prompts} prompts in {report['files']} files "
+        f"({report['lines']} lines, {report['skipped_lines']} skipped)",
+        "",
+        f"{'mode':<10} {'count':>9} {'share':>7}  languages / keywords",
+    ]
+    for mode, count in report["modes"].items():
+        share = f"{100 * count / prompts:.1f}%" if prompts else "-"
+        detail = ""
+        if mode in report["languages"]:
+            detail = " ".join(f"{k}={v}" for k, v in report["languages"][mode].items())
+            detail += "  | " + " ".join(f"{k}={v}" for k, v in report["keywords"][mode].items())
+        lines.append(f"{mode:<10} {count:>9} {share:>7}  {detail}".rstrip())
+    if report["near_misses"]:
+        lines += ["", "near misses:"]
+        for miss in report["near_misses"]:
+            lines.append(f"{miss['count']:>9}  {miss['reason']:<6} {miss['keyword']:<12} {miss['prompt']!r}")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns the process exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Classify prompt corpora by CodingBuddy mode")
+    parser.add_argument("inputs", nargs="+", help="JSONL files or directories (e.g. ~/.claude/projects)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPUs)")
+    parser.add_argument(
+        "--shard-mb", type=int, default=DEFAULT_SHARD_BYTES >> 20, help="Bytes per work unit, in MiB"
+    )
+    parser.add_argument(
+        "--max-line-mb", type=int, default=DEFAULT_MAX_LINE_BYTES >> 20, help="Longer lines are skipped, in MiB"
+    )
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Near misses to list")
+    parser.add_argument("--bundle", help="Rules bundle with the keyword table (default: installed one)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    keyword_table = None
+    if args.bundle:
+        from .mode_detect import RulesBundle
+
+        keyword_table = RulesBundle(args.bundle).keywords or None
+
+    try:
+        counts = classify_paths(
+            args.inputs,
+            jobs=args.jobs,
+            shard_bytes=args.shard_mb << 20,
+            max_line_bytes=args.max_line_mb << 20,
+            keyword_table=keyword_table,
+        )
+    except OSError as e:
+        print(f"classify-prompts: {e}", file=sys.stderr)
+        return 1
+    report = build_report(counts, args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        sys.stdout.write(format_report(report))
+    return 0
@@ -0,0 +1,174 @@
+"""
+CodingBuddy Hook Latency Budget
+
+Bounds how long a hook run may take, so a hook is never the reason a
+prompt or a session start feels slow (a hung NFS home directory can
+block a single stat() or resolve() for seconds).
+
+Each hook gets a deadline on the monotonic clock, measured from the
+start of main():
+
+    user-prompt-submit   30 ms   CODINGBUDDY_PROMPT_BUDGET_MS
+    session-start       200 ms   CODINGBUDDY_SESSION_BUDGET_MS
+
+Set a variable to 0 (or off) to remove that hook's deadline. Two checks
+enforce it:
+
+- Between phases, allows() reports whether the next optional phase may
+  still start; the hook skips it otherwise.
+- A one-shot SIGALRM timer at the deadline raises BudgetExceeded in the
+  main thread, out of whatever phase is still running. The hook arms it
+  where the work it can do without begins (mode detection: after the
+  keyword is detected) and disarms it before work that must not be cut
+  short (session start: before installing files). Without setitimer()
+  (Windows) or outside the main thread (the resident daemon's request
+  threads) only the checks between phases apply.
+
+BudgetExceeded derives from BaseException so the hooks' "except
+Exception" fallbacks do not swallow it; their atomic writers already
+clean up on BaseException. What a hook still does once the budget is
+spent is up to the hook: mode detection emits the basic mode context,
+session start hands the install to the background worker. Degraded runs
+are recorded in the latency ring as the "degraded" phase, whose
+duration is how far the run went past its deadline.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, Optional
+
+# Default deadline and the variable overriding it, per hook
+DEFAULT_BUDGETS_MS = {
+    "user-prompt-submit": 30.0,
+    "session-start": 200.0,
+}
+BUDGET_ENVS = {
+    "user-prompt-submit": "CODINGBUDDY_PROMPT_BUDGET_MS",
+    "session-start": "CODINGBUDDY_SESSION_BUDGET_MS",
+}
+
+
+class BudgetExceeded(BaseException):
+    """Raised by the hard stop when a hook run reaches its deadline."""
+
+
+def get_budget_ms(hook: str) -> Optional[float]:
+    """Return the hook's budget in milliseconds, or None if it has none."""
+    default = DEFAULT_BUDGETS_MS.get(hook)
+    if default is None:
+        return None
+    value = os.environ.get(BUDGET_ENVS[hook], "").strip().lower()
+    if not value:
+        return default
+    if value in ("0", "off", "false"):
+        return None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        return default
+    return budget_ms if budget_ms > 0 else None
+
+
+class Budget:
+    """
+    Deadline of one hook run.
+
+    Degradation is recorded, never raised, by allows(); only the hard
+    stop raises (BudgetExceeded).
+    """
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        # Optional phases skipped because the deadline had passed
+        self.skipped: List[str] = []
+        self.stopped = False
+        self._armed = False
+        self._previous_handler = None
+
+    def remaining(self) -> float:
+        """Return the seconds left until the deadline (never negative)."""
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def overrun(self) -> float:
+        """Return the seconds the run is past its deadline (never negative)."""
+        return max(time.monotonic() - self.deadline, 0.0)
+
+    @property
+    def degraded(self) -> bool:
+        """Whether the run skipped a phase or was stopped."""
+        return self.stopped or bool(self.skipped)
+
+    def allows(self, phase: str) -> bool:
+        """
+        Check whether an optional phase may still start.
+
+        Returns:
+            False, after recording the phase as skipped, once the
+            deadline has passed
+        """
+        if time.monotonic() < self.deadline:
+            return True
+        self.skipped.append(phase)
+        return False
+
+    def arm(self) -> bool:
+        """
+        Start the hard stop: SIGALRM at the deadline raises BudgetExceeded.
+
+        Returns:
+            False if the deadline has passed already or the platform or
+            thread cannot take the alarm
+        """
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        # _signal is the builtin behind signal, which would import enum
+        try:
+            import _signal
+        except ImportError:
+            return False
+        if not hasattr(_signal, "setitimer"):
+            return False
+
+        def _stop(signum, frame):
+            self.stopped = True
+            raise BudgetExceeded()
+
+        try:
+            self._previous_handler = _signal.signal(_signal.SIGALRM, _stop)
+        except ValueError:
+            # Not the main thread
+            return False
+        _signal.setitimer(_signal.ITIMER_REAL, remaining)
+        self._armed = True
+        return True
+
+    def disarm(self) -> None:
+        """Cancel the hard stop. Safe to call more than once."""
+        if not self._armed:
+            return
+        import _signal
+
+        _signal.setitimer(_signal.ITIMER_REAL, 0)
+        # None: the previous handler was not installed from Python
+        previous = self._previous_handler
+        _signal.signal(_signal.SIGALRM, _signal.SIG_DFL if previous is None else previous)
+        self._armed = False
+
+
+def start_budget(hook: str) -> Optional[Budget]:
+    """
+    Start the budget of a hook run; the hard stop is armed separately.
+
+    Returns:
+        The budget, or None if the hook has no deadline
+    """
+    budget_ms = get_budget_ms(hook)
+    if budget_ms is None:
+        return None
+    return Budget(budget_ms / 1000)
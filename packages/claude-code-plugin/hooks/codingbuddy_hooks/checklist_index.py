@@ -0,0 +1,203 @@
+"""
+CodingBuddy Checklist Pre-Selection
+
+Selects the review checklist items that fit an EVAL prompt ("EVAL:
+check the auth flow for N+1 queries") and inlines them, so the model does
+not fetch every domain through the MCP server's generate_checklist tool
+or read items that do not apply.
+
+compile-rules-bundle.py flattens the domains listed in
+packages/rules/.ai-rules/checklists/index.json into one index with
+build_checklist_index() and stores it in the rules bundle. Each item gets
+precomputed trigger terms:
+
+- its domain's id and name ("security")
+- its category's name and triggers: file path segments ("auth", "login"),
+  single-word imports ("bcrypt", "zod") and code patterns ("usequery")
+- PROMPT_TRIGGERS, words prompts use that the checklist files do not
+  ("n+1" for data fetching)
+
+and, as weaker evidence, the distinctive words of its own text and
+reason (used by at most MAX_TEXT_TERM_ITEMS items).
+
+An item scores TRIGGER_WEIGHT per shared trigger term and 1 per shared
+word, and is selected at MIN_SCORE: one trigger term or two words. Higher
+scores, then higher priorities, come first, up to MAX_ITEMS. Terms are
+English, as in the checklist files.
+
+Index layout (JSON):
+    {"domains": [[id, name], ...],
+     "items": [[domain, category, id, priority, text], ...],
+     "triggers": {term: [item, ...]},
+     "words": {term: [item, ...]}}
+"""
+
+from __future__ import annotations
+
+from .agent_index import terms
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional, Tuple
+
+INDEX_FORMAT = 1
+
+MAX_ITEMS = 12
+MAX_TEXT_TERM_ITEMS = 3
+TRIGGER_WEIGHT = 2
+MIN_SCORE = 2
+
+PRIORITIES = ("critical", "high", "medium", "low")
+
+# Prompt vocabulary per "<domain>/<category>" missing from the checklist files
+PROMPT_TRIGGERS: Dict[str, Tuple[str, ...]] = {
+    "security/authentication": ("auth", "authentication", "jwt", "oauth", "cookie", "logout", "brute"),
+    "security/input_validation": ("validation", "xss", "injection", "sql", "sanitization"),
+    "security/data_protection": ("encryption", "secrets", "gdpr", "leak", "logging"),
+    "accessibility/forms": ("a11y", "label", "wcag"),
+    "accessibility/interactive_elements": ("a11y", "keyboard", "focus", "aria", "wcag"),
+    "accessibility/content": ("a11y", "alt", "heading", "contrast", "wcag"),
+    "performance/rendering": ("render", "rerender", "memoization"),
+    "performance/loading": ("bundle", "lazy", "split", "splitting"),
+    "performance/data_fetching": ("n+1", "query", "queries", "cache", "caching", "pagination", "orm"),
+    "testing/unit_testing": ("test", "tests", "coverage", "unit"),
+    "testing/api_testing": ("api", "endpoint", "mock", "msw"),
+    "code-quality/error_handling": ("error", "errors", "exception", "exceptions"),
+    "code-quality/solid_principles": ("solid", "coupling", "abstraction"),
+    "seo/metadata": ("meta", "og", "opengraph"),
+}
+
+RECOMMENDATION_TEMPLATE = """<codingbuddy-checklist>
+CHECKLIST_DOMAINS: {domains}
+MATCHED_TERMS: {terms}
+{items}
+Pre-selected locally from the CodingBuddy checklists; review against these items instead of calling
+generate_checklist, unless the change touches other areas.
+</codingbuddy-checklist>"""
+
+
+def _trigger_terms(domain: dict, category: dict) -> set:
+    """Return the terms shared by every item of a category."""
+    result = terms(f"{domain.get('id', '')} {domain.get('name', '')} {category.get('name', '').replace('_', ' ')}")
+    triggers = category.get("triggers") if isinstance(category.get("triggers"), dict) else {}
+    for pattern in triggers.get("files", []):
+        result |= terms(pattern.replace("*", " ").replace("/", " "))
+    for module in triggers.get("imports", []):
+        # Only whole package names; "next-auth" would also trigger on
+        # "next", and "@headlessui/react" is named by its scope
+        name = module[1:].partition("/")[0] if module.startswith("@") else module
+        name_terms = terms(name)
+        if len(name_terms) == 1 and name_terms == terms(name.replace("-", "")):
+            result |= name_terms
+    for pattern in triggers.get("patterns", []):
+        result |= terms(pattern)
+    result |= terms(" ".join(PROMPT_TRIGGERS.get(f"{domain.get('id')}/{category.get('name')}", ())))
+    return result
+
+
+def build_checklist_index(domains: List[dict]) -> dict:
+    """
+    Build the checklist index.
+
+    Args:
+        domains: Domain files in index.json order, each with an "id" (and
+            optionally "name") from index.json merged into it
+
+    Returns:
+        Index in the layout described in the module docstring
+    """
+    items: List[list] = []
+    item_terms: List[set] = []
+    text_terms: List[set] = []
+    for position, domain in enumerate(domains):
+        for category in domain.get("categories", []):
+            shared = _trigger_terms(domain, category)
+            for item in category.get("items", []):
+                items.append([position, category.get("name", ""), item["id"], item.get("priority", ""), item["text"]])
+                item_terms.append(set(shared))
+                text_terms.append(terms(f"{item['text']} {item.get('reason', '')}"))
+
+    frequency: Dict[str, int] = {}
+    for words in text_terms:
+        for word in words:
+            frequency[word] = frequency.get(word, 0) + 1
+    triggers: Dict[str, List[int]] = {}
+    words: Dict[str, List[int]] = {}
+    for position, (shared, own) in enumerate(zip(item_terms, text_terms)):
+        for term in shared:
+            triggers.setdefault(term, []).append(position)
+        for word in own - shared:
+            if frequency[word] <= MAX_TEXT_TERM_ITEMS:
+                words.setdefault(word, []).append(position)
+    return {
+        "format": INDEX_FORMAT,
+        "domains": [[domain["id"], domain.get("name", domain["id"])] for domain in domains],
+        "items": items,
+        "triggers": {term: triggers[term] for term in sorted(triggers)},
+        "words": {term: words[term] for term in sorted(words)},
+    }
+
+
+class ChecklistIndex:
+    """Selects checklist items for prompts from a built index."""
+
+    def __init__(self, data: dict):
+        """
+        Raises:
+            ValueError: If data is not an index of this format
+        """
+        if not isinstance(data, dict) or data.get("format") != INDEX_FORMAT:
+            raise ValueError("not a checklist index of this format")
+        domains, items = data.get("domains"), data.get("items")
+        triggers, words = data.get("triggers"), data.get("words")
+        if not all(isinstance(value, list) for value in (domains, items)) or \
+                not all(isinstance(value, dict) for value in (triggers, words)):
+            raise ValueError("incomplete checklist index")
+        self.domains: List[list] = domains
+        self.items: List[list] = items
+        self._postings = ((triggers, TRIGGER_WEIGHT), (words, 1))
+
+    def select(self, prompt: str, limit: int = MAX_ITEMS) -> Optional[Tuple[List[str], List[list]]]:
+        """
+        Select the items a prompt triggers.
+
+        Returns:
+            (matched terms, items as [domain, category, id, priority, text]),
+            or None if the prompt triggers no item
+        """
+        scores: Dict[int, int] = {}
+        matched = set()
+        for term in terms(prompt):
+            for postings, weight in self._postings:
+                for position in postings.get(term, ()):
+                    scores[position] = scores.get(position, 0) + weight
+                    matched.add(term)
+        candidates = [position for position, score in scores.items() if score >= MIN_SCORE]
+        if not candidates:
+            return None
+
+        def rank(position: int) -> tuple:
+            priority = self.items[position][3]
+            order = PRIORITIES.index(priority) if priority in PRIORITIES else len(PRIORITIES)
+            return -scores[position], order, position
+
+        selected = sorted(candidates, key=rank)[:limit]
+        # Only report the terms that selected something
+        selected_set = set(selected)
+        matched = sorted(
+            term for term in matched
+            if any(position in selected_set for postings, _ in self._postings for position in postings.get(term, ()))
+        )
+        # Present by domain, in checklist order
+        selected.sort()
+        return matched, [[self.domains[item[0]][0], *item[1:]] for item in (self.items[i] for i in selected)]
+
+
+def render_selection(matched: List[str], items: List[list]) -> str:
+    """Render the block appended to the mode context."""
+    domains = []
+    for item in items:
+        if item[0] not in domains:
+            domains.append(item[0])
+    lines = "\n".join(f"- [{priority}] {item_id}: {text}" for _, _, item_id, priority, text in items)
+    return RECOMMENDATION_TEMPLATE.format(domains=", ".join(domains), terms=", ".join(matched), items=lines)
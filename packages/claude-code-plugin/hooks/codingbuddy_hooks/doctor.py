@@ -0,0 +1,314 @@
+"""
+CodingBuddy Session Start Doctor
+
+Runs each step of the session-start slow path without side effects and
+reports, per step, the wall time and how many filesystem calls it made:
+
+    stat     os.stat() / os.lstat() (Path.exists(), is_file(), ...)
+    open     open() / os.open()
+    iterdir  os.scandir() / os.listdir() (Path.iterdir())
+    resolve  Path.resolve() / os.path.realpath()
+
+The stat calls a resolve() makes internally are counted as part of the
+resolve. Nothing is installed, registered or cached: the version index
+is read but not saved, settings.json is only read (a corrupted file is
+reported instead of backed up), and the stamp is only compared.
+
+Warnings point at the usual causes of slow session starts: a home
+directory on a network filesystem, filesystem calls that take
+milliseconds, slow steps and an unusually large settings.json.
+
+Usage:
+    python3 session-start.py --doctor [--json]
+"""
+
+import builtins
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import session_start
+from .install_stamp import CLIENT_FILENAME, HOOK_FILENAME, HOOK_MODE_RESIDENT, STAMP_FILENAME, get_hook_mode
+
+FS_CALL_KINDS = ("stat", "open", "iterdir", "resolve")
+
+# Filesystem types (from /proc/self/mountinfo) that go over the network
+NETWORK_FS_TYPES = frozenset({
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "afs", "9p", "ceph", "glusterfs", "lustre", "gpfs",
+    "davfs", "fuse.sshfs", "fuse.glusterfs", "fuse.rclone", "fuse.s3fs", "fuse.gcsfuse",
+})
+
+# Warning thresholds
+SLOW_STEP_MS = 50.0
+SLOW_FS_CALL_MS = 1.0
+LARGE_SETTINGS_BYTES = 1 << 20
+
+
+class FsCallCounter:
+    """
+    Counts and times filesystem calls while active (a context manager).
+
+    The os, io and builtins functions are patched for the duration, so
+    calls made through pathlib are counted too. Nested calls (the stats
+    inside a resolve()) only count towards the outermost call.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = dict.fromkeys(FS_CALL_KINDS, 0)
+        self.seconds = 0.0
+        self._depth = 0
+        self._patches: List[Tuple[object, str, Callable]] = []
+
+    def _wrap(self, kind: str, func: Callable) -> Callable:
+        def counted(*args, **kwargs):
+            if self._depth:
+                return func(*args, **kwargs)
+            self._depth += 1
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - started
+                self.counts[kind] += 1
+                self._depth -= 1
+
+        return counted
+
+    def __enter__(self) -> "FsCallCounter":
+        targets = [
+            (os, "stat", "stat"),
+            (os, "lstat", "stat"),
+            (builtins, "open", "open"),
+            (io, "open", "open"),
+            (os, "open", "open"),
+            (os, "scandir", "iterdir"),
+            (os, "listdir", "iterdir"),
+            (os.path, "realpath", "resolve"),
+            (Path, "resolve", "resolve"),
+        ]
+        for owner, name, kind in targets:
+            original = getattr(owner, name)
+            self._patches.append((owner, name, original))
+            setattr(owner, name, self._wrap(kind, original))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches = []
+
+
+def run_step(name: str, func: Callable[[], str]) -> dict:
+    """Run one step under an FsCallCounter and describe it."""
+    error = None
+    result = ""
+    with FsCallCounter() as counter:
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+    step = {
+        "step": name,
+        "ms": round(elapsed * 1000, 3),
+        "fs_ms": round(counter.seconds * 1000, 3),
+        **counter.counts,
+        "result": result,
+    }
+    if error:
+        step["error"] = error
+    return step
+
+
+def filesystem_type(path: Path, mountinfo: str = "/proc/self/mountinfo") -> Optional[str]:
+    """
+    Return the filesystem type of the mount holding path, or None if unknown.
+
+    Reads /proc/self/mountinfo, so only Linux is supported.
+    """
+    try:
+        with open(mountinfo, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        target = os.path.realpath(path)
+    except OSError:
+        return None
+    best = ("", None)
+    for line in lines:
+        fields = line.split(" - ", 1)
+        left = fields[0].split()
+        if len(fields) != 2 or len(left) < 5:
+            continue
+        # Mount points escape spaces and other special characters as octal
+        mount_point = left[4].encode("latin-1").decode("unicode_escape")
+        fs_type = fields[1].split()[0] if fields[1].split() else None
+        inside = target == mount_point or target.startswith(mount_point.rstrip("/") + "/")
+        if inside and len(mount_point) >= len(best[0]):
+            best = (mount_point, fs_type)
+    return best[1]
+
+
+def _describe(path: Optional[Path]) -> str:
+    return str(path) if path else "not found"
+
+
+def diagnose(home: Optional[Path] = None) -> dict:
+    """
+    Run every session-start step read-only and collect the report.
+
+    Returns:
+        {"home", "filesystem", "hook_mode", "settings_bytes", "steps", "warnings"}
+    """
+    home = home or Path.home()
+    hooks_dir = home / ".claude" / "hooks"
+    settings_file = home / ".claude" / "settings.json"
+    hook_mode = get_hook_mode()
+    steps = []
+
+    def stamp() -> str:
+        current = session_start.is_stamp_current(
+            hooks_dir / STAMP_FILENAME, session_start.compute_stamp(hooks_dir, settings_file, hook_mode)
+        )
+        return "current (fast path)" if current else "stale (slow path)"
+
+    steps.append(run_step("stamp", stamp))
+    steps.append(run_step("env CLAUDE_PLUGIN_DIR", lambda: (
+        _describe(session_start._find_source_from_env())
+        if os.environ.get("CLAUDE_PLUGIN_DIR") else "unset"
+    )))
+
+    index: dict = {}
+
+    def version_index() -> str:
+        index.update(session_start.load_version_index(hooks_dir / session_start.VERSION_INDEX_FILENAME))
+        return f"{len(index.get('roots', {}))} root(s) indexed"
+
+    steps.append(run_step("version index", version_index))
+    # The scans below update this index in memory only; it is never saved
+    roots_index = index.get("roots", {})
+    for path in session_start.PLUGIN_CACHE_PATHS:
+        steps.append(run_step(
+            f"cache ~/{path}",
+            lambda path=path: _describe(session_start._find_source_in_cache_root(home / path, roots_index)),
+        ))
+    for pattern in session_start.DEV_SOURCE_PATTERNS:
+        steps.append(run_step(
+            f"dev ~/{pattern}",
+            lambda pattern=pattern: _describe(session_start._find_source_in_dev_dir(home, pattern)),
+        ))
+
+    settings: dict = {}
+    settings_bytes = None
+
+    def read_settings() -> str:
+        nonlocal settings_bytes
+        try:
+            with open(settings_file, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return "missing"
+        settings_bytes = len(data)
+        try:
+            loaded = json.loads(data)
+        except ValueError:
+            return f"{settings_bytes} bytes, invalid JSON"
+        if isinstance(loaded, dict):
+            settings.update(loaded)
+        return f"{settings_bytes} bytes"
+
+    steps.append(run_step("settings read", read_settings))
+
+    def registration() -> str:
+        command = session_start.HOOK_COMMANDS[hook_mode]
+        entry_file = hooks_dir / (CLIENT_FILENAME if hook_mode == HOOK_MODE_RESIDENT else HOOK_FILENAME)
+        registered = session_start._is_hook_in_settings(settings, command)
+        stale = session_start._stale_commands(command) & set(session_start._registered_commands(settings))
+        parts = [
+            "registered" if registered else "not registered",
+            "installed" if entry_file.exists() else "not installed",
+        ]
+        if stale:
+            parts.append(f"{len(stale)} stale command(s)")
+        return ", ".join(parts)
+
+    steps.append(run_step("registration", registration))
+
+    fs_type = filesystem_type(home / ".claude") or filesystem_type(home)
+    return {
+        "home": str(home),
+        "filesystem": fs_type,
+        "hook_mode": hook_mode,
+        "settings_bytes": settings_bytes,
+        "steps": steps,
+        "warnings": find_warnings(steps, fs_type, settings_bytes),
+    }
+
+
+def find_warnings(steps: List[dict], fs_type: Optional[str], settings_bytes: Optional[int]) -> List[str]:
+    """Flag network homes, slow filesystem calls and slow steps, and a large settings.json."""
+    warnings = []
+    if fs_type in NETWORK_FS_TYPES:
+        warnings.append(
+            f"~/.claude is on a network filesystem ({fs_type}); every session start waits on it"
+        )
+    calls = sum(step[kind] for step in steps for kind in FS_CALL_KINDS)
+    fs_ms = sum(step["fs_ms"] for step in steps)
+    if calls and fs_ms / calls > SLOW_FS_CALL_MS:
+        warnings.append(
+            f"filesystem calls average {fs_ms / calls:.2f} ms ({calls} calls); "
+            f"local disks take microseconds"
+        )
+    for step in steps:
+        if step["ms"] > SLOW_STEP_MS:
+            warnings.append(f"step '{step['step']}' took {step['ms']:.1f} ms")
+        if "error" in step:
+            warnings.append(f"step '{step['step']}' failed: {step['error']}")
+    if settings_bytes is not None and settings_bytes > LARGE_SETTINGS_BYTES:
+        warnings.append(
+            f"settings.json is {settings_bytes / (1 << 20):.1f} MB; "
+            f"registration re-reads and rewrites all of it"
+        )
+    return warnings
+
+
+def format_report(report: dict) -> str:
+    """Format the doctor report as text."""
+    lines = [
+        f"home: {report['home']} ({report['filesystem'] or 'filesystem unknown'})",
+        f"hook mode: {report['hook_mode']}",
+        "",
+        f"{'step':<62} {'ms':>8} {'stat':>5} {'open':>5} {'iterdir':>7} {'resolve':>7}  result",
+    ]
+    for step in report["steps"]:
+        lines.append(
+            f"{step['step']:<62} {step['ms']:>8.3f} {step['stat']:>5} {step['open']:>5} "
+            f"{step['iterdir']:>7} {step['resolve']:>7}  {step.get('error') or step['result']}"
+        )
+    lines.append("")
+    if report["warnings"]:
+        lines.append("Warnings:")
+        lines.extend(f"  - {warning}" for warning in report["warnings"])
+    else:
+        lines.append("No problems found.")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns the process exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Diagnose slow CodingBuddy session starts")
+    parser.add_argument("--doctor", action="store_true", help="Run the diagnosis")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = diagnose()
+    if args.json:
+        sys.stdout.write(json.dumps(report, indent=2) + "\n")
+    else:
+        sys.stdout.write(format_report(report))
+    return 0
@@ -0,0 +1,281 @@
+"""
+CodingBuddy Install Stamp
+
+Describes an installation with stat() calls only, and answers "is the
+recorded install stamp still current?" for the session-start launcher
+before anything else is imported. The check needs nothing beyond os and
+sys: no json, re, pathlib, shutil or typing, and not the i18n messages of
+session_start.
+
+Stamp file layout (format 2):
+    <stamp key>\\n
+    <JSON object: the stamp plus diagnostics>\\n
+
+The key is repr() of the sorted stamp items. The fast path compares it
+with the first line of the file; only session_start writes and parses
+the JSON part.
+
+With CODINGBUDDY_INSTALL=background the launcher skips the stamp check
+and hands the whole install to a detached worker (session-start.py
+--install-worker). It only opens the report the previous worker left,
+prints it and starts the next worker, so session start does not wait on
+the filesystem. Report file layout: <stdout text>\0<stderr text>.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+from . import interpreter_args, latency_enabled
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, Optional
+
+# Installed hook launcher, and its name in the plugin's hooks directory
+HOOK_FILENAME = "codingbuddy-mode-detect.py"
+SOURCE_FILENAME = "user-prompt-submit.py"
+
+# Hook package, installed next to the launcher. session_start and
+# install_stamp only ever run from the plugin and are not installed.
+PACKAGE_NAME = "codingbuddy_hooks"
+HOOK_PACKAGE_MODULES = (
+    "__init__.py", "mode_detect.py", "latency.py", "profiling.py", "session_state.py",
+    "agent_index.py", "skill_index.py", "checklist_index.py", "tokenizer.py", "budget.py",
+)
+
+# Optional files installed next to the hook under the same name
+BUNDLE_FILENAME = "codingbuddy-rules.bundle"
+SUPPORT_FILENAMES = (BUNDLE_FILENAME,)
+
+# Resident mode (socket client + mode detection daemon)
+CLIENT_FILENAME = "codingbuddy-mode-client.py"
+HOOK_MODE_ENV = "CODINGBUDDY_HOOK_MODE"
+HOOK_MODE_CLASSIC = "classic"
+HOOK_MODE_RESIDENT = "resident"
+HOOK_MODES = (HOOK_MODE_CLASSIC, HOOK_MODE_RESIDENT)
+
+PROFILE_ENV = "CODINGBUDDY_PROFILE"
+
+STAMP_FILENAME = ".codingbuddy-install.json"
+STAMP_FORMAT = 3
+
+# Background install (detached worker, outcome shown next session)
+INSTALL_ENV = "CODINGBUDDY_INSTALL"
+INSTALL_FOREGROUND = "foreground"
+INSTALL_BACKGROUND = "background"
+INSTALL_MODES = (INSTALL_FOREGROUND, INSTALL_BACKGROUND)
+INSTALL_LOCK_FILENAME = ".codingbuddy-install.lock"
+INSTALL_REPORT_FILENAME = ".codingbuddy-install-report"
+
+
+def get_hook_mode() -> str:
+    """Get the configured hook mode (classic or resident)."""
+    mode = os.environ.get(HOOK_MODE_ENV, "").strip().lower()
+    return mode if mode in HOOK_MODES else HOOK_MODE_CLASSIC
+
+
+def get_install_mode() -> str:
+    """
+    Get the configured install mode (foreground or background).
+
+    Profiling must wrap the install itself, so it always runs in the
+    foreground.
+    """
+    mode = os.environ.get(INSTALL_ENV, "").strip().lower()
+    if mode not in INSTALL_MODES or os.environ.get(PROFILE_ENV):
+        return INSTALL_FOREGROUND
+    return mode
+
+
+def plugin_root() -> str:
+    """Return the root directory of the running plugin (no filesystem access)."""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.dirname(os.path.dirname(package_dir))
+
+
+def file_signature(path: str) -> Optional[List[int]]:
+    """Return [size, mtime_ns] of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def pyc_path(source: str) -> Optional[str]:
+    """Return where the running interpreter caches bytecode for source, or None."""
+    cache_tag = sys.implementation.cache_tag
+    if cache_tag is None:
+        return None
+    directory, filename = os.path.split(source)
+    stem = filename.rpartition(".")[0]
+    return os.path.join(directory, "__pycache__", f"{stem}.{cache_tag}.pyc")
+
+
+def compute_stamp(hooks_dir: str, settings_file: str, hook_mode: str, root: str) -> dict:
+    """
+    Describe the current installation using only stat() calls.
+
+    The plugin root and manifest/source signatures change when the plugin
+    is upgraded; the hook, package, bytecode and settings signatures change
+    when the installed files or the user's settings are edited.
+
+    The package and its bytecode are stamped by their directories, not per
+    module: the installer and py_compile replace files by rename, which
+    updates the directory's mtime, so the fast path costs a fixed handful
+    of stat() calls however many modules the package has. A module edited
+    in place is not noticed until the stamp is removed.
+    """
+    hooks_source = os.path.join(root, "hooks")
+    package_dir = os.path.join(hooks_dir, PACKAGE_NAME)
+    stamp = {
+        "format": STAMP_FORMAT,
+        "plugin_root": root,
+        "plugin_manifest": file_signature(os.path.join(root, ".claude-plugin", "plugin.json")),
+        "hook_source": file_signature(os.path.join(hooks_source, SOURCE_FILENAME)),
+        "package_source": file_signature(os.path.join(hooks_source, PACKAGE_NAME)),
+        "mode": hook_mode,
+        "hook": file_signature(os.path.join(hooks_dir, HOOK_FILENAME)),
+        "package": [file_signature(package_dir), file_signature(os.path.join(package_dir, "__pycache__"))],
+        "support_source": [file_signature(os.path.join(hooks_source, name)) for name in SUPPORT_FILENAMES],
+        "support": [file_signature(os.path.join(hooks_dir, name)) for name in SUPPORT_FILENAMES],
+        "settings": file_signature(settings_file),
+    }
+    if hook_mode == HOOK_MODE_RESIDENT:
+        stamp["client"] = file_signature(os.path.join(hooks_dir, CLIENT_FILENAME))
+    return stamp
+
+
+def stamp_key(stamp: dict) -> str:
+    """Return the one-line canonical form of a stamp."""
+    return repr(sorted(stamp.items()))
+
+
+def is_stamp_current(stamp_file: str, stamp: dict) -> bool:
+    """Check whether the recorded install stamp matches the current one."""
+    try:
+        with open(stamp_file, "r", encoding="utf-8") as f:
+            return f.readline() == stamp_key(stamp) + "\n"
+    except (OSError, ValueError):
+        return False
+
+
+def fast_path_applies() -> bool:
+    """
+    Whether a current stamp alone can end the session start.
+
+    Only the classic hook mode without profiling qualifies; resident mode
+    must start its daemon and profiling must wrap the full run.
+    """
+    return not os.environ.get(PROFILE_ENV) and get_hook_mode() == HOOK_MODE_CLASSIC
+
+
+def is_install_current() -> bool:
+    """Check the classic install of the current user against its stamp."""
+    claude_dir = os.path.join(os.path.expanduser("~"), ".claude")
+    hooks_dir = os.path.join(claude_dir, "hooks")
+    stamp = compute_stamp(
+        hooks_dir, os.path.join(claude_dir, "settings.json"), HOOK_MODE_CLASSIC, plugin_root()
+    )
+    return is_stamp_current(os.path.join(hooks_dir, STAMP_FILENAME), stamp)
+
+
+def run_fast_path() -> bool:
+    """
+    Check the install stamp for the session-start launcher.
+
+    Returns:
+        True if the installation is current and the session start is done
+        (never outside fast_path_applies())
+    """
+    if not fast_path_applies():
+        return False
+    timer = None
+    if latency_enabled():
+        from .latency import PhaseTimer
+
+        timer = PhaseTimer("session-start")
+
+    current = is_install_current()
+    if current and timer:
+        timer.lap("stamp")
+        timer.flush()
+    return current
+
+
+def show_install_report(report_file: str) -> bool:
+    """
+    Print and remove the report of the last background install, if any.
+
+    Returns:
+        True if a report was shown
+    """
+    try:
+        with open(report_file, "r", encoding="utf-8") as f:
+            report = f.read()
+    except (OSError, ValueError):
+        return False
+    try:
+        os.unlink(report_file)
+    except OSError:
+        pass
+    out, _, err = report.partition("\0")
+    sys.stdout.write(out)
+    sys.stderr.write(err)
+    return True
+
+
+def spawn_install_worker(launcher: str) -> None:
+    """
+    Start session-start.py --install-worker detached from this process.
+
+    The worker gets /dev/null as stdin, stdout and stderr and its own
+    session, so Claude Code neither waits for it nor sees its output.
+    posix_spawn() avoids importing subprocess where it is available.
+    """
+    args = [sys.executable, *interpreter_args(), launcher, "--install-worker"]
+    if hasattr(os, "posix_spawn"):
+        os.posix_spawn(sys.executable, args, os.environ, file_actions=[
+            (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+            (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+            (os.POSIX_SPAWN_DUP2, 1, 2),
+        ], setsid=True)
+        return
+    import subprocess
+
+    subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def run_background(launcher: str) -> None:
+    """
+    Session start in background install mode.
+
+    Shows the previous worker's report and, unless the stamp shows a
+    current install, starts a new worker to install. Cache GC only runs
+    as part of an install, so a current stamp leaves nothing for a worker
+    to do. Workers that find another one running exit at once (see
+    session_start.install_worker_main()).
+    """
+    timer = None
+    if latency_enabled():
+        from .latency import PhaseTimer
+
+        timer = PhaseTimer("session-start")
+    hooks_dir = os.path.join(os.path.expanduser("~"), ".claude", "hooks")
+    show_install_report(os.path.join(hooks_dir, INSTALL_REPORT_FILENAME))
+    if fast_path_applies() and is_install_current():
+        phase = "stamp"
+    else:
+        spawn_install_worker(launcher)
+        phase = "spawn"
+    if timer:
+        timer.lap(phase)
+        timer.flush()
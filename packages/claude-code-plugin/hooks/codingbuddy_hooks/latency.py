@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+CodingBuddy Hook Latency Recorder
+
+Records per-phase timings of the codingbuddy hooks into a fixed-size,
+memory-mapped ring buffer, and reports them.
+
+The ring lives at $XDG_CACHE_HOME/codingbuddy/latency.ring (default
+~/.cache/codingbuddy/latency.ring, override with CODINGBUDDY_LATENCY_FILE).
+Its size never changes: once all slots are used the oldest records are
+overwritten. Recording takes no locks; two hooks finishing at the same
+instant may overwrite each other's slots, which only drops samples.
+Set CODINGBUDDY_LATENCY=0 to disable recording.
+
+Usage:
+    python3 codingbuddy_hooks/latency.py             # p50/p95/p99 per phase
+    python3 codingbuddy_hooks/latency.py --openmetrics \\
+        --output /var/lib/node_exporter/textfile/codingbuddy.prom
+"""
+
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Optional, Tuple
+
+    # (seq, time_ns, hook, phase, duration_us)
+    Record = Tuple[int, int, str, str, int]
+
+RING_ENV = "CODINGBUDDY_LATENCY_FILE"
+ENABLE_ENV = "CODINGBUDDY_LATENCY"
+RING_FILENAME = "latency.ring"
+RING_SLOTS = 8192
+
+# Header: magic, slot count, next sequence number
+_HEADER = struct.Struct("<8sIxxxxQ")
+_MAGIC = b"CBLAT\x00\x00\x01"
+# Slot: sequence number (0 = empty), wall clock ns, hook, phase, duration us
+_SLOT = struct.Struct("<QQBBxxI")
+
+# Stable on-disk ids; append only
+HOOK_IDS: Dict[str, int] = {
+    "user-prompt-submit": 1,
+    "session-start": 2,
+    "session-install": 3,
+}
+PHASE_IDS: Dict[str, int] = {
+    "startup": 1,
+    "parse": 2,
+    "detect": 3,
+    "stamp": 4,
+    "discovery": 5,
+    "install": 6,
+    "settings_read": 7,
+    "settings_write": 8,
+    "total": 9,
+    "session": 10,
+    "context": 11,
+    "spawn": 12,
+    "lease": 13,
+    "agent": 14,
+    "skills": 15,
+    "checklist": 16,
+    "degraded": 17,
+}
+_HOOK_NAMES = {v: k for k, v in HOOK_IDS.items()}
+_PHASE_NAMES = {v: k for k, v in PHASE_IDS.items()}
+
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_NAME = "codingbuddy_hook_phase_duration_seconds"
+
+
+def get_ring_path() -> str:
+    """Get the latency ring buffer path."""
+    override = os.environ.get(RING_ENV)
+    if override:
+        return override
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "codingbuddy", RING_FILENAME)
+
+
+def _ring_size(slots: int) -> int:
+    return _HEADER.size + slots * _SLOT.size
+
+
+def _open_ring(path: str, slots: int = RING_SLOTS) -> mmap.mmap:
+    """
+    Map the ring buffer, creating or resetting it when needed.
+
+    Raises:
+        OSError: If the file cannot be created or mapped
+    """
+    os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+    size = _ring_size(slots)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if os.fstat(fd).st_size != size:
+            os.ftruncate(fd, size)
+        ring = mmap.mmap(fd, size)
+    finally:
+        os.close(fd)
+    magic, ring_slots, _ = _HEADER.unpack_from(ring, 0)
+    if magic != _MAGIC or ring_slots != slots:
+        ring[:] = bytes(size)
+        _HEADER.pack_into(ring, 0, _MAGIC, slots, 0)
+    return ring
+
+
+def record(hook: str, timings: List[Tuple[str, float]], path: Optional[str] = None) -> None:
+    """
+    Append phase timings (phase name, seconds) for one hook run.
+
+    Never raises: recording must not affect the hook.
+    """
+    if os.environ.get(ENABLE_ENV, "1").lower() in ("0", "false", "off"):
+        return
+    hook_id = HOOK_IDS.get(hook)
+    if hook_id is None:
+        return
+    try:
+        ring = _open_ring(path or get_ring_path())
+    except (OSError, ValueError):
+        return
+    with ring:
+        _, slots, seq = _HEADER.unpack_from(ring, 0)
+        now = time.time_ns()
+        for phase, seconds in timings:
+            phase_id = PHASE_IDS.get(phase)
+            if phase_id is None:
+                continue
+            seq += 1
+            duration_us = min(max(int(seconds * 1e6), 0), 0xFFFFFFFF)
+            offset = _HEADER.size + (seq % slots) * _SLOT.size
+            _SLOT.pack_into(ring, offset, seq, now, hook_id, phase_id, duration_us)
+        _HEADER.pack_into(ring, 0, _MAGIC, slots, seq)
+
+
+class PhaseTimer:
+    """
+    Collects consecutive phase timings for one hook run.
+
+    Creating the timer records "startup": the CPU time the interpreter
+    spent before main(). Each lap(name) records the time since the
+    previous lap; add() records a sample that is not a lap; flush() adds
+    "total" and writes everything at once.
+    """
+
+    def __init__(self, hook: str):
+        self.hook = hook
+        self.timings: List[Tuple[str, float]] = [("startup", time.process_time())]
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.timings.append((phase, now - self._last))
+        self._last = now
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.timings.append((phase, seconds))
+
+    def flush(self, path: Optional[str] = None) -> None:
+        self.timings.append(("total", time.perf_counter() - self._start))
+        record(self.hook, self.timings, path)
+        self.timings = []
+
+
+def read_records(path: Optional[str] = None) -> List[Record]:
+    """
+    Read all records as (seq, time_ns, hook, phase, duration_us), oldest first.
+
+    Returns an empty list if the ring does not exist or is not a ring.
+    """
+    try:
+        with open(path or get_ring_path(), "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+    if len(data) < _HEADER.size:
+        return []
+    magic, slots, _ = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or len(data) != _ring_size(slots):
+        return []
+    records = []
+    for seq, time_ns, hook_id, phase_id, duration_us in _SLOT.iter_unpack(data[_HEADER.size:]):
+        if seq and hook_id in _HOOK_NAMES and phase_id in _PHASE_NAMES:
+            records.append((seq, time_ns, _HOOK_NAMES[hook_id], _PHASE_NAMES[phase_id], duration_us))
+    records.sort()
+    return records
+
+
+def quantile(sorted_values: List[int], q: float) -> int:
+    """Nearest-rank quantile of a non-empty sorted list."""
+    rank = max(1, math.ceil(len(sorted_values) * q))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(records: List[Record]) -> Dict[Tuple[str, str], List[int]]:
+    """Group durations (us) by (hook, phase), each list sorted."""
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for _, _, hook, phase, duration_us in records:
+        groups.setdefault((hook, phase), []).append(duration_us)
+    for values in groups.values():
+        values.sort()
+    return groups
+
+
+def format_table(groups: Dict[Tuple[str, str], List[int]]) -> str:
+    """Format p50/p95/p99 per phase in milliseconds."""
+    lines = [f"{'hook':<20} {'phase':<15} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+    for (hook, phase), values in sorted(groups.items(), key=lambda kv: (kv[0][0], PHASE_IDS[kv[0][1]])):
+        p50, p95, p99 = (quantile(values, q) / 1000 for q in QUANTILES)
+        lines.append(f"{hook:<20} {phase:<15} {len(values):>6} {p50:>9.3f} {p95:>9.3f} {p99:>9.3f}")
+    return "\n".join(lines) + "\n"
+
+
+def format_openmetrics(groups: Dict[Tuple[str, str], List[int]]) -> str:
+    """Format a summary metric in OpenMetrics text (node-exporter textfile compatible)."""
+    lines = [
+        f"# TYPE {METRIC_NAME} summary",
+        f"# UNIT {METRIC_NAME} seconds",
+        f"# HELP {METRIC_NAME} Duration of codingbuddy hook phases.",
+    ]
+    for (hook, phase), values in sorted(groups.items()):
+        labels = f'hook="{hook}",phase="{phase}"'
+        for q in QUANTILES:
+            lines.append(f'{METRIC_NAME}{{{labels},quantile="{q}"}} {quantile(values, q) / 1e6}')
+        lines.append(f"{METRIC_NAME}_count{{{labels}}} {len(values)}")
+        lines.append(f"{METRIC_NAME}_sum{{{labels}}} {sum(values) / 1e6}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, text: str) -> None:
+    """Write text so collectors never read a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns the process exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show codingbuddy hook latency percentiles")
+    parser.add_argument("--hook", choices=sorted(HOOK_IDS), help="Only show one hook")
+    parser.add_argument("--openmetrics", action="store_true", help="Print OpenMetrics text")
+    parser.add_argument("--output", help="Write to this file atomically instead of stdout")
+    parser.add_argument("--ring", help=f"Ring buffer path (default: {get_ring_path()})")
+    args = parser.parse_args(argv)
+
+    records = [r for r in read_records(args.ring) if args.hook in (None, r[2])]
+    groups = summarize(records)
+    if args.openmetrics:
+        text = format_openmetrics(groups)
+    elif groups:
+        text = format_table(groups)
+    else:
+        text = "No latency samples recorded yet.\n"
+
+    if args.output:
+        _write_atomic(args.output, text)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1217 @@
+"""
+CodingBuddy Mode Detection Hook
+
+Detects PLAN/ACT/EVAL/AUTO keywords at the start of user prompts
+and injects the mode's context. When the compiled rules bundle
+(codingbuddy-rules.bundle, see compile-rules-bundle.py) sits next to the
+hook launcher, the mode's instructions, agent, specialists and rules are
+inlined directly; otherwise the context asks for a parse_mode MCP call.
+
+Keywords come from the "keywords" lists in keyword-modes.json, shipped
+in the rules bundle as a prebuilt lookup table, so new modes and locales
+need no code change. Without a bundle the built-in defaults are used:
+- English: PLAN, ACT, EVAL, AUTO
+- Korean: 계획, 실행, 평가, 자동
+- Japanese: 計画, 実行, 評価, 自動
+- Chinese: 计划, 执行, 评估, 自动
+- Spanish: PLANIFICAR, ACTUAR, EVALUAR, AUTOMÁTICO
+
+Resident mode:
+    python3 -I -S user-prompt-submit.py --daemon
+
+keeps the compiled matcher loaded in a long-lived process listening on a
+per-user Unix domain socket. mode-detect-client.py forwards hook payloads
+to it and falls back to this module when the daemon is not running.
+
+This module runs on every prompt, so only what the common path needs is
+imported up front: typing is only imported by type checkers, unicodedata
+only for non-ASCII prompts or the built-in keyword table, the latency
+recorder only when recording is enabled and the profiler only on request.
+
+Each run has a latency budget (budget.py, 30 ms by default). Once it is
+spent the session store, rules bundle and agent, skill and checklist
+hints are skipped, and a detected mode gets the basic parse_mode context.
+
+When the payload carries a session_id, the detected mode is remembered
+in the session store (session_state.py). A later prompt of the same
+session without a keyword gets a short reminder of the active mode
+instead of no context at all.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import sys
+import re
+
+from . import latency_enabled, session_state_enabled
+from .budget import BudgetExceeded, start_budget
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, Dict, List, Optional, Sequence, TextIO, Tuple
+
+    from .budget import Budget
+    from .latency import PhaseTimer
+
+# Built-in keywords, used when no rules bundle is installed
+# (keep in sync with packages/rules/.ai-rules/keyword-modes.json; the MCP
+# server's LOCALIZED_KEYWORD_MAP is held to the same file by its tests)
+MODE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "PLAN": ("PLAN", "계획", "計画", "计划", "PLANIFICAR"),
+    "ACT": ("ACT", "실행", "実行", "执行", "ACTUAR"),
+    "EVAL": ("EVAL", "평가", "評価", "评估", "EVALUAR"),
+    "AUTO": ("AUTO", "자동", "自動", "自动", "AUTOMÁTICO"),
+}
+
+# Only this many leading characters of a prompt are inspected, so
+# detection cost does not grow with pasted logs or files.
+DETECT_WINDOW = 256
+
+# Only this many leading characters of the prompt are decoded from the
+# hook payload; the rest of the string is skipped without building it.
+PROMPT_HEAD_CHARS = 4096
+READ_CHUNK_CHARS = 65536
+_JSON_WHITESPACE = " \t\n\r"
+# Longest raw JSON encoding of one character (a \\uXXXX surrogate pair)
+_MAX_ESCAPE_LEN = 12
+
+
+# A keyword is the first token of the prompt, followed by a colon or by
+# whitespace and more text. The token is looked up in a keyword table, so
+# detection cost does not grow with the number of modes or locales.
+_KEYWORD_TOKEN = re.compile(r"\s*([^\s:]+)(?:\s*:|\s+(?=\S))")
+# A token whose trailing whitespace runs to the end of the window; the
+# text after it lies beyond the window
+_KEYWORD_AT_WINDOW_END = re.compile(r"([^\s:]+)\s+\Z")
+_NON_SPACE = re.compile(r"\S")
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Normalize a keyword or prompt token for table lookup."""
+    import unicodedata
+
+    return unicodedata.normalize("NFKC", keyword).lower()
+
+
+def build_keyword_table(mode_keywords: Dict[str, Sequence[str]]) -> Dict[str, str]:
+    """
+    Build the normalized keyword -> mode lookup table.
+
+    Args:
+        mode_keywords: Mapping of mode name to its keywords
+
+    Returns:
+        Mapping of NFKC-normalized, lowercased keyword to mode name
+
+    Raises:
+        ValueError: If a keyword is empty, contains whitespace or a colon,
+            or is claimed by two modes
+    """
+    table: Dict[str, str] = {}
+    for mode, keywords in mode_keywords.items():
+        for keyword in keywords:
+            key = normalize_keyword(keyword) if isinstance(keyword, str) else ""
+            match = _KEYWORD_TOKEN.match(key + ":")
+            if match is None or match.group(1) != key:
+                raise ValueError(f"invalid keyword {keyword!r} for mode {mode}")
+            if table.get(key, mode) != mode:
+                raise ValueError(f"keyword {keyword!r} is used by both {table[key]} and {mode}")
+            table[key] = mode
+    return table
+
+
+# Built lazily (see __getattr__): normalizing needs unicodedata, which
+# prompts detected through the bundle's prebuilt table never load
+_default_keyword_table: Optional[Dict[str, str]] = None
+
+
+def get_default_keyword_table() -> Dict[str, str]:
+    """Return the keyword table built from MODE_KEYWORDS."""
+    global _default_keyword_table
+    if _default_keyword_table is None:
+        _default_keyword_table = build_keyword_table(MODE_KEYWORDS)
+    return _default_keyword_table
+
+
+def __getattr__(name: str):
+    if name == "DEFAULT_KEYWORD_TABLE":
+        return get_default_keyword_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Context template for mode detection output
+CONTEXT_TEMPLATE = """<codingbuddy-mode-detected>
+MODE_KEYWORD_DETECTED: {mode}
+MANDATORY_ACTION: You MUST call mcp__codingbuddy__parse_mode with the user's prompt IMMEDIATELY.
+DO NOT respond to the user before calling parse_mode.
+DO NOT skip this step or rationalize why it's not needed.
+This is a BLOCKING requirement from the CodingBuddy hook.
+The parse_mode tool will provide mode-specific instructions, checklists, and agent recommendations.
+</codingbuddy-mode-detected>"""
+
+# Compiled rules bundle (keep in sync with compile-rules-bundle.py)
+BUNDLE_FILENAME = "codingbuddy-rules.bundle"
+BUNDLE_FORMAT = 2
+BUNDLE_MAGIC = b"codingbuddy-rules %d\n" % BUNDLE_FORMAT
+
+INLINE_CONTEXT_TEMPLATE = """<codingbuddy-mode-detected>
+MODE_KEYWORD_DETECTED: {mode}
+MODE_CONTEXT_SOURCE: CodingBuddy rules bundle {version}
+The CodingBuddy hook has already resolved this mode; the rules parse_mode would return for it are included below.
+Do NOT call mcp__codingbuddy__parse_mode unless you need data that is missing here (e.g. the project language setting).
+DESCRIPTION: {description}
+INSTRUCTIONS: {instructions}
+AGENT: {agent}
+DELEGATES_TO: {delegates_to}
+DEFAULT_SPECIALISTS: {specialists}
+</codingbuddy-mode-detected>
+<codingbuddy-rules mode="{mode}">
+{rules}</codingbuddy-rules>"""
+
+# Modes whose prompts get a locally matched primary agent. parse_mode
+# limits PLAN to the planning agents and always gives EVAL code-reviewer.
+RECOMMEND_AGENT_MODES = ("ACT", "AUTO")
+
+# Project configuration as the MCP server finds it (config.loader.ts).
+# A project that sets ai.primaryAgent or ai.excludeAgents gets no local
+# recommendation; JavaScript configs cannot be evaluated here, so for
+# them any mention of the keys counts.
+PROJECT_CONFIG_FILENAMES = ("codingbuddy.config.js", "codingbuddy.config.mjs", "codingbuddy.config.json")
+PROJECT_CONFIG_MAX_PARENTS = 10
+AGENT_CONFIG_KEYS = ("primaryAgent", "excludeAgents")
+
+# Modes whose prompts get pre-selected checklist items (see
+# checklist_index.py); review is where the checklists apply
+CHECKLIST_MODES = ("EVAL",)
+
+# Context variants: the full block on the first detection of a mode in
+# a session, a short marker when the same mode is detected again. Every
+# FULL_CONTEXT_EVERY-th repeat gets the full block again, in case the
+# conversation was compacted since. CODINGBUDDY_CONTEXT=full turns the
+# compact variant off.
+CONTEXT_VARIANTS = ("full", "compact")
+CONTEXT_ENV = "CODINGBUDDY_CONTEXT"
+FULL_CONTEXT_EVERY = 10
+
+COMPACT_CONTEXT_TEMPLATE = """<codingbuddy-mode-detected>
+MODE_KEYWORD_DETECTED: {mode} (repeat)
+The {mode} mode context given earlier in this session still applies; follow it for this prompt.
+Call mcp__codingbuddy__parse_mode only if that context is no longer in the conversation.
+</codingbuddy-mode-detected>"""
+
+# Reminder for prompts without a keyword in a session with an active mode
+ACTIVE_MODE_TEMPLATE = """<codingbuddy-mode-active>
+ACTIVE_MODE: {mode}
+This session entered {mode} mode {prompts} prompt(s) ago and no new mode keyword was given.
+Keep following the {mode} mode instructions already in this conversation.
+</codingbuddy-mode-active>"""
+
+RULE_TEMPLATE = """<rule path="{path}">
+{content}
+</rule>
+"""
+
+# Per-mode sections of core.md, as the MCP server filters them
+# (apps/mcp-server/src/keyword/rule-filter.ts). PLAN, ACT and EVAL get
+# the common header plus their own section; AUTO cycles through all
+# three and gets the whole file.
+CORE_RULES_PATH = "rules/core.md"
+CORE_COMMON_SECTION = ("## Core Rules", "### Plan Mode")
+CORE_MODE_SECTIONS = {
+    "PLAN": ("### Plan Mode", "### Act Mode"),
+    "ACT": ("### Act Mode", "### Eval Mode"),
+    "EVAL": ("### Eval Mode", "### Communication Rules"),
+}
+FILTERED_RULE_NOTE = "<!-- Note: This is a filtered view for {mode} mode. Full rules available in core.md -->"
+
+# Name of this hook in the latency ring and the budget table (budget.py)
+HOOK_NAME = "user-prompt-submit"
+
+# Opt-in profiling of main() (see profiling.py)
+PROFILE_ENV = "CODINGBUDDY_PROFILE"
+
+# Resident daemon settings
+SOCKET_ENV = "CODINGBUDDY_SOCKET"
+SOCKET_NAME = "mode-detect.sock"
+DAEMON_IDLE_TIMEOUT = 3600.0
+
+
+def match_keyword(
+    prompt: str, keyword_table: Optional[Dict[str, str]] = None
+) -> Optional[Tuple[str, str]]:
+    """
+    Match a mode keyword at the start of the prompt.
+
+    Like a match on the stripped prompt, but bounded: only the first
+    PROMPT_HEAD_CHARS characters (all the hook reads of a prompt) are
+    searched for whitespace, and only DETECT_WINDOW characters from the
+    first non-whitespace one are tokenized. The window is NFKC-normalized
+    when it contains non-ASCII text, so full-width input from CJK IMEs
+    (e.g. "ＰＬＡＮ：") is accepted.
+
+    Args:
+        prompt: User's input prompt
+        keyword_table: Keyword lookup table (default: get_keyword_table())
+
+    Returns:
+        (mode, normalized keyword), or None if the prompt has no keyword
+    """
+    first = _NON_SPACE.search(prompt, 0, PROMPT_HEAD_CHARS)
+    if first is None:
+        return None
+    end = min(first.start() + DETECT_WINDOW, PROMPT_HEAD_CHARS)
+    head = prompt[first.start():end]
+    if not head.isascii():
+        import unicodedata
+
+        head = unicodedata.normalize("NFKC", head)
+    match = _KEYWORD_TOKEN.match(head)
+    if match is None:
+        # "PLAN" followed by more whitespace than fits in the window
+        match = _KEYWORD_AT_WINDOW_END.match(head)
+        if match is None or _NON_SPACE.search(prompt, end, PROMPT_HEAD_CHARS) is None:
+            return None
+    if keyword_table is None:
+        keyword_table = get_keyword_table()
+    keyword = match.group(1).lower()
+    mode = keyword_table.get(keyword)
+    return (mode, keyword) if mode is not None else None
+
+
+def detect_mode(prompt: str, keyword_table: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """
+    Detect mode keyword at the start of the prompt (see match_keyword()).
+
+    Args:
+        prompt: User's input prompt
+        keyword_table: Keyword lookup table (default: get_keyword_table())
+
+    Returns:
+        Detected mode name (e.g. PLAN, ACT, EVAL, AUTO) or None
+    """
+    matched = match_keyword(prompt, keyword_table)
+    return matched[0] if matched else None
+
+
+class _UnusualPayload(Exception):
+    """Raised when the streaming reader should defer to a full JSON parse."""
+
+
+class _PayloadReader:
+    """
+    Incremental reader for the hook's JSON payload.
+
+    Parses the top-level object from a text stream chunk by chunk. Only the
+    first prompt_limit characters of the "prompt" string are decoded; the
+    remainder is skipped with str.find() and discarded as it is read, so
+    memory stays flat for multi-megabyte prompts. Other values are small
+    and decoded normally.
+
+    Until the prompt body starts being skipped, everything read is kept in
+    the buffer so callers can fall back to json.loads() on unusual input.
+    """
+
+    def __init__(self, stream: TextIO, prompt_limit: int):
+        self.stream = stream
+        self.prompt_limit = prompt_limit
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        # True while buf still holds the complete input read so far
+        self.retained = True
+
+    def _fill(self) -> bool:
+        """Read the next chunk into the buffer. Returns False at EOF."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(READ_CHUNK_CHARS)
+        if not chunk:
+            self.eof = True
+            return False
+        if not self.retained:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def _peek(self) -> str:
+        """Skip whitespace and return the next character ('' at EOF)."""
+        while True:
+            buf = self.buf
+            while self.pos < len(buf) and buf[self.pos] in _JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(buf):
+                return buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def _malformed(self, message: str) -> None:
+        """Report invalid input, deferring to a full parse when possible."""
+        if self.retained:
+            raise _UnusualPayload(message)
+        raise json.JSONDecodeError(message, self.buf, self.pos)
+
+    def _decode_value(self):
+        """Decode one (small) JSON value at the current position."""
+        # A value is always followed by ',', ':' or '}', so buffering up to
+        # one of them keeps numbers from being cut at a chunk boundary
+        while not any(self.buf.find(c, self.pos) != -1 for c in ",:}") and self._fill():
+            pass
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                self._malformed(e.msg)
+            self.pos = end
+            return value
+
+    @staticmethod
+    def _mask_escapes(raw: str) -> str:
+        """
+        Blank out escaped backslashes and quotes, keeping positions.
+
+        raw must start at an escape boundary. The first '"' left in the
+        result is then the closing quote, found with str.find() instead
+        of a per-character loop. A trailing '\\' means raw ends inside
+        an escape sequence.
+        """
+        return raw.replace("\\\\", "  ").replace('\\"', "  ")
+
+    def _find_string_end(self, start: int, stop: int) -> int:
+        """Return the index of the closing quote in buf[start:stop], or -1."""
+        j = self._mask_escapes(self.buf[start:stop]).find('"')
+        return start + j if j != -1 else -1
+
+    def _skip_string_rest(self) -> None:
+        """Advance past the closing quote of the string starting at pos."""
+        while True:
+            masked = self._mask_escapes(self.buf[self.pos:])
+            j = masked.find('"')
+            if j != -1:
+                self.pos += j + 1
+                return
+            # Resume at an escape cut by the chunk boundary, if any
+            self.pos = len(self.buf) - (1 if masked.endswith("\\") else 0)
+            if not self._fill():
+                self._malformed("Unterminated string")
+
+    def _decode_partial(self, raw: str) -> str:
+        """Decode a string body that may end inside an escape sequence."""
+        for cut in range(len(raw), max(len(raw) - _MAX_ESCAPE_LEN, -1), -1):
+            try:
+                return json.loads(f'"{raw[:cut]}"')
+            except json.JSONDecodeError:
+                continue
+        raise _UnusualPayload("Invalid string")
+
+    def _read_prompt(self) -> str:
+        """Decode the head of the prompt string and skip the rest."""
+        start = self.pos + 1
+        # Enough raw characters for prompt_limit + 1 decoded characters,
+        # so a surrogate pair cut in half never survives truncation
+        raw_limit = _MAX_ESCAPE_LEN * (self.prompt_limit + 1)
+        while len(self.buf) - start < raw_limit and self._fill():
+            pass
+
+        end = self._find_string_end(start, start + raw_limit)
+        if end != -1:
+            try:
+                head = json.loads(f'"{self.buf[start:end]}"')
+            except json.JSONDecodeError:
+                raise _UnusualPayload("Invalid string")
+            self.pos = end + 1
+            return head[:self.prompt_limit]
+
+        head = self._decode_partial(self.buf[start:start + raw_limit])
+        self.retained = False
+        self.pos = start
+        self._skip_string_rest()
+        return head[:self.prompt_limit]
+
+    def read_object(self) -> dict:
+        """Read the top-level payload object."""
+        if self._peek() != "{":
+            raise _UnusualPayload("Expecting object")
+        self.pos += 1
+        result = {}
+
+        if self._peek() == "}":
+            self.pos += 1
+        else:
+            while True:
+                if self._peek() != '"':
+                    self._malformed("Expecting property name enclosed in double quotes")
+                key = self._decode_value()
+                if self._peek() != ":":
+                    self._malformed("Expecting ':' delimiter")
+                self.pos += 1
+
+                if key == "prompt" and self._peek() == '"':
+                    result[key] = self._read_prompt()
+                else:
+                    if not self._peek():
+                        self._malformed("Expecting value")
+                    result[key] = self._decode_value()
+
+                delimiter = self._peek()
+                self.pos += 1
+                if delimiter == "}":
+                    break
+                if delimiter != ",":
+                    self._malformed("Expecting ',' delimiter")
+
+        if self._peek():
+            self._malformed("Extra data")
+        return result
+
+
+def read_payload(stream: TextIO, prompt_limit: int = PROMPT_HEAD_CHARS) -> dict:
+    """
+    Parse the hook payload, decoding only the head of the prompt.
+
+    Falls back to a full json.loads() when the payload is not a plain
+    object or a problem is found before the prompt body is skipped.
+
+    Args:
+        stream: Text stream containing the hook's JSON input
+        prompt_limit: Number of leading prompt characters to keep
+
+    Returns:
+        Parsed payload with "prompt" truncated to prompt_limit characters
+
+    Raises:
+        json.JSONDecodeError: If the payload is not valid JSON
+    """
+    reader = _PayloadReader(stream, prompt_limit)
+    try:
+        return reader.read_object()
+    except _UnusualPayload:
+        input_data = json.loads(reader.buf + stream.read())
+    if isinstance(input_data, dict) and isinstance(input_data.get("prompt"), str):
+        input_data["prompt"] = input_data["prompt"][:prompt_limit]
+    return input_data
+
+
+class RulesBundle:
+    """
+    Read-only, memory-mapped view of a compiled rules bundle.
+
+    Only the one-line header is parsed up front; rule bodies and the
+    precomputed context of each mode are decoded from the mapping on
+    demand.
+    """
+
+    def __init__(self, path: str):
+        """
+        Raises:
+            OSError: If the bundle cannot be opened or mapped
+            ValueError: If the bundle is empty, malformed or of another format
+        """
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._data[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+                raise ValueError(f"{path}: not a format {BUNDLE_FORMAT} rules bundle")
+            header_end = self._data.find(b"\n", len(BUNDLE_MAGIC))
+            if header_end < 0:
+                raise ValueError(f"{path}: truncated bundle header")
+            header = json.loads(self._data[len(BUNDLE_MAGIC):header_end])
+            if not isinstance(header.get("modes"), dict) or not isinstance(header.get("rules"), dict):
+                raise ValueError(f"{path}: incomplete bundle header")
+        except BaseException:
+            self._data.close()
+            raise
+        self._body_start = header_end + 1
+        self.version: str = header.get("version", "")
+        self.modes: Dict[str, dict] = header["modes"]
+        keywords = header.get("keywords")
+        self.keywords: Dict[str, str] = keywords if isinstance(keywords, dict) else {}
+        self._rules: Dict[str, list] = header["rules"]
+        contexts = header.get("contexts")
+        self._contexts: Dict[str, dict] = contexts if isinstance(contexts, dict) else {}
+        self._agent_index_range = header.get("agent_index")
+        self._agent_index = None
+        self._skill_index_range = header.get("skill_index")
+        self._skill_index = None
+        self._checklist_index_range = header.get("checklist_index")
+        self._checklist_index = None
+
+    def _body_bytes(self, offset: int, length: int, name: str) -> bytes:
+        start = self._body_start + offset
+        if offset < 0 or length < 0 or start + length > len(self._data):
+            raise ValueError(f"{name} is out of bounds")
+        return self._data[start:start + length]
+
+    def _body_text(self, offset: int, length: int, name: str) -> str:
+        return self._body_bytes(offset, length, name).decode("utf-8")
+
+    def rule_text(self, rule_path: str) -> str:
+        """
+        Return the content of a bundled rule file.
+
+        Raises:
+            KeyError: If the rule is not in the bundle
+            ValueError: If the rule's byte range is outside the bundle
+        """
+        offset, length = self._rules[rule_path]
+        return self._body_text(offset, length, f"rule {rule_path}")
+
+    def context(self, mode: str, variant: str = "full") -> Optional[str]:
+        """
+        Return the precomputed context of a mode, or None if the bundle has none.
+
+        Raises:
+            TypeError: If the context entry is malformed
+            ValueError: If the context's byte range is outside the bundle
+        """
+        entry = self._contexts.get(mode)
+        if entry is None or variant not in entry:
+            return None
+        offset, length = entry[variant]
+        return self._body_text(offset, length, f"{variant} context of {mode}")
+
+    def agent_index(self):
+        """
+        Return the bundled agent index (an agent_index.AgentIndex), or None
+        if the bundle has none. Parsed on first use and cached.
+
+        Raises:
+            TypeError: If the index entry is malformed
+            ValueError: If the index is out of bounds or not a valid index
+        """
+        if self._agent_index is None and self._agent_index_range is not None:
+            from .agent_index import AgentIndex
+
+            offset, length = self._agent_index_range
+            self._agent_index = AgentIndex(json.loads(self._body_text(offset, length, "agent index")))
+        return self._agent_index
+
+    def skill_index(self):
+        """
+        Return the bundled skill index (a skill_index.SkillIndex), or None
+        if the bundle has none. Loaded on first use and cached.
+
+        Raises:
+            TypeError: If the index entry is malformed
+            ValueError: If the index is out of bounds or not a valid index
+        """
+        if self._skill_index is None and self._skill_index_range is not None:
+            from .skill_index import SkillIndex
+
+            offset, length = self._skill_index_range
+            self._skill_index = SkillIndex(self._body_bytes(offset, length, "skill index"))
+        return self._skill_index
+
+    def checklist_index(self):
+        """
+        Return the bundled checklist index (a checklist_index.ChecklistIndex),
+        or None if the bundle has none. Parsed on first use and cached.
+
+        Raises:
+            TypeError: If the index entry is malformed
+            ValueError: If the index is out of bounds or not a valid index
+        """
+        if self._checklist_index is None and self._checklist_index_range is not None:
+            from .checklist_index import ChecklistIndex
+
+            offset, length = self._checklist_index_range
+            self._checklist_index = ChecklistIndex(json.loads(self._body_text(offset, length, "checklist index")))
+        return self._checklist_index
+
+
+# Loaded bundles by path: (file signature, bundle or None if unusable)
+_bundle_cache: Dict[str, Tuple[Tuple[int, int], Optional[RulesBundle]]] = {}
+
+
+def get_bundle_path() -> str:
+    """Get the rules bundle path (installed next to the hook launcher)."""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(os.path.dirname(package_dir), BUNDLE_FILENAME)
+
+
+def load_rules_bundle(path: Optional[str] = None) -> Optional[RulesBundle]:
+    """
+    Load the rules bundle, or return None if it is missing or unusable.
+
+    Bundles are cached per path and only reloaded when the file's
+    signature changes, so a resident daemon maps the bundle once and
+    still picks up reinstalls.
+    """
+    path = path or get_bundle_path()
+    signature = _file_signature(path)
+    if signature is None:
+        return None
+    cached = _bundle_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    try:
+        bundle: Optional[RulesBundle] = RulesBundle(path)
+    except (OSError, ValueError):
+        bundle = None
+    _bundle_cache[path] = (signature, bundle)
+    return bundle
+
+
+def get_keyword_table() -> Dict[str, str]:
+    """Return the bundle's keyword table, or the built-in one without a bundle."""
+    bundle = load_rules_bundle()
+    if bundle is not None and bundle.keywords:
+        return bundle.keywords
+    return get_default_keyword_table()
+
+
+def _extract_section(lines: List[str], start: str, end: str) -> List[str]:
+    """Return the lines from the start heading up to (excluding) the end heading."""
+    try:
+        first = lines.index(start)
+    except ValueError:
+        return []
+    try:
+        return lines[first:lines.index(end, first)]
+    except ValueError:
+        return lines[first:]
+
+
+def filter_rule(mode: str, rule_path: str, content: str) -> str:
+    """
+    Reduce a rule file to what the mode needs, like the MCP server's
+    filterRulesByMode.
+
+    Only core.md is filtered, and only for modes with their own section;
+    a core.md without that section is returned unchanged.
+    """
+    markers = CORE_MODE_SECTIONS.get(mode)
+    if rule_path != CORE_RULES_PATH or markers is None:
+        return content
+    lines = content.split("\n")
+    section = _extract_section(lines, *markers)
+    if not section:
+        return content
+    return "\n".join(
+        _extract_section(lines, *CORE_COMMON_SECTION) + section + ["", FILTERED_RULE_NOTE.format(mode=mode)]
+    )
+
+
+def render_context(mode: str, entry: dict, version: str, rule_text: Callable[[str], str]) -> str:
+    """
+    Render the full inline context of a bundled mode.
+
+    Rules are filtered for the mode (see filter_rule). compile-rules-bundle.py
+    stores the result in the bundle, so the hook only renders it for
+    bundles without precomputed contexts.
+
+    Raises:
+        KeyError: If a rule is missing
+        TypeError: If the mode entry is malformed
+        ValueError: If a rule cannot be read
+    """
+    rules = "".join(
+        RULE_TEMPLATE.format(path=rule_path, content=filter_rule(mode, rule_path, rule_text(rule_path)).rstrip("\n"))
+        for rule_path in entry.get("rules", ())
+    )
+    return INLINE_CONTEXT_TEMPLATE.format(
+        mode=mode,
+        version=version,
+        description=entry.get("description", ""),
+        instructions=entry.get("instructions", ""),
+        agent=entry.get("agent", ""),
+        delegates_to=entry.get("delegates_to", ""),
+        specialists=", ".join(entry.get("defaultSpecialists", ())),
+        rules=rules,
+    )
+
+
+def render_compact_context(mode: str) -> str:
+    """Render the short marker emitted when a session repeats a mode."""
+    return COMPACT_CONTEXT_TEMPLATE.format(mode=mode)
+
+
+def select_variant(detections: int) -> str:
+    """
+    Choose the context variant for the n-th detection of a mode in a row.
+
+    The first detection and every FULL_CONTEXT_EVERY-th repeat get the
+    full block; CODINGBUDDY_CONTEXT=full always does.
+    """
+    if os.environ.get(CONTEXT_ENV, "").lower() == "full":
+        return "full"
+    if detections <= 1 or (detections - 1) % FULL_CONTEXT_EVERY == 0:
+        return "full"
+    return "compact"
+
+
+def _fallback_context(mode: str, variant: str) -> str:
+    """Return the context of a mode that needs no rules bundle."""
+    return render_compact_context(mode) if variant == "compact" else CONTEXT_TEMPLATE.format(mode=mode)
+
+
+def build_context(mode: str, bundle: Optional[RulesBundle] = None, variant: str = "full") -> str:
+    """
+    Build the context block for a detected mode.
+
+    Uses the bundle's precomputed context for the variant. Falls back to
+    the parse_mode trigger (or the generic compact marker) when no usable
+    bundle entry exists.
+    """
+    if bundle is None:
+        bundle = load_rules_bundle()
+    entry = bundle.modes.get(mode) if bundle is not None else None
+    if not isinstance(entry, dict):
+        return _fallback_context(mode, variant)
+    try:
+        context = bundle.context(mode, variant)
+        if context is not None:
+            return context
+        if variant == "compact":
+            return render_compact_context(mode)
+        return render_context(mode, entry, bundle.version, bundle.rule_text)
+    except (KeyError, TypeError, ValueError):
+        return _fallback_context(mode, variant)
+
+
+def find_project_config(start: str) -> Optional[str]:
+    """Return the nearest codingbuddy.config.* at or above start, or None."""
+    directory = os.path.abspath(start)
+    for _ in range(PROJECT_CONFIG_MAX_PARENTS + 1):
+        for name in PROJECT_CONFIG_FILENAMES:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return None
+
+
+def project_selects_agents(cwd: str) -> bool:
+    """Whether the project config pins or excludes primary agents."""
+    path = find_project_config(cwd)
+    if path is None:
+        return False
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError):
+        return False
+    if not path.endswith(".json"):
+        return any(key in text for key in AGENT_CONFIG_KEYS)
+    try:
+        ai = json.loads(text).get("ai")
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(ai, dict) and any(ai.get(key) for key in AGENT_CONFIG_KEYS)
+
+
+def recommend_agent(
+    mode: str, prompt: str, bundle: Optional[RulesBundle] = None, cwd: Optional[str] = None
+) -> str:
+    """
+    Build the primary agent suggestion for a prompt with a detected mode.
+
+    Only RECOMMEND_AGENT_MODES that delegate to an indexed primary agent
+    get one, and only when the project config at or above cwd (default:
+    the working directory) does not pick agents itself.
+
+    Returns:
+        Suggestion block, or an empty string if the bundle has no agent
+        index or no agent clearly matches the prompt
+    """
+    if mode not in RECOMMEND_AGENT_MODES:
+        return ""
+    if bundle is None:
+        bundle = load_rules_bundle()
+    entry = bundle.modes.get(mode) if bundle is not None else None
+    if not isinstance(entry, dict):
+        return ""
+    try:
+        index = bundle.agent_index()
+        if index is None or entry.get("delegates_to") not in index.agents:
+            return ""
+        recommendation = index.recommend(prompt)
+    except (TypeError, ValueError):
+        return ""
+    if recommendation is None or project_selects_agents(cwd if isinstance(cwd, str) and cwd else os.getcwd()):
+        return ""
+    from .agent_index import render_recommendation
+
+    return render_recommendation(*recommendation)
+
+
+def strip_keyword(prompt: str) -> str:
+    """
+    Return the prompt without its leading mode keyword, if it has one.
+
+    The keyword is matched on the same NFKC-normalized window as in
+    match_keyword(), so "ＰＬＡＮ：" is stripped as well as "PLAN:".
+    """
+    first = _NON_SPACE.search(prompt, 0, PROMPT_HEAD_CHARS)
+    if first is None or detect_mode(prompt) is None:
+        return prompt
+    head = prompt[:min(first.start() + DETECT_WINDOW, PROMPT_HEAD_CHARS)]
+    if head.isascii():
+        match = _KEYWORD_TOKEN.match(head)
+        return prompt[match.end():] if match else prompt
+    import unicodedata
+
+    match = _KEYWORD_TOKEN.match(unicodedata.normalize("NFKC", head))
+    if match is None:
+        return prompt
+    # Map the end of the match back to the raw prompt, character by character
+    length = 0
+    for i, char in enumerate(head):
+        if length >= match.end():
+            return prompt[i:]
+        length += len(unicodedata.normalize("NFKC", char))
+    return prompt[len(head):]
+
+
+def suggest_skills(prompt: str, bundle: Optional[RulesBundle] = None) -> str:
+    """
+    Build the skill suggestions for a prompt with a detected mode.
+
+    The mode keyword is left out of the match, so "PLAN:" alone does not
+    suggest the planning skills.
+
+    Returns:
+        Suggestion block, or an empty string if the bundle has no skill
+        index or no skill is similar enough to the prompt
+    """
+    if bundle is None:
+        bundle = load_rules_bundle()
+    if bundle is None:
+        return ""
+    try:
+        index = bundle.skill_index()
+        if index is None:
+            return ""
+        suggestions = index.suggest(strip_keyword(prompt))
+    except (IndexError, KeyError, TypeError, ValueError):
+        return ""
+    if not suggestions:
+        return ""
+    from .skill_index import render_suggestions
+
+    return render_suggestions(suggestions)
+
+
+def select_checklist(mode: str, prompt: str, bundle: Optional[RulesBundle] = None) -> str:
+    """
+    Build the pre-selected checklist items for a prompt of a CHECKLIST_MODES mode.
+
+    Returns:
+        Checklist block, or an empty string for other modes, without a
+        checklist index or if the prompt triggers no item
+    """
+    if mode not in CHECKLIST_MODES:
+        return ""
+    if bundle is None:
+        bundle = load_rules_bundle()
+    if bundle is None:
+        return ""
+    try:
+        index = bundle.checklist_index()
+        if index is None:
+            return ""
+        selection = index.select(strip_keyword(prompt))
+    except (IndexError, KeyError, TypeError, ValueError):
+        return ""
+    if selection is None:
+        return ""
+    from .checklist_index import render_selection
+
+    return render_selection(*selection)
+
+
+def process_input(
+    stream: TextIO, timer: Optional[PhaseTimer] = None, budget: Optional[Budget] = None
+) -> str:
+    """
+    Read a hook payload from a stream and build the context to emit.
+
+    With a budget, the optional phases (session store, rules bundle,
+    agent, skills and checklist) are skipped once it is spent. Its hard
+    stop is armed only for them, after detection, and keeps what was
+    built so far. A detected mode always gets at least the basic context
+    asking for parse_mode.
+
+    Args:
+        stream: Text stream containing the hook's JSON input
+        timer: Optional latency timer; records the parse, detect, session
+            (when the session store is used), context, and agent, skills
+            and checklist (when a mode is detected) phases
+        budget: Optional latency budget of this run
+
+    Returns:
+        Context block for Claude, or an empty string if no mode was detected
+        and the session has no active mode
+
+    Raises:
+        json.JSONDecodeError: If the payload is not valid JSON
+    """
+    input_data = read_payload(stream)
+    prompt = input_data.get("prompt", "")
+    if timer:
+        timer.lap("parse")
+
+    # Detect mode keyword
+    detected_mode = detect_mode(prompt)
+    if timer:
+        timer.lap("detect")
+
+    output = ""
+    blocks = []
+    variant = "full"
+    try:
+        if budget is not None:
+            budget.arm()
+        active = None
+        session_id = input_data.get("session_id")
+        if session_id and session_state_enabled() and (budget is None or budget.allows("session")):
+            from . import session_state
+
+            active = session_state.track(session_id, detected_mode)
+            if timer:
+                timer.lap("session")
+
+        if detected_mode:
+            # Without session state every detection counts as the first
+            variant = select_variant(active[3]) if active is not None else "full"
+            # The mode context comes first; the hints are the first to go
+            if budget is None or budget.allows("context"):
+                output = build_context(detected_mode, variant=variant)
+            if timer:
+                timer.lap("context")
+            if budget is None or budget.allows("agent"):
+                blocks.append(recommend_agent(detected_mode, prompt, cwd=input_data.get("cwd")))
+            if timer:
+                timer.lap("agent")
+            if budget is None or budget.allows("skills"):
+                blocks.append(suggest_skills(prompt))
+            if timer:
+                timer.lap("skills")
+            if budget is None or budget.allows("checklist"):
+                blocks.append(select_checklist(detected_mode, prompt))
+            if timer:
+                timer.lap("checklist")
+        else:
+            if active is not None:
+                output = ACTIVE_MODE_TEMPLATE.format(mode=active[0], prompts=active[2] - 1)
+            if timer:
+                timer.lap("context")
+    except BudgetExceeded:
+        # Keep what was built; a detected mode falls back below
+        pass
+    finally:
+        if budget is not None:
+            budget.disarm()
+    if detected_mode and not output:
+        output = _fallback_context(detected_mode, variant)
+    for block in blocks:
+        if block:
+            output = f"{output}\n{block}"
+    return output
+
+
+def get_socket_path() -> str:
+    """
+    Get the per-user Unix socket path of the resident daemon.
+
+    Keep in sync with mode-detect-client.py.
+    """
+    override = os.environ.get(SOCKET_ENV)
+    if override:
+        return override
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "codingbuddy", SOCKET_NAME)
+    return os.path.join("/tmp", f"codingbuddy-{os.getuid()}", SOCKET_NAME)
+
+
+def _is_socket_alive(socket_path: str) -> bool:
+    """Check whether a daemon is accepting connections on socket_path."""
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+
+def serve(socket_path: Optional[str] = None, idle_timeout: float = DAEMON_IDLE_TIMEOUT) -> None:
+    """
+    Run the resident mode detection daemon.
+
+    Each connection carries one hook payload (terminated by the client
+    shutting down its write side) and receives the context to print.
+    The daemon exits after idle_timeout seconds without requests, or
+    immediately if another daemon already owns the socket. When any
+    module of the installed package or the rules bundle is replaced on
+    disk (a plugin upgrade), the daemon restarts itself after the current
+    request so it never serves stale code.
+
+    Args:
+        socket_path: Socket to listen on (defaults to get_socket_path())
+        idle_timeout: Seconds of inactivity before shutting down
+    """
+    import io
+    import socketserver
+
+    socket_path = socket_path or get_socket_path()
+    socket_dir = os.path.dirname(socket_path)
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    # Security: refuse to listen in a directory another user controls
+    if os.stat(socket_dir).st_uid != os.getuid():
+        raise PermissionError(f"{socket_dir} is not owned by the current user")
+
+    if os.path.exists(socket_path):
+        if _is_socket_alive(socket_path):
+            return
+        os.unlink(socket_path)
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            try:
+                # Request threads get no hard stop, only the checks between phases
+                output = process_input(
+                    io.TextIOWrapper(self.rfile, encoding="utf-8"), budget=start_budget(HOOK_NAME)
+                )
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                output = ""
+            except Exception as e:
+                print(f"CodingBuddy daemon error: {e}", file=sys.stderr)
+                output = ""
+            if output:
+                self.wfile.write((output + "\n").encode("utf-8"))
+
+    class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        idle = False
+
+        def handle_timeout(self) -> None:
+            self.idle = True
+
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(socket_path, _Handler)
+    except OSError:
+        # Another daemon won the race for the socket
+        return
+    finally:
+        os.umask(old_umask)
+
+    # Upgrades replace package modules and the bundle (the launcher rarely changes)
+    install_signature = _install_signature()
+    upgraded = False
+
+    server.timeout = idle_timeout
+    try:
+        while not server.idle and not upgraded:
+            server.handle_request()
+            upgraded = _install_signature() != install_signature
+    finally:
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+    if upgraded:
+        _restart_daemon(os.path.abspath(sys.argv[0]), socket_path)
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Return (size, mtime_ns) of path, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _install_signature() -> Tuple[Tuple[str, Optional[Tuple[int, int]]], ...]:
+    """
+    Return the signatures of the installed package modules and the bundle.
+
+    Covers every module of the package, not only this one: an upgrade may
+    change just the session store, an index module or the bundle.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        names = sorted(name for name in os.listdir(package_dir) if name.endswith(".py"))
+    except OSError:
+        names = []
+    paths = [os.path.join(package_dir, name) for name in names] + [get_bundle_path()]
+    return tuple((path, _file_signature(path)) for path in paths)
+
+
+def _restart_daemon(script_path: str, socket_path: str) -> None:
+    """Replace this process with a daemon started from the hook launcher."""
+    from . import interpreter_args
+
+    if os.path.isfile(script_path):
+        os.environ[SOCKET_ENV] = socket_path
+        os.execv(sys.executable, [sys.executable, *interpreter_args(), script_path, "--daemon"])
+
+
+def _start_timer() -> Optional[PhaseTimer]:
+    """Start the latency timer, or return None when recording is disabled."""
+    if not latency_enabled():
+        return None
+    from .latency import PhaseTimer
+
+    return PhaseTimer(HOOK_NAME)
+
+
+def main(stream: Optional[TextIO] = None):
+    """Main entry point for the hook."""
+    timer = _start_timer()
+    budget = start_budget(HOOK_NAME)
+    try:
+        output = process_input(sys.stdin if stream is None else stream, timer, budget)
+
+        if output:
+            # Output mandatory context for Claude
+            print(output)
+
+        # Exit successfully (exit code 0 = success, output added as context)
+        sys.exit(0)
+
+    except BudgetExceeded:
+        # The hard stop missed process_input()'s handler by a hair
+        sys.exit(0)
+    except json.JSONDecodeError:
+        # Invalid JSON input - silently ignore
+        sys.exit(0)
+    except Exception as e:
+        # Log error to stderr but don't block
+        print(f"CodingBuddy hook error: {e}", file=sys.stderr)
+        sys.exit(0)
+    finally:
+        if budget is not None:
+            budget.disarm()
+        if timer:
+            if budget is not None and budget.degraded:
+                timer.add("degraded", budget.overrun())
+            timer.flush()
+
+
+def run_main() -> None:
+    """Run main(), under the profiler selected by CODINGBUDDY_PROFILE if set."""
+    if os.environ.get(PROFILE_ENV):
+        try:
+            from . import profiling
+        except ImportError:
+            print("CodingBuddy: profiling module not installed", file=sys.stderr)
+        else:
+            profiling.run(main, HOOK_NAME)
+            return
+    main()
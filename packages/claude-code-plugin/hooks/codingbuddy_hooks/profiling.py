@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+CodingBuddy Hook Profiler
+
+Runs a hook's main() under a profiler selected by CODINGBUDDY_PROFILE:
+
+    cpu      cProfile; writes <name>.prof (pstats) and a <name>.txt summary
+    mem      tracemalloc; writes the top allocation sites to <name>.txt
+    imports  re-runs the hook under ``python3 -X importtime``; the import
+             timing report (and anything else on stderr) goes to <name>.txt
+
+Results are written to $XDG_CACHE_HOME/codingbuddy/profiles (default
+~/.cache/codingbuddy/profiles, override with CODINGBUDDY_PROFILE_DIR) as
+<hook>-<timestamp>-<pid>.*. stdout is never touched, since Claude reads
+it as context.
+
+The hooks import this module only when CODINGBUDDY_PROFILE is set.
+"""
+
+import os
+import sys
+import time
+from typing import Callable, List, Optional
+
+PROFILE_ENV = "CODINGBUDDY_PROFILE"
+PROFILE_DIR_ENV = "CODINGBUDDY_PROFILE_DIR"
+PROFILE_MODES = ("cpu", "mem", "imports")
+
+# Rows shown in the text summaries
+SUMMARY_LIMIT = 40
+# Frames kept per tracemalloc allocation
+TRACEMALLOC_FRAMES = 10
+
+
+def get_profile_dir() -> str:
+    """Get the directory profiles are written to."""
+    override = os.environ.get(PROFILE_DIR_ENV)
+    if override:
+        return override
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "codingbuddy", "profiles")
+
+
+def profile_base_path(hook: str) -> str:
+    """Return a new timestamped path (without extension) for a profile."""
+    profile_dir = get_profile_dir()
+    os.makedirs(profile_dir, mode=0o700, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(profile_dir, f"{hook}-{stamp}-{os.getpid()}")
+
+
+def _profile_cpu(main: Callable[[], None], base_path: str) -> None:
+    import cProfile
+    import io
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(main)
+    finally:
+        profiler.dump_stats(base_path + ".prof")
+        summary = io.StringIO()
+        stats = pstats.Stats(profiler, stream=summary)
+        stats.sort_stats("cumulative").print_stats(SUMMARY_LIMIT)
+        with open(base_path + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+
+
+def _profile_mem(main: Callable[[], None], base_path: str) -> None:
+    import tracemalloc
+
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        main()
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(base_path + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"tracemalloc: current={current} B peak={peak} B\n\n")
+            for stat in snapshot.statistics("lineno")[:SUMMARY_LIMIT]:
+                f.write(f"{stat}\n")
+
+
+def _profile_imports(main: Callable[[], None], hook: str, argv: List[str]) -> None:
+    if "importtime" in sys._xoptions:
+        # Already re-executed: imports have been traced to stderr
+        main()
+        return
+    base_path = profile_base_path(hook)
+    fd = os.open(base_path + ".txt", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    sys.stderr.flush()
+    os.dup2(fd, 2)
+    os.close(fd)
+    # stdin has not been read yet, so the new process sees the full payload;
+    # -I/-S are kept so the trace matches what the hook normally imports
+    from . import interpreter_args
+
+    os.execv(sys.executable, [sys.executable, *interpreter_args(), "-X", "importtime"] + argv)
+
+
+def run(main: Callable[[], None], hook: str, mode: Optional[str] = None,
+        argv: Optional[List[str]] = None) -> None:
+    """
+    Run main() under the profiler selected by mode (default: $CODINGBUDDY_PROFILE).
+
+    SystemExit from main() propagates after the profile is written.
+    Unknown modes run main() unprofiled with a warning on stderr.
+    """
+    mode = (mode if mode is not None else os.environ.get(PROFILE_ENV, "")).strip().lower()
+    if mode == "cpu":
+        _profile_cpu(main, profile_base_path(hook))
+    elif mode == "mem":
+        _profile_mem(main, profile_base_path(hook))
+    elif mode == "imports":
+        _profile_imports(main, hook, sys.argv if argv is None else argv)
+    else:
+        if mode:
+            print(
+                f"CodingBuddy: unknown {PROFILE_ENV}={mode!r} "
+                f"(expected one of {', '.join(PROFILE_MODES)})",
+                file=sys.stderr,
+            )
+        main()
@@ -0,0 +1,1328 @@
+"""
+CodingBuddy Session Start Hook
+
+Automatically installs the UserPromptSubmit hook for mode detection
+when a Claude Code session starts.
+
+This hook:
+1. Checks if the mode detection hook is installed and up to date
+2. If not, copies it to ~/.claude/hooks/ (atomically replacing old versions)
+3. Registers it in ~/.claude/settings.json
+
+Set CODINGBUDDY_HOOK_MODE=resident to register the lightweight socket
+client instead of the classic hook. The client talks to a resident mode
+detection daemon, which this hook starts in the background.
+
+The installed hook is a small launcher plus the codingbuddy_hooks package
+(with checked-hash .pyc files), registered to run as python3 -I -S. The
+session-start.py launcher only imports this module when the install
+stamp (install_stamp.py) is not current, or in the detached worker that
+installs when CODINGBUDDY_INSTALL=background.
+"""
+
+import heapq
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# File locking (Unix only, optional on Windows)
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+from . import install_stamp, latency_enabled
+from .budget import BudgetExceeded, start_budget
+from .install_stamp import (
+    CLIENT_FILENAME,
+    HOOK_FILENAME,
+    HOOK_MODE_CLASSIC,
+    HOOK_MODE_RESIDENT,
+    HOOK_PACKAGE_MODULES,
+    INSTALL_LOCK_FILENAME,
+    INSTALL_REPORT_FILENAME,
+    PACKAGE_NAME,
+    PROFILE_ENV,
+    SOURCE_FILENAME,
+    STAMP_FILENAME,
+    SUPPORT_FILENAMES,
+    get_hook_mode,
+    is_stamp_current,
+)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .latency import PhaseTimer
+
+
+# Constants
+# -I: ignore PYTHON* variables and the user site; -S: skip site.py
+HOOK_COMMAND = f"python3 -I -S ~/.claude/hooks/{HOOK_FILENAME}"
+
+# Modules that earlier versions installed as loose files next to the hook
+LEGACY_SUPPORT_FILENAMES = ("codingbuddy_latency.py", "codingbuddy_profile.py")
+
+# Plugin cache roots searched for the hook source (relative to home)
+PLUGIN_CACHE_PATHS = (
+    ".claude/plugins/cache/jeremydev87/codingbuddy",
+    ".claude/plugins/cache/codingbuddy",
+    ".claude/plugins/codingbuddy",
+)
+# Development checkouts searched last (relative to home)
+DEV_SOURCE_PATTERNS = (
+    "workspace/codebuddy/packages/claude-code-plugin/hooks",
+    "dev/codebuddy/packages/claude-code-plugin/hooks",
+    "projects/codebuddy/packages/claude-code-plugin/hooks",
+    "code/codebuddy/packages/claude-code-plugin/hooks",
+)
+SOURCE_CACHE_FILENAME = ".codingbuddy-source.json"
+VERSION_INDEX_FILENAME = ".codingbuddy-versions.json"
+VERSION_INDEX_FORMAT = 1
+
+# Plugin cache garbage collection (opt-in: no limit unless the variable is set)
+CACHE_RETENTION_ENV = "CODINGBUDDY_CACHE_RETENTION"
+DEFAULT_CACHE_RETENTION = 0
+VERSION_DIR_PATTERN = re.compile(r"^v?\d+(\.\d+)*([-+][0-9A-Za-z.-]+)?$")
+
+# Resident mode (socket client + mode detection daemon)
+CLIENT_SOURCE_FILENAME = "mode-detect-client.py"
+CLIENT_COMMAND = f"python3 -I -S ~/.claude/hooks/{CLIENT_FILENAME}"
+HOOK_COMMANDS = {
+    HOOK_MODE_CLASSIC: HOOK_COMMAND,
+    HOOK_MODE_RESIDENT: CLIENT_COMMAND,
+}
+# Commands registered by earlier versions, replaced on the next install
+LEGACY_HOOK_COMMANDS = (
+    f"python3 ~/.claude/hooks/{HOOK_FILENAME}",
+    f"python3 -S ~/.claude/hooks/{CLIENT_FILENAME}",
+)
+
+# Install lease: one session start installs, concurrent ones wait this
+# long for it and reuse its result (see acquire_install_lease())
+INSTALL_LEASE_TIMEOUT = 3.0
+
+# Plugin launcher, restarted as the background install worker when a
+# session start runs out of its latency budget (see budget.py)
+LAUNCHER_FILENAME = "session-start.py"
+
+# settings.json transactions
+SETTINGS_LOCK_SUFFIX = ".lock"
+SETTINGS_LOCK_TIMEOUT = 2.0
+_LOCK_POLL_INTERVAL = 0.01
+
+# Hook upgrades
+HOOK_VERSION_PATTERN = re.compile(rb'^HOOK_VERSION = "([^"]+)"', re.MULTILINE)
+_VERSION_HEADER_BYTES = 4096
+
+# i18n Messages
+MESSAGES: Dict[str, Dict[str, str]] = {
+    "en": {
+        "installed": "CodingBuddy mode detection hook installed",
+        "upgraded": "CodingBuddy mode detection hook updated to {version}",
+        "patterns": "   PLAN:/ACT:/EVAL:/AUTO: patterns will be auto-detected",
+        "source_not_found": "CodingBuddy: Could not find hook source file. Please reinstall the plugin or check the installation.",
+        "permission_error": "CodingBuddy: Permission error - {error}",
+        "permission_hint": "Try running: chmod +x ~/.claude/hooks/codingbuddy-mode-detect.py",
+        "setup_error": "CodingBuddy hook setup error: {error}",
+        "backup_corrupted": "Backed up corrupted settings to {path}",
+        "lock_timeout": "CodingBuddy: settings.json is locked by another process, hook registration will be retried next session",
+        "gc_removed": "Removed old plugin version {path}",
+        "gc_would_remove": "Would remove old plugin version {path}",
+    },
+    "ko": {
+        "installed": "CodingBuddy 모드 감지 훅이 설치되었습니다",
+        "upgraded": "CodingBuddy 모드 감지 훅이 {version}(으)로 업데이트되었습니다",
+        "patterns": "   PLAN:/ACT:/EVAL:/AUTO: 패턴이 자동 감지됩니다",
+        "source_not_found": "CodingBuddy: 훅 소스 파일을 찾을 수 없습니다. 플러그인을 재설치하거나 설치를 확인하세요.",
+        "permission_error": "CodingBuddy: 권한 오류 - {error}",
+        "permission_hint": "실행: chmod +x ~/.claude/hooks/codingbuddy-mode-detect.py",
+        "setup_error": "CodingBuddy 훅 설정 오류: {error}",
+        "backup_corrupted": "손상된 설정을 {path}에 백업했습니다",
+        "lock_timeout": "CodingBuddy: 다른 프로세스가 settings.json을 잠그고 있어 다음 세션에서 훅 등록을 다시 시도합니다",
+        "gc_removed": "이전 플러그인 버전을 삭제했습니다: {path}",
+        "gc_would_remove": "삭제 예정인 이전 플러그인 버전: {path}",
+    },
+    "ja": {
+        "installed": "CodingBuddyモード検出フックがインストールされました",
+        "upgraded": "CodingBuddyモード検出フックが{version}に更新されました",
+        "patterns": "   PLAN:/ACT:/EVAL:/AUTO: パターンが自動検出されます",
+        "source_not_found": "CodingBuddy: フックソースファイルが見つかりません。プラグインを再インストールするか、インストールを確認してください。",
+        "permission_error": "CodingBuddy: 権限エラー - {error}",
+        "permission_hint": "実行: chmod +x ~/.claude/hooks/codingbuddy-mode-detect.py",
+        "setup_error": "CodingBuddyフック設定エラー: {error}",
+        "backup_corrupted": "破損した設定を{path}にバックアップしました",
+        "lock_timeout": "CodingBuddy: settings.jsonが他のプロセスによってロックされているため、次のセッションでフック登録を再試行します",
+        "gc_removed": "古いプラグインバージョンを削除しました: {path}",
+        "gc_would_remove": "削除予定の古いプラグインバージョン: {path}",
+    },
+    "zh": {
+        "installed": "CodingBuddy模式检测钩子已安装",
+        "upgraded": "CodingBuddy模式检测钩子已更新到{version}",
+        "patterns": "   PLAN:/ACT:/EVAL:/AUTO: 模式将被自动检测",
+        "source_not_found": "CodingBuddy: 找不到钩子源文件。请重新安装插件或检查安装。",
+        "permission_error": "CodingBuddy: 权限错误 - {error}",
+        "permission_hint": "执行: chmod +x ~/.claude/hooks/codingbuddy-mode-detect.py",
+        "setup_error": "CodingBuddy钩子设置错误: {error}",
+        "backup_corrupted": "已将损坏的设置备份到{path}",
+        "lock_timeout": "CodingBuddy: settings.json被其他进程锁定，将在下次会话时重试钩子注册",
+        "gc_removed": "已删除旧插件版本: {path}",
+        "gc_would_remove": "将删除旧插件版本: {path}",
+    },
+    "es": {
+        "installed": "Hook de detección de modo CodingBuddy instalado",
+        "upgraded": "Hook de detección de modo CodingBuddy actualizado a {version}",
+        "patterns": "   PLAN:/ACT:/EVAL:/AUTO: los patrones serán detectados automáticamente",
+        "source_not_found": "CodingBuddy: No se pudo encontrar el archivo fuente del hook. Por favor reinstale el plugin o verifique la instalación.",
+        "permission_error": "CodingBuddy: Error de permisos - {error}",
+        "permission_hint": "Ejecute: chmod +x ~/.claude/hooks/codingbuddy-mode-detect.py",
+        "setup_error": "Error de configuración del hook CodingBuddy: {error}",
+        "backup_corrupted": "Se respaldó la configuración corrupta en {path}",
+        "lock_timeout": "CodingBuddy: settings.json está bloqueado por otro proceso, el registro del hook se reintentará en la próxima sesión",
+        "gc_removed": "Se eliminó la versión antigua del plugin {path}",
+        "gc_would_remove": "Se eliminaría la versión antigua del plugin {path}",
+    },
+}
+
+
+# Language cache (module-level singleton)
+_cached_language: Optional[str] = None
+
+
+def get_system_language() -> str:
+    """Get the system language code (en, ko, ja, zh, es)."""
+    try:
+        # Try environment variables first (most reliable, cross-version)
+        for env_var in ("LANG", "LC_ALL", "LC_MESSAGES", "LANGUAGE"):
+            lang = os.environ.get(env_var)
+            if lang:
+                lang_code = lang.split("_")[0].split(".")[0].lower()
+                if lang_code in MESSAGES:
+                    return lang_code
+        return "en"
+    except Exception:
+        return "en"
+
+
+def _get_cached_language() -> str:
+    """Get cached language, computing once on first call."""
+    global _cached_language
+    if _cached_language is None:
+        _cached_language = get_system_language()
+    return _cached_language
+
+
+def msg(key: str, **kwargs) -> str:
+    """Get a localized message by key."""
+    lang = _get_cached_language()
+    lang_messages = MESSAGES.get(lang, MESSAGES["en"])
+    template = lang_messages.get(key) or MESSAGES["en"].get(key, key)
+    return template.format(**kwargs) if kwargs else template
+
+
+def parse_version(version_str: str) -> Tuple[int, ...]:
+    """
+    Parse a version string into a tuple of integers for comparison.
+
+    Handles formats like: "3.0.0", "3.1.0-beta", "v2.0.0"
+
+    Args:
+        version_str: Version string to parse
+
+    Returns:
+        Tuple of integers for comparison (e.g., (3, 1, 0))
+    """
+    # Remove leading 'v' if present
+    version_str = version_str.lstrip('v')
+
+    # Extract numeric parts
+    match = re.match(r'^(\d+)(?:\.(\d+))?(?:\.(\d+))?', version_str)
+    if match:
+        parts = [int(p) if p else 0 for p in match.groups()]
+        return tuple(parts)
+
+    # Fallback: return (0, 0, 0) for unparseable versions
+    return (0, 0, 0)
+
+
+def sort_version_dirs(dirs: List[Path]) -> List[Path]:
+    """
+    Sort directory paths by semantic version (descending).
+
+    Args:
+        dirs: List of directory paths with version names
+
+    Returns:
+        Sorted list with highest version first
+    """
+    return sorted(dirs, key=lambda d: parse_version(d.name), reverse=True)
+
+
+def _find_source_from_env() -> Optional[Path]:
+    """Check CLAUDE_PLUGIN_DIR environment variable for source.
+
+    Security: Validates that the path resolves to a real location
+    and the source file exists before returning.
+    """
+    plugin_dir = os.environ.get("CLAUDE_PLUGIN_DIR")
+    if plugin_dir:
+        try:
+            # Resolve symlinks and normalize path for security
+            resolved_dir = Path(plugin_dir).resolve()
+            source = resolved_dir / "hooks" / SOURCE_FILENAME
+            # Verify file exists and is a regular file (not symlink to unexpected location)
+            if source.exists() and source.is_file():
+                return source.resolve()
+        except (OSError, ValueError):
+            # Invalid path - skip silently
+            pass
+    return None
+
+
+def _dir_signature(path: Path) -> Optional[List[int]]:
+    """
+    Return [mtime_ns, nlink] of a directory, or None if it does not exist.
+
+    Adding or removing an entry changes the directory's mtime (and link
+    count on most filesystems).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_nlink]
+
+
+def _scan_version_names(resolved_base: Path, known: List[list]) -> List[list]:
+    """
+    List the version directories of a cache root, newest first.
+
+    Entries are [name, parsed_version] pairs. Names already present in
+    known (the previous scan, newest first) are not parsed again; only
+    new directories are parsed and merged in.
+    """
+    with os.scandir(resolved_base) as entries:
+        names = {entry.name for entry in entries if entry.is_dir()}
+
+    kept = [item for item in known if item[0] in names]
+    kept_names = {item[0] for item in kept}
+    added = [[name, list(parse_version(name))] for name in names - kept_names]
+    if not added:
+        return kept
+    added.sort(key=lambda item: item[1], reverse=True)
+    return list(heapq.merge(kept, added, key=lambda item: item[1], reverse=True))
+
+
+def _find_source_in_cache_root(base_path: Path, roots_index: dict) -> Optional[Path]:
+    """Return the newest valid hook source under one plugin cache root.
+
+    Security: Uses Path.resolve() to prevent symlink traversal attacks.
+    """
+    try:
+        resolved_base = base_path.resolve()
+        if resolved_base.exists() and resolved_base.is_dir():
+            key = str(resolved_base)
+            signature = _dir_signature(resolved_base)
+            entry = roots_index.get(key) or {}
+            if entry.get("signature") == signature:
+                versions = entry["versions"]
+            else:
+                versions = _scan_version_names(resolved_base, entry.get("versions", []))
+                roots_index[key] = {"signature": signature, "versions": versions}
+
+            for name, _ in versions:
+                source = resolved_base / name / "hooks" / SOURCE_FILENAME
+                resolved_source = source.resolve()
+                if resolved_source.exists() and resolved_source.is_file():
+                    return resolved_source
+    except (OSError, ValueError, KeyError, TypeError):
+        # Invalid path or index entry - skip silently
+        pass
+    return None
+
+
+def _find_source_from_cache(home: Path, index: Optional[dict] = None) -> Optional[Path]:
+    """Check known plugin cache paths for source.
+
+    With a version index (see load_version_index()), an unchanged cache
+    root is not listed at all and only its newest valid version is
+    checked; a changed root only has its new entries parsed.
+    """
+    roots_index = index.setdefault("roots", {}) if index is not None else {}
+
+    for path in PLUGIN_CACHE_PATHS:
+        source = _find_source_in_cache_root(home / path, roots_index)
+        if source:
+            return source
+    return None
+
+
+def load_version_index(index_file: Path) -> dict:
+    """Load the plugin cache version index, or an empty one."""
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if isinstance(index, dict) and index.get("format") == VERSION_INDEX_FORMAT:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"format": VERSION_INDEX_FORMAT, "roots": {}}
+
+
+def save_version_index(index_file: Path, index: dict) -> None:
+    """Persist the plugin cache version index atomically."""
+    tmp_file = index_file.with_name(f"{index_file.name}.{os.getpid()}.tmp")
+    try:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_file, index_file)
+    except OSError:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+
+
+def get_cache_retention() -> int:
+    """Get how many plugin versions to keep per cache root (0, the default, disables GC)."""
+    try:
+        return max(0, int(os.environ.get(CACHE_RETENTION_ENV, DEFAULT_CACHE_RETENTION)))
+    except ValueError:
+        return DEFAULT_CACHE_RETENTION
+
+
+def gc_plugin_cache(
+    home: Path,
+    retention: int,
+    dry_run: bool = False,
+    keep: Tuple[Path, ...] = (),
+) -> List[Path]:
+    """
+    Remove plugin version directories beyond the newest `retention`.
+
+    Only real (non-symlink) directories whose names look like versions are
+    considered. Directories containing any path in keep (the running
+    plugin, the hook source in use) are never removed.
+
+    Args:
+        home: User home directory
+        retention: Versions to keep per cache root (0 disables GC)
+        dry_run: Report what would be removed without deleting
+        keep: Paths whose version directories must survive
+
+    Returns:
+        Version directories removed (or that would be removed)
+    """
+    if retention <= 0:
+        return []
+
+    keep_resolved = []
+    for path in keep:
+        try:
+            keep_resolved.append(Path(path).resolve())
+        except (OSError, ValueError):
+            continue
+
+    removed = []
+    for path in PLUGIN_CACHE_PATHS:
+        try:
+            resolved_base = (home / path).resolve()
+            if not resolved_base.is_dir():
+                continue
+            with os.scandir(resolved_base) as entries:
+                version_dirs = [
+                    Path(entry.path) for entry in entries
+                    if entry.is_dir(follow_symlinks=False) and VERSION_DIR_PATTERN.match(entry.name)
+                ]
+        except (OSError, ValueError):
+            continue
+
+        for version_dir in sort_version_dirs(version_dirs)[retention:]:
+            if any(k == version_dir or version_dir in k.parents for k in keep_resolved):
+                continue
+            if not dry_run:
+                try:
+                    shutil.rmtree(version_dir)
+                except OSError:
+                    continue
+            removed.append(version_dir)
+    return removed
+
+
+def _find_source_in_dev_dir(home: Path, pattern: str) -> Optional[Path]:
+    """Return the hook source of one development checkout pattern, if present.
+
+    Security: Uses Path.resolve() to prevent symlink traversal attacks.
+    """
+    try:
+        source = home / pattern / SOURCE_FILENAME
+        resolved_source = source.resolve()
+        if resolved_source.exists() and resolved_source.is_file():
+            return resolved_source
+    except (OSError, ValueError):
+        # Invalid path - skip silently
+        pass
+    return None
+
+
+def _find_source_from_dev(home: Path) -> Optional[Path]:
+    """Check common development directory patterns for source."""
+    for pattern in DEV_SOURCE_PATTERNS:
+        source = _find_source_in_dev_dir(home, pattern)
+        if source:
+            return source
+    return None
+
+
+def _cache_root_signatures(home: Path) -> Dict[str, Optional[List[int]]]:
+    """Return the directory signature of each plugin cache root (None if missing)."""
+    return {path: _dir_signature(home / path) for path in PLUGIN_CACHE_PATHS}
+
+
+def _load_cached_source(cache_file: Path, roots: Dict[str, Optional[List[int]]]) -> Optional[Path]:
+    """Return the cached source if the cache roots are unchanged and it still checks out.
+
+    Security: The cached path gets the same resolve() and regular-file
+    checks as a freshly discovered one, so a tampered cache file cannot
+    point the installer at a symlink.
+    """
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("roots") != roots:
+            return None
+        source = Path(cached["source"])
+        resolved_source = source.resolve()
+        if resolved_source == source and resolved_source.is_file():
+            return resolved_source
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    return None
+
+
+def _save_cached_source(cache_file: Path, roots: Dict[str, Optional[List[int]]], source: Path) -> None:
+    """Persist a discovered source with the cache root signatures it was derived from."""
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"source": str(source), "roots": roots}, f, indent=2)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+
+
+def find_plugin_source(use_cache: bool = True) -> Optional[Path]:
+    """
+    Find the source hook file from plugin installation.
+
+    Search order:
+    1. CLAUDE_PLUGIN_DIR environment variable
+    2. Known plugin cache paths (fallback)
+    3. Local development path
+
+    Results of steps 2-3 are remembered in ~/.claude/hooks together with
+    the cache root signatures, and reused while those are unchanged. When
+    a root changes, a version index keeps the rescan incremental.
+
+    Args:
+        use_cache: Whether to consult and update the discovery cache
+
+    Returns:
+        Path to source file or None if not found
+    """
+    # Try each source in priority order
+    source = _find_source_from_env()
+    if source:
+        return source
+
+    home = Path.home()
+    cache_file = home / ".claude" / "hooks" / SOURCE_CACHE_FILENAME
+    roots = _cache_root_signatures(home)
+
+    if use_cache:
+        source = _load_cached_source(cache_file, roots)
+        if source:
+            return source
+
+    if use_cache:
+        index_file = home / ".claude" / "hooks" / VERSION_INDEX_FILENAME
+        index = load_version_index(index_file)
+        before = json.dumps(index, sort_keys=True)
+        source = _find_source_from_cache(home, index)
+        if json.dumps(index, sort_keys=True) != before:
+            save_version_index(index_file, index)
+    else:
+        source = _find_source_from_cache(home)
+
+    source = source or _find_source_from_dev(home)
+    if source and use_cache:
+        _save_cached_source(cache_file, roots, source)
+    return source
+
+
+def is_hook_registered(settings_file: Path, command: str = HOOK_COMMAND) -> bool:
+    """Check if the hook is already registered in settings.json."""
+    if not settings_file.exists():
+        return False
+
+    try:
+        with open(settings_file, "r", encoding="utf-8") as f:
+            settings = json.load(f)
+        return _is_hook_in_settings(settings, command)
+    except (json.JSONDecodeError, KeyError):
+        return False
+
+
+def _registered_commands(settings: dict) -> List[str]:
+    """List the UserPromptSubmit commands registered in settings dict."""
+    commands = []
+    user_prompt_hooks = settings.get("hooks", {}).get("UserPromptSubmit", [])
+    for hook_group in user_prompt_hooks:
+        for hook in hook_group.get("hooks", []):
+            commands.append(hook.get("command"))
+    return commands
+
+
+def _is_hook_in_settings(settings: dict, command: str = HOOK_COMMAND) -> bool:
+    """Check if our hook is registered with command and no other mode is."""
+    commands = _registered_commands(settings)
+    stale = _stale_commands(command)
+    return command in commands and not stale.intersection(commands)
+
+
+def _create_hook_entry(command: str = HOOK_COMMAND) -> dict:
+    """Create the hook entry structure for UserPromptSubmit."""
+    return {
+        "hooks": [{
+            "type": "command",
+            "command": command
+        }]
+    }
+
+
+def _stale_commands(command: str) -> set:
+    """Commands of the other hook mode and of earlier versions."""
+    return (set(HOOK_COMMANDS.values()) | set(LEGACY_HOOK_COMMANDS)) - {command}
+
+
+def _remove_stale_hooks(settings: dict, command: str) -> dict:
+    """Remove entries registered for a different hook mode or version."""
+    stale = _stale_commands(command)
+    user_prompt_hooks = settings.get("hooks", {}).get("UserPromptSubmit")
+    if not user_prompt_hooks:
+        return settings
+
+    kept_groups = []
+    for hook_group in user_prompt_hooks:
+        group_hooks = hook_group.get("hooks", [])
+        kept = [h for h in group_hooks if h.get("command") not in stale]
+        if len(kept) == len(group_hooks):
+            kept_groups.append(hook_group)
+        elif kept:
+            kept_groups.append({**hook_group, "hooks": kept})
+    settings["hooks"]["UserPromptSubmit"] = kept_groups
+    return settings
+
+
+def _add_hook_to_settings(settings: dict, command: str = HOOK_COMMAND) -> dict:
+    """Add our hook to settings dict, return modified settings."""
+    settings = _remove_stale_hooks(settings, command)
+    hooks = settings.setdefault("hooks", {})
+    user_prompt_hooks = hooks.setdefault("UserPromptSubmit", [])
+    if command not in _registered_commands(settings):
+        user_prompt_hooks.append(_create_hook_entry(command))
+    return settings
+
+
+class SettingsLockTimeout(TimeoutError):
+    """Raised when the settings.json lock cannot be acquired in time."""
+
+
+# In-process lock contention counters (persistent totals live in the lock file)
+LOCK_METRICS: Dict[str, float] = {
+    "acquired": 0,
+    "contended": 0,
+    "timeouts": 0,
+    "wait_ms": 0.0,
+}
+
+
+def _lock_file_path(settings_file: Path) -> Path:
+    """Return the sidecar lock file guarding settings_file."""
+    return settings_file.with_name(settings_file.name + SETTINGS_LOCK_SUFFIX)
+
+
+def _record_lock_stats(lock_fd: int, waited_ms: float, contended: bool) -> None:
+    """Accumulate contention totals in the (held) lock file."""
+    try:
+        os.lseek(lock_fd, 0, os.SEEK_SET)
+        raw = os.read(lock_fd, 4096)
+        stats = json.loads(raw) if raw.strip() else {}
+        stats["acquisitions"] = stats.get("acquisitions", 0) + 1
+        stats["contended"] = stats.get("contended", 0) + int(contended)
+        stats["total_wait_ms"] = round(stats.get("total_wait_ms", 0.0) + waited_ms, 3)
+        stats["max_wait_ms"] = round(max(stats.get("max_wait_ms", 0.0), waited_ms), 3)
+        data = json.dumps(stats).encode("utf-8")
+        os.lseek(lock_fd, 0, os.SEEK_SET)
+        os.ftruncate(lock_fd, 0)
+        os.write(lock_fd, data)
+    except (OSError, ValueError, AttributeError):
+        # Stats are diagnostics only
+        pass
+
+
+def get_lock_stats(settings_file: Path) -> dict:
+    """Read the persistent lock contention totals for settings_file."""
+    try:
+        with open(_lock_file_path(settings_file), "r", encoding="utf-8") as f:
+            raw = f.read()
+        return json.loads(raw) if raw.strip() else {}
+    except (OSError, ValueError):
+        return {}
+
+
+@contextmanager
+def settings_lock(settings_file: Path, timeout: float = SETTINGS_LOCK_TIMEOUT) -> Iterator[None]:
+    """
+    Hold an exclusive lock on the sidecar lock file of settings_file.
+
+    Locking a separate file (instead of settings.json itself) keeps the
+    lock valid across os.replace() of the settings file. Without fcntl
+    (Windows) no lock is taken.
+
+    Raises:
+        SettingsLockTimeout: If the lock is not acquired within timeout seconds
+    """
+    if not HAS_FCNTL:
+        yield
+        return
+
+    lock_fd = os.open(_lock_file_path(settings_file), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        started = time.monotonic()
+        contended = False
+        while True:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                contended = True
+                if time.monotonic() - started >= timeout:
+                    LOCK_METRICS["timeouts"] += 1
+                    raise SettingsLockTimeout(f"{settings_file} is locked by another process")
+                time.sleep(_LOCK_POLL_INTERVAL)
+
+        waited_ms = (time.monotonic() - started) * 1000
+        LOCK_METRICS["acquired"] += 1
+        LOCK_METRICS["contended"] += int(contended)
+        LOCK_METRICS["wait_ms"] += waited_ms
+        _record_lock_stats(lock_fd, waited_ms, contended)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+    finally:
+        os.close(lock_fd)
+
+
+class InstallLeaseTimeout(TimeoutError):
+    """Raised when another session start holds the install lease past the deadline."""
+
+
+def acquire_install_lease(hooks_dir: Path, timeout: float = INSTALL_LEASE_TIMEOUT) -> Tuple[Optional[int], bool]:
+    """
+    Take the install lease (an exclusive lock on the install lock file).
+
+    Session starts that find the install stamp stale all race to install;
+    the lease lets the first one do the work. The lock is released with
+    release_install_lease() or when the holder exits, so a crashed holder
+    never blocks later session starts. Without fcntl (Windows) no lease
+    is taken.
+
+    Args:
+        hooks_dir: ~/.claude/hooks (created if missing)
+        timeout: Seconds to wait for a holder to finish; 0 to not wait
+
+    Returns:
+        (lock fd or None without fcntl, whether another process held the lease)
+
+    Raises:
+        InstallLeaseTimeout: If the lease is still held after timeout seconds
+    """
+    if not HAS_FCNTL:
+        return None, False
+    hooks_dir.mkdir(parents=True, exist_ok=True)
+    lock_fd = os.open(hooks_dir / INSTALL_LOCK_FILENAME, os.O_RDWR | os.O_CREAT, 0o600)
+    started = time.monotonic()
+    contended = False
+    while True:
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_fd, contended
+        except BlockingIOError:
+            contended = True
+            if time.monotonic() - started >= timeout:
+                os.close(lock_fd)
+                raise InstallLeaseTimeout(f"{hooks_dir} is being installed by another process")
+            time.sleep(_LOCK_POLL_INTERVAL)
+        except BaseException:
+            os.close(lock_fd)
+            raise
+
+
+def release_install_lease(lock_fd: Optional[int]) -> None:
+    """Release a lease taken by acquire_install_lease()."""
+    if lock_fd is not None:
+        fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        os.close(lock_fd)
+
+
+def _write_settings_file(settings_file: Path, settings: dict) -> None:
+    """
+    Atomically replace settings file contents.
+
+    Writes a temp file in the same directory, fsyncs it and renames it over
+    the original, so readers never see a truncated file. A symlinked
+    settings.json (e.g. from a dotfiles repo) is updated at its target.
+    """
+    target = settings_file.resolve() if settings_file.is_symlink() else settings_file
+    tmp_file = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        mode = os.stat(target).st_mode & 0o7777
+    except OSError:
+        mode = None
+
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_file, mode)
+        os.replace(tmp_file, target)
+    except BaseException:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def _read_settings_file(settings_file: Path) -> dict:
+    """Read settings from file, backup if corrupted."""
+    try:
+        with open(settings_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        backup_path = settings_file.with_suffix(".json.bak")
+        shutil.copy(settings_file, backup_path)
+        print(msg("backup_corrupted", path=backup_path), file=sys.stderr)
+        return {}
+
+
+def update_settings(
+    settings_file: Path,
+    update: Callable[[dict], bool],
+    timer: Optional["PhaseTimer"] = None,
+) -> bool:
+    """
+    Apply update to settings.json as a single locked transaction.
+
+    The file is read once under the sidecar lock; if update(settings)
+    reports a change, the result is written atomically before the lock
+    is released.
+
+    Args:
+        settings_file: Path to ~/.claude/settings.json
+        update: Mutates the settings dict in place, returns True if changed
+        timer: Optional latency timer; records settings_read (including the
+            lock wait) and settings_write
+
+    Returns:
+        True if settings.json was written
+    """
+    settings_file.parent.mkdir(parents=True, exist_ok=True)
+
+    with settings_lock(settings_file):
+        # Read existing settings or start fresh
+        settings = _read_settings_file(settings_file) if settings_file.exists() else {}
+        if timer:
+            timer.lap("settings_read")
+        if not update(settings):
+            return False
+        _write_settings_file(settings_file, settings)
+        if timer:
+            timer.lap("settings_write")
+        return True
+
+
+def register_hook_in_settings(
+    settings_file: Path,
+    command: str = HOOK_COMMAND,
+    timer: Optional["PhaseTimer"] = None,
+) -> bool:
+    """
+    Register the UserPromptSubmit hook in settings.json.
+
+    The check and the write happen in one locked transaction, so
+    concurrent session starts cannot lose updates or add duplicate
+    entries. Entries registered for the other hook mode are removed.
+
+    Args:
+        settings_file: Path to ~/.claude/settings.json
+        command: Hook command to register (classic hook or resident client)
+        timer: Optional latency timer passed to update_settings()
+
+    Returns:
+        True if registered successfully, False if already exists
+    """
+    def _register(settings: dict) -> bool:
+        # Check if already registered
+        if _is_hook_in_settings(settings, command):
+            return False
+        _add_hook_to_settings(settings, command)
+        return True
+
+    return update_settings(settings_file, _register, timer)
+
+
+def _plugin_root() -> Path:
+    """Return the root directory of the running plugin (no filesystem access)."""
+    return Path(os.path.abspath(__file__)).parent.parent.parent
+
+
+def get_plugin_version() -> str:
+    """Read the plugin version from the plugin manifest."""
+    manifest = _plugin_root() / ".claude-plugin" / "plugin.json"
+    try:
+        with open(manifest, "r", encoding="utf-8") as f:
+            return str(json.load(f).get("version", "unknown"))
+    except (OSError, ValueError, AttributeError):
+        return "unknown"
+
+
+def compute_stamp(hooks_dir: Path, settings_file: Path, hook_mode: str) -> dict:
+    """Describe the current installation (see install_stamp.compute_stamp())."""
+    return install_stamp.compute_stamp(
+        str(hooks_dir), str(settings_file), hook_mode, str(_plugin_root())
+    )
+
+
+def read_stamp(stamp_file: Path) -> dict:
+    """Read the JSON part of the install stamp, or {} if it is unusable."""
+    try:
+        with open(stamp_file, "r", encoding="utf-8") as f:
+            f.readline()
+            recorded = json.loads(f.readline())
+        return recorded if isinstance(recorded, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _file_sha256(path: Path) -> Optional[str]:
+    """Return the SHA-256 hex digest of path, or None if unreadable."""
+    import hashlib
+
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def write_stamp(stamp_file: Path, stamp: dict) -> None:
+    """
+    Record the install stamp atomically.
+
+    The first line is the key checked by the fast path. The plugin version
+    and installed hook hash are stored alongside the stat signatures for
+    diagnostics and upgrade decisions.
+    """
+    recorded = {
+        **stamp,
+        "plugin_version": get_plugin_version(),
+        "hook_sha256": _file_sha256(stamp_file.parent / HOOK_FILENAME),
+    }
+    tmp_file = stamp_file.with_name(f"{stamp_file.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(install_stamp.stamp_key(stamp) + "\n")
+            f.write(json.dumps(recorded, sort_keys=True) + "\n")
+        os.replace(tmp_file, stamp_file)
+    except OSError:
+        # A missing stamp only costs the slow path next time
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+
+
+def read_hook_version(path: Path) -> Optional[str]:
+    """Read the HOOK_VERSION header from the start of a hook file."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_VERSION_HEADER_BYTES)
+    except OSError:
+        return None
+    match = HOOK_VERSION_PATTERN.search(head)
+    return match.group(1).decode("ascii", "replace") if match else None
+
+
+def needs_upgrade(source_file: Path, target_file: Path) -> bool:
+    """
+    Decide whether the installed target must be replaced by source.
+
+    Cheap metadata is compared first: the embedded version header and the
+    file size. Files are only hashed when those match but the mtimes
+    differ (installs preserve the source mtime, so an unchanged install
+    never gets hashed).
+    """
+    try:
+        target_stat = os.stat(target_file)
+    except OSError:
+        return True
+    source_stat = os.stat(source_file)
+
+    if read_hook_version(source_file) != read_hook_version(target_file):
+        return True
+    if source_stat.st_size != target_stat.st_size:
+        return True
+    if source_stat.st_mtime_ns == target_stat.st_mtime_ns:
+        return False
+    return _file_sha256(source_file) != _file_sha256(target_file)
+
+
+def install_hook_file(source_file: Path, target_file: Path, mode: int = 0o755) -> None:
+    """
+    Atomically install (or replace) a hook or data file.
+
+    The source mtime is preserved so later needs_upgrade() checks stay
+    metadata-only. A running hook never sees a partially written file.
+    """
+    target_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = target_file.with_name(f".{target_file.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copy2(source_file, tmp_file)
+        tmp_file.chmod(mode)
+        os.replace(tmp_file, target_file)
+    except BaseException:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def precompile_hook_package(package_dir: Path, installed: Iterable[Path] = ()) -> None:
+    """
+    Write checked-hash .pyc files for the installed hook package.
+
+    Installs preserve source mtimes (and npm normalizes them), so the
+    default mtime-based .pyc could survive an upgrade; a checked-hash .pyc
+    is validated against the source content instead. Modules listed in
+    installed, or without a .pyc, are compiled. Failures are ignored: the
+    hook still runs from source.
+    """
+    import py_compile
+
+    installed = set(installed)
+    for name in HOOK_PACKAGE_MODULES:
+        module = package_dir / name
+        cfile = install_stamp.pyc_path(str(module))
+        if cfile is None or not module.is_file():
+            continue
+        if module in installed or not os.path.exists(cfile):
+            try:
+                py_compile.compile(
+                    str(module),
+                    cfile=cfile,
+                    doraise=True,
+                    invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH,
+                )
+            except (py_compile.PyCompileError, OSError):
+                continue
+
+
+def remove_legacy_files(hooks_dir: Path) -> None:
+    """Remove loose modules that earlier versions installed next to the hook."""
+    for name in LEGACY_SUPPORT_FILENAMES:
+        try:
+            (hooks_dir / name).unlink()
+        except OSError:
+            continue
+
+
+def start_daemon(target_file: Path) -> None:
+    """
+    Start the resident mode detection daemon in the background.
+
+    The daemon exits on its own if another instance already owns the socket.
+    """
+    import subprocess
+
+    subprocess.Popen(
+        [sys.executable, "-I", "-S", str(target_file), "--daemon"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def main(hook: str = "session-start", lease_timeout: float = INSTALL_LEASE_TIMEOUT):
+    """
+    Main entry point for the session start hook.
+
+    Concurrent session starts install once: the first to find the stamp
+    stale takes the install lease; the others wait up to lease_timeout
+    and then reuse its stamp, or leave the install to it.
+
+    A session start that runs out of its latency budget (budget.py) skips
+    the plugin cache garbage collection, stops waiting for the lease and
+    hands the rest of the install to the background worker, whose report
+    the next session start shows. The worker itself has no budget. The
+    hard stop only covers the stamp check, the lease and discovery:
+    installing files, garbage collection and the settings.json
+    transaction are never interrupted, only skipped before they start.
+
+    Args:
+        hook: Name the run's latency is recorded under
+        lease_timeout: Seconds to wait for another session start's install
+    """
+    timer = None
+    lease_fd = None
+    if latency_enabled():
+        from .latency import PhaseTimer
+
+        timer = PhaseTimer(hook)
+    budget = start_budget(hook)
+    try:
+        if budget is not None:
+            budget.arm()
+        home = Path.home()
+        hooks_dir = home / ".claude" / "hooks"
+        target_file = hooks_dir / HOOK_FILENAME
+        client_file = hooks_dir / CLIENT_FILENAME
+        package_dir = hooks_dir / PACKAGE_NAME
+        settings_file = home / ".claude" / "settings.json"
+        stamp_file = hooks_dir / STAMP_FILENAME
+        hook_mode = get_hook_mode()
+        hook_command = HOOK_COMMANDS[hook_mode]
+
+        # Fast path: nothing changed since the last successful install
+        stamp_current = is_stamp_current(stamp_file, compute_stamp(hooks_dir, settings_file, hook_mode))
+        if timer:
+            timer.lap("stamp")
+        if stamp_current:
+            if hook_mode == HOOK_MODE_RESIDENT:
+                start_daemon(target_file)
+            sys.exit(0)
+
+        if budget is not None:
+            if not budget.allows("lease"):
+                raise BudgetExceeded()
+            lease_timeout = min(lease_timeout, budget.remaining())
+        lease_fd, contended = acquire_install_lease(hooks_dir, lease_timeout)
+        if timer:
+            timer.lap("lease")
+        # The lease holder we waited for has probably installed everything
+        if contended and is_stamp_current(stamp_file, compute_stamp(hooks_dir, settings_file, hook_mode)):
+            if hook_mode == HOOK_MODE_RESIDENT:
+                start_daemon(target_file)
+            sys.exit(0)
+
+        installed_hook = False
+        upgraded_hook = False
+        registered_settings = False
+
+        # Step 1: Install or upgrade hook file(s)
+        source_file = find_plugin_source()
+        if timer:
+            timer.lap("discovery")
+        if budget is not None:
+            if not budget.allows("install"):
+                raise BudgetExceeded()
+            # Installing, pruning and the settings transaction are not cut
+            # short; from here on the budget only decides between phases
+            budget.disarm()
+        if source_file:
+            installs = [(source_file, target_file, 0o755)]
+            for name in HOOK_PACKAGE_MODULES:
+                installs.append((source_file.parent / PACKAGE_NAME / name, package_dir / name, 0o644))
+            client_source = source_file.parent / CLIENT_SOURCE_FILENAME
+            if hook_mode == HOOK_MODE_RESIDENT and client_source.is_file():
+                installs.append((client_source, client_file, 0o755))
+            # Optional: the hook works (with fallbacks) without these
+            for name in SUPPORT_FILENAMES:
+                support_source = source_file.parent / name
+                if support_source.is_file():
+                    installs.append((support_source, hooks_dir / name, 0o644))
+
+            installed = []
+            for source, target, mode in installs:
+                if needs_upgrade(source, target):
+                    if target.exists():
+                        upgraded_hook = True
+                    install_hook_file(source, target, mode)
+                    installed.append(target)
+                    installed_hook = True
+            precompile_hook_package(package_dir, installed)
+            remove_legacy_files(hooks_dir)
+            # Prune old plugin versions while we are on the slow path anyway
+            retention = get_cache_retention()
+            if retention and (budget is None or budget.allows("gc")):
+                gc_plugin_cache(home, retention, keep=(source_file, _plugin_root()))
+        elif not target_file.exists():
+            # Source not found - provide manual installation guide
+            print(msg("source_not_found"), file=sys.stderr)
+
+        entry_file = client_file if hook_mode == HOOK_MODE_RESIDENT else target_file
+
+        if timer:
+            timer.lap("install")
+
+        # Step 2: Register in settings.json if not registered (one transaction)
+        if budget is not None and not budget.allows("settings"):
+            raise BudgetExceeded()
+        registered = entry_file.exists()
+        if registered:
+            registered_settings = register_hook_in_settings(settings_file, hook_command, timer)
+
+        # Record the stamp so the next session start can skip all of the above
+        if registered:
+            write_stamp(stamp_file, compute_stamp(hooks_dir, settings_file, hook_mode))
+
+        # Step 3: Keep the resident daemon warm for this session
+        if hook_mode == HOOK_MODE_RESIDENT and target_file.exists():
+            start_daemon(target_file)
+
+        # Output status message
+        if upgraded_hook and not registered_settings:
+            print(msg("upgraded", version=read_hook_version(target_file) or "?"))
+        elif installed_hook or registered_settings:
+            print(msg("installed"))
+            print(msg("patterns"))
+
+        sys.exit(0)
+
+    except BudgetExceeded:
+        # Raised between phases the alarm is still pending
+        budget.disarm()
+        # A worker that finds the lease held exits at once, so let go of it first
+        release_install_lease(lease_fd)
+        lease_fd = None
+        install_stamp.spawn_install_worker(str(_plugin_root() / "hooks" / LAUNCHER_FILENAME))
+        sys.exit(0)
+    except InstallLeaseTimeout:
+        # The holder is still installing; the next session start checks its stamp
+        sys.exit(0)
+    except SettingsLockTimeout:
+        print(msg("lock_timeout"), file=sys.stderr)
+        sys.exit(0)
+    except PermissionError as e:
+        print(msg("permission_error", error=e), file=sys.stderr)
+        print(msg("permission_hint"), file=sys.stderr)
+        sys.exit(0)
+    except Exception as e:
+        print(msg("setup_error", error=e), file=sys.stderr)
+        sys.exit(0)
+    finally:
+        if budget is not None:
+            budget.disarm()
+        release_install_lease(lease_fd)
+        if timer:
+            if budget is not None and budget.degraded:
+                timer.add("degraded", budget.overrun())
+            timer.flush()
+
+
+def append_install_report(report_file: Path, out: str, err: str) -> None:
+    """
+    Add a background install's output to the report shown next session.
+
+    Output of earlier workers that no session has shown yet is kept in
+    front. The file is replaced atomically, so the launcher never reads
+    half of it.
+    """
+    try:
+        with open(report_file, "r", encoding="utf-8") as f:
+            old_out, _, old_err = f.read().partition("\0")
+    except (OSError, ValueError):
+        old_out = old_err = ""
+    report_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = report_file.with_name(f".{report_file.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(f"{old_out}{out}\0{old_err}{err}")
+        os.replace(tmp_file, report_file)
+    except BaseException:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def install_worker_main() -> None:
+    """
+    Run the install detached from the session (CODINGBUDDY_INSTALL=background).
+
+    The worker does not wait for the install lease: if another session
+    start or worker holds it, that one is doing the same work and this
+    worker exits at once. What main() prints, including the localized
+    installed message and any errors, goes to the install report.
+    """
+    hooks_dir = Path.home() / ".claude" / "hooks"
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        try:
+            main("session-install", lease_timeout=0)
+        except SystemExit:
+            pass
+    if out.getvalue() or err.getvalue():
+        append_install_report(hooks_dir / INSTALL_REPORT_FILENAME, out.getvalue(), err.getvalue())
+
+
+def gc_main(argv: List[str]) -> None:
+    """Command-line entry point for plugin cache garbage collection."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prune old CodingBuddy plugin versions")
+    parser.add_argument("--gc", action="store_true", help="Run garbage collection")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be removed")
+    parser.add_argument(
+        "--retention", type=int, default=get_cache_retention(),
+        help=f"Number of versions to keep per cache root (default: ${CACHE_RETENTION_ENV}, else no limit)",
+    )
+    args = parser.parse_args(argv)
+
+    removed = gc_plugin_cache(
+        Path.home(), args.retention, dry_run=args.dry_run, keep=(_plugin_root(),)
+    )
+    key = "gc_would_remove" if args.dry_run else "gc_removed"
+    for path in removed:
+        print(msg(key, path=path))
+
+
+def run_main() -> None:
+    """Run main(), under the profiler selected by CODINGBUDDY_PROFILE if set."""
+    if os.environ.get(PROFILE_ENV):
+        try:
+            from . import profiling
+        except ImportError:
+            print("CodingBuddy: profiling module not installed", file=sys.stderr)
+        else:
+            profiling.run(main, "session-start")
+            return
+    main()
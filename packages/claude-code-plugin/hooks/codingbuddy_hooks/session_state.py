@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+CodingBuddy Session Mode Store
+
+Remembers the last mode detected in each Claude Code session, so prompts
+without a keyword ("continue", "looks good, go on") keep the active mode.
+
+The store is a fixed-size, memory-mapped, open-addressed table at
+$XDG_CACHE_HOME/codingbuddy/sessions.map (default
+~/.cache/codingbuddy/sessions.map, override with CODINGBUDDY_SESSION_FILE).
+Each slot holds a session id, its last detected mode, the time it was
+last updated, the number of prompts since the mode was set and how many
+of them named the mode (detections; the hook sends the full mode context
+only on the first one).
+
+A session id is hashed to a slot and probed linearly for at most
+PROBE_LIMIT slots, so lookups and updates touch a bounded number of
+slots whatever the table holds. Slots are never emptied once used: an
+entry older than SESSION_TTL_SECONDS no longer counts as active, and a
+new session takes the least recently updated slot of its probe window
+(LRU within the window) when no empty slot is left. The file size never
+changes.
+
+Parallel sessions run separate hook processes, so every access holds
+flock() on the store file: shared for lookups, exclusive for updates.
+The critical section is a few slot reads and one slot write. Without
+fcntl (Windows) updates are refused rather than made unlocked, so the
+hook runs as if the store were disabled; listing still works.
+Set CODINGBUDDY_SESSION_STATE=0 to disable the store.
+
+Usage:
+    python3 codingbuddy_hooks/session_state.py     # list active sessions
+"""
+
+from __future__ import annotations
+
+import errno
+import mmap
+import os
+import struct
+import sys
+import time
+
+# File locking (Unix only, optional on Windows)
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List, Optional, Tuple
+
+    # (mode, updated_ns, prompts, detections)
+    SessionState = Tuple[str, int, int, int]
+
+STORE_ENV = "CODINGBUDDY_SESSION_FILE"
+STORE_FILENAME = "sessions.map"
+SESSION_SLOTS = 2048
+PROBE_LIMIT = 16
+SESSION_TTL_SECONDS = 12 * 3600
+
+# Header: magic, slot count
+_HEADER = struct.Struct("<8sI4x")
+_MAGIC = b"CBSES\x00\x00\x02"
+# Slot: session id (NUL padded, all zero = empty), mode, updated ns,
+# prompts, detections
+_SLOT = struct.Struct("<48s16sQII")
+_KEY_BYTES = 48
+_MODE_BYTES = 16
+_EMPTY_KEY = bytes(_KEY_BYTES)
+
+_FNV_OFFSET = 0xCBF29CE484222325
+_FNV_PRIME = 0x100000001B3
+_MASK64 = (1 << 64) - 1
+
+
+def get_store_path() -> str:
+    """Get the session store path."""
+    override = os.environ.get(STORE_ENV)
+    if override:
+        return override
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "codingbuddy", STORE_FILENAME)
+
+
+def _store_size(slots: int) -> int:
+    return _HEADER.size + slots * _SLOT.size
+
+
+def _fnv1a(data: bytes) -> int:
+    """64-bit FNV-1a; stable across processes, unlike hash()."""
+    h = _FNV_OFFSET
+    for byte in data:
+        h = ((h ^ byte) * _FNV_PRIME) & _MASK64
+    return h
+
+
+def session_key(session_id: str) -> Tuple[bytes, int]:
+    """
+    Return the stored key and hash of a session id.
+
+    Ids longer than a slot's key field keep their first 40 bytes plus
+    their hash.
+
+    Raises:
+        ValueError: If the id is empty or contains a NUL character
+    """
+    raw = session_id.encode("utf-8", "surrogatepass")
+    if not raw or b"\0" in raw:
+        raise ValueError("invalid session id")
+    h = _fnv1a(raw)
+    if len(raw) > _KEY_BYTES:
+        raw = raw[:_KEY_BYTES - 8] + h.to_bytes(8, "little")
+    return raw.ljust(_KEY_BYTES, b"\0"), h
+
+
+class SessionStore:
+    """
+    Per-session mode table in a memory-mapped file.
+
+    Each call maps the file under flock() and unmaps it before returning,
+    so a store object holds no resources between calls and can be used
+    from several threads.
+    """
+
+    def __init__(self, path: Optional[str] = None, slots: int = SESSION_SLOTS,
+                 ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.path = path or get_store_path()
+        self.slots = slots
+        self.ttl_ns = int(ttl_seconds * 1e9)
+
+    def _map(self, exclusive: bool) -> Tuple[int, Optional[mmap.mmap]]:
+        """
+        Open and lock the store file and map it.
+
+        Updates create or reset the file as needed. Lookups map None
+        when the file does not exist or is not a store.
+
+        Raises:
+            OSError: If the file cannot be opened, locked or mapped, or
+                for updates without fcntl
+        """
+        if exclusive and not HAS_FCNTL:
+            raise OSError(errno.ENOTSUP, "session store updates need fcntl.flock()")
+        size = _store_size(self.slots)
+        if exclusive:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(self.path) or ".", mode=0o700, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        else:
+            fd = os.open(self.path, os.O_RDONLY)
+        try:
+            if HAS_FCNTL:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            if os.fstat(fd).st_size != size:
+                if not exclusive:
+                    return fd, None
+                os.ftruncate(fd, size)
+            store = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE if exclusive else mmap.ACCESS_READ)
+        except BaseException:
+            os.close(fd)
+            raise
+        if _HEADER.unpack_from(store, 0) != (_MAGIC, self.slots):
+            if not exclusive:
+                store.close()
+                return fd, None
+            store[:] = bytes(size)
+            _HEADER.pack_into(store, 0, _MAGIC, self.slots)
+        return fd, store
+
+    def _probe(self, store: mmap.mmap, key: bytes, h: int):
+        """Yield (offset, key, mode, updated_ns, prompts, detections) along the probe window."""
+        for i in range(min(PROBE_LIMIT, self.slots)):
+            offset = _HEADER.size + ((h + i) % self.slots) * _SLOT.size
+            yield (offset, *_SLOT.unpack_from(store, offset))
+
+    def _is_active(self, updated_ns: int, now_ns: int) -> bool:
+        return now_ns - updated_ns <= self.ttl_ns
+
+    def lookup(self, session_id: str, now_ns: Optional[int] = None) -> Optional[SessionState]:
+        """
+        Return the active (mode, updated_ns, prompts, detections) of a session, or None.
+
+        Raises:
+            OSError: If the store exists but cannot be read
+            ValueError: If the session id is invalid
+        """
+        key, h = session_key(session_id)
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        try:
+            fd, store = self._map(exclusive=False)
+        except FileNotFoundError:
+            return None
+        try:
+            if store is None:
+                return None
+            with store:
+                for _, slot_key, mode, updated_ns, prompts, detections in self._probe(store, key, h):
+                    if slot_key == _EMPTY_KEY:
+                        return None
+                    if slot_key == key:
+                        if not self._is_active(updated_ns, now_ns):
+                            return None
+                        return mode.rstrip(b"\0").decode("utf-8"), updated_ns, prompts, detections
+            return None
+        finally:
+            os.close(fd)
+
+    def update(self, session_id: str, mode: Optional[str],
+               now_ns: Optional[int] = None) -> Optional[SessionState]:
+        """
+        Record one prompt of a session and return its active state.
+
+        A detected mode that differs from the active one (re)starts the
+        session's entry with prompt and detection counts of 1; the active
+        mode detected again counts one more of each. Without a mode, an
+        active entry counts the prompt and is returned; sessions without
+        an active mode are not stored.
+
+        Raises:
+            OSError: If the store cannot be created or mapped
+            ValueError: If the session id is invalid or the mode name
+                does not fit a slot
+        """
+        key, h = session_key(session_id)
+        encoded = None
+        if mode is not None:
+            encoded = mode.encode("utf-8")
+            if not encoded or len(encoded) > _MODE_BYTES:
+                raise ValueError(f"invalid mode {mode!r}")
+        now_ns = time.time_ns() if now_ns is None else now_ns
+
+        fd, store = self._map(exclusive=True)
+        try:
+            with store:
+                target = None
+                victim = None
+                victim_ns = None
+                for slot in self._probe(store, key, h):
+                    offset, slot_key, _, updated_ns, _, _ = slot
+                    if slot_key == key:
+                        target = slot
+                        break
+                    if slot_key == _EMPTY_KEY:
+                        # Keys are never removed, so none lies past an empty slot
+                        victim = offset
+                        break
+                    if victim_ns is None or updated_ns < victim_ns:
+                        victim, victim_ns = offset, updated_ns
+
+                active = target is not None and self._is_active(target[3], now_ns)
+                if encoded is not None and not (active and target[2] == encoded.ljust(_MODE_BYTES, b"\0")):
+                    offset = target[0] if target is not None else victim
+                    _SLOT.pack_into(store, offset, key, encoded, now_ns, 1, 1)
+                    return mode, now_ns, 1, 1
+                if not active:
+                    return None
+                offset, _, active_mode, _, prompts, detections = target
+                prompts = min(prompts + 1, 0xFFFFFFFF)
+                if encoded is not None:
+                    detections = min(detections + 1, 0xFFFFFFFF)
+                _SLOT.pack_into(store, offset, key, active_mode, now_ns, prompts, detections)
+                return active_mode.rstrip(b"\0").decode("utf-8"), now_ns, prompts, detections
+        finally:
+            os.close(fd)
+
+    def entries(self, now_ns: Optional[int] = None) -> List[Tuple[str, str, int, int, int]]:
+        """
+        Return all active entries as (session key, mode, updated_ns, prompts,
+        detections), most recently updated first.
+        """
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        try:
+            fd, store = self._map(exclusive=False)
+        except FileNotFoundError:
+            return []
+        try:
+            if store is None:
+                return []
+            with store:
+                result = [
+                    (
+                        key.rstrip(b"\0").decode("utf-8", "replace"),
+                        mode.rstrip(b"\0").decode("utf-8"),
+                        updated_ns,
+                        prompts,
+                        detections,
+                    )
+                    for key, mode, updated_ns, prompts, detections in _SLOT.iter_unpack(store[_HEADER.size:])
+                    if key != _EMPTY_KEY and self._is_active(updated_ns, now_ns)
+                ]
+        finally:
+            os.close(fd)
+        result.sort(key=lambda entry: entry[2], reverse=True)
+        return result
+
+
+def track(session_id: object, mode: Optional[str], path: Optional[str] = None) -> Optional[SessionState]:
+    """
+    Record a prompt of session_id (see SessionStore.update()).
+
+    Never raises: a missing or broken store, or a platform without
+    fcntl, only loses the session's mode.
+    """
+    if not isinstance(session_id, str) or not HAS_FCNTL:
+        return None
+    try:
+        return SessionStore(path).update(session_id, mode)
+    except (OSError, ValueError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns the process exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List codingbuddy sessions with an active mode")
+    parser.add_argument("--store", help=f"Store path (default: {get_store_path()})")
+    args = parser.parse_args(argv)
+
+    now_ns = time.time_ns()
+    entries = SessionStore(args.store).entries(now_ns)
+    if not entries:
+        sys.stdout.write("No sessions with an active mode.\n")
+        return 0
+    lines = [f"{'session':<40} {'mode':<10} {'prompts':>7} {'detected':>8} {'idle s':>8}"]
+    for key, mode, updated_ns, prompts, detections in entries:
+        idle = (now_ns - updated_ns) // 10**9
+        lines.append(f"{key[:40]:<40} {mode:<10} {prompts:>7} {detections:>8} {idle:>8}")
+    sys.stdout.write("\n".join(lines) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
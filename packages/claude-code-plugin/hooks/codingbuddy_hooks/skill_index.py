@@ -0,0 +1,244 @@
+"""
+CodingBuddy Skill Matcher
+
+Suggests skills (refactoring, systematic-debugging, ...) for a prompt
+with a detected mode by comparing it with the "description" frontmatter
+of packages/rules/.ai-rules/skills/*/SKILL.md, without asking the MCP
+server's recommend_skills tool.
+
+compile-rules-bundle.py builds a TF-IDF matrix of the descriptions with
+build_skill_index() and stores it in the rules bundle. The matcher turns
+the prompt into a query vector with the same tokenizer and weights and
+scores every skill at once with one sparse matrix-vector product; the
+skill vectors are L2-normalized, so the scores are cosine similarities.
+Up to TOP_K skills scoring at least MIN_SIMILARITY on at least
+MIN_MATCHED_TERMS shared terms are suggested.
+
+Tokens are Unicode words; runs of Han, kana and Hangul are split into
+character bigrams (tokenizer.py), so Korean, Japanese and Chinese descriptions of
+custom skills match without a dictionary.
+
+Index layout (little-endian arrays, rows are terms, in CSR form):
+    <header JSON on one line: format, skills, terms>\\n
+    idf       float32[terms]
+    indptr    uint32[terms + 1]
+    weights   float32[nonzeros]
+    skills    uint16[nonzeros]
+
+Loading the index and matching a prompt stays within MATCH_BUDGET_MS for
+up to BUDGET_SKILLS skills (see benchmarks.py skill_match).
+"""
+
+from __future__ import annotations
+
+import array
+import heapq
+import json
+import math
+import re
+import sys
+
+from .tokenizer import CJK_RUN_RANGES, run_bigrams, stem
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Dict, List, Tuple
+
+INDEX_FORMAT = 1
+
+# Suggestions
+TOP_K = 3
+MIN_SIMILARITY = 0.15
+# A single shared word ("build") is too weak a signal
+MIN_MATCHED_TERMS = 2
+
+# Latency budget of load + match, and the skill count it is promised for
+MATCH_BUDGET_MS = 1.0
+BUDGET_SKILLS = 500
+
+# Prompt characters and terms considered, so long prompts cost the same
+# as short ones
+QUERY_HEAD_CHARS = 1024
+MAX_QUERY_TERMS = 64
+
+# Unicode words, with runs of Han, kana and Hangul as one match (group 1).
+# Compiling the ranges takes milliseconds, so it waits for the first
+# non-ASCII text; ASCII text is split on everything but letters and digits.
+TOKEN_PATTERN = f"([{CJK_RUN_RANGES}]+)|[^\\W_{CJK_RUN_RANGES}]+"
+_token_pattern = None
+_ASCII_SEPARATORS = str.maketrans({chr(c): " " for c in range(128) if not chr(c).isalnum()})
+
+# Words every description uses ("Use when ...") or that say nothing
+STOPWORDS = frozenset("""
+    a an and are as at be before by can for from in into is it its of on or so the this that to
+    with without use when you your any all each other user asks skill need needed
+""".split())
+
+
+def _ascii_words(text: str) -> List[str]:
+    """Return the words of ASCII text, as TOKEN_PATTERN would match them."""
+    return text.translate(_ASCII_SEPARATORS).split()
+
+
+def tokenize(text: str) -> List[str]:
+    """Return the terms of text, in order and with repeats."""
+    global _token_pattern
+    text = text.lower()
+    if text.isascii():
+        return [stem(word) for word in _ascii_words(text) if len(word) > 1 and word not in STOPWORDS]
+    if _token_pattern is None:
+        _token_pattern = re.compile(TOKEN_PATTERN)
+    tokens = []
+    for match in _token_pattern.finditer(text):
+        run = match.group(1)
+        if run:
+            tokens.extend(run_bigrams(run))
+            continue
+        word = match.group(0)
+        if len(word) > 1 and word not in STOPWORDS:
+            tokens.append(stem(word))
+    return tokens
+
+
+def _term_weights(tokens: List[str]) -> Dict[str, float]:
+    """Return the sublinear term frequency (1 + ln tf) of each term."""
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return {term: 1.0 + math.log(count) for term, count in counts.items()}
+
+
+def build_skill_index(skills: Dict[str, str]) -> bytes:
+    """
+    Build the TF-IDF index of skill descriptions.
+
+    Args:
+        skills: Description by skill name; the name's words count as part
+            of the description
+
+    Returns:
+        Index bytes in the layout described in the module docstring
+
+    Raises:
+        ValueError: If there are more skills than the index can address
+    """
+    names = sorted(skills)
+    if len(names) > 0xFFFF:
+        raise ValueError(f"too many skills for one index: {len(names)}")
+    documents = [_term_weights(tokenize(f"{name.replace('-', ' ')} {skills[name]}")) for name in names]
+
+    postings: Dict[str, List[Tuple[int, float]]] = {}
+    for position, weights in enumerate(documents):
+        for term, weight in weights.items():
+            postings.setdefault(term, []).append((position, weight))
+    terms = sorted(postings)
+    # Smoothed idf keeps terms every skill lists at a small positive weight
+    idf = {term: math.log((1 + len(names)) / (1 + len(postings[term]))) + 1.0 for term in terms}
+    norms = [0.0] * len(names)
+    for term in terms:
+        for position, weight in postings[term]:
+            norms[position] += (weight * idf[term]) ** 2
+
+    idf_array = array.array("f", (idf[term] for term in terms))
+    indptr = array.array("I", [0])
+    weights = array.array("f")
+    columns = array.array("H")
+    for term in terms:
+        for position, weight in postings[term]:
+            columns.append(position)
+            weights.append(weight * idf[term] / math.sqrt(norms[position]))
+        indptr.append(len(columns))
+
+    header = json.dumps({"format": INDEX_FORMAT, "skills": names, "terms": terms},
+                        ensure_ascii=False, separators=(",", ":"))
+    parts = [header.encode("utf-8") + b"\n"]
+    for values in (idf_array, indptr, weights, columns):
+        if sys.byteorder != "little":
+            values.byteswap()
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+class SkillIndex:
+    """Scores prompts against a built skill index."""
+
+    def __init__(self, data: bytes):
+        """
+        Raises:
+            ValueError: If data is not a skill index of this format
+        """
+        header_end = data.find(b"\n")
+        if header_end < 0:
+            raise ValueError("truncated skill index")
+        header = json.loads(data[:header_end])
+        if not isinstance(header, dict) or header.get("format") != INDEX_FORMAT:
+            raise ValueError("not a skill index of this format")
+        self.skills: List[str] = header["skills"]
+        terms = header["terms"]
+        self._rows = dict(zip(terms, range(len(terms))))
+
+        offset = header_end + 1
+        arrays = []
+        for typecode, count in (("f", len(terms)), ("I", len(terms) + 1), ("f", None), ("H", None)):
+            values = array.array(typecode)
+            if count is None:
+                # The nonzero arrays are sized by the last indptr entry
+                count = arrays[1][-1]
+            end = offset + count * values.itemsize
+            if end > len(data):
+                raise ValueError("truncated skill index")
+            values.frombytes(data[offset:end])
+            if sys.byteorder != "little":
+                values.byteswap()
+            arrays.append(values)
+            offset = end
+        self._idf, self._indptr, self._weights, self._columns = arrays
+
+    def scores(self, prompt: str) -> Tuple[List[float], List[int]]:
+        """
+        Score the prompt against every skill.
+
+        Returns:
+            (cosine similarity, number of shared terms) per skill
+        """
+        query: Dict[int, float] = {}
+        for term, weight in _term_weights(tokenize(prompt[:QUERY_HEAD_CHARS])).items():
+            row = self._rows.get(term)
+            if row is not None:
+                query[row] = weight * self._idf[row]
+                if len(query) == MAX_QUERY_TERMS:
+                    break
+        scores = [0.0] * len(self.skills)
+        matched = [0] * len(self.skills)
+        if not query:
+            return scores, matched
+        norm = math.sqrt(sum(value * value for value in query.values()))
+        indptr, weights, columns = self._indptr, self._weights, self._columns
+        for row, value in query.items():
+            value /= norm
+            for i in range(indptr[row], indptr[row + 1]):
+                column = columns[i]
+                scores[column] += value * weights[i]
+                matched[column] += 1
+        return scores, matched
+
+    def suggest(self, prompt: str, top_k: int = TOP_K) -> List[Tuple[str, float]]:
+        """Return up to top_k (skill, similarity) pairs, best first."""
+        scores, matched = self.scores(prompt)
+        candidates = [i for i, count in enumerate(matched) if count >= MIN_MATCHED_TERMS]
+        best = heapq.nlargest(top_k, candidates, key=scores.__getitem__)
+        return [(self.skills[i], scores[i]) for i in best if scores[i] >= MIN_SIMILARITY]
+
+
+SUGGESTION_TEMPLATE = """<codingbuddy-skills>
+SUGGESTED_SKILLS: {skills}
+Matched locally against the skills' descriptions; load one with
+mcp__codingbuddy__get_skill when it fits the task.
+</codingbuddy-skills>"""
+
+
+def render_suggestions(suggestions: List[Tuple[str, float]]) -> str:
+    """Render the block appended to the mode context."""
+    return SUGGESTION_TEMPLATE.format(
+        skills=", ".join(f"{name} ({score:.2f})" for name, score in suggestions)
+    )
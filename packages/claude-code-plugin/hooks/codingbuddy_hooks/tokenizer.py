@@ -0,0 +1,53 @@
+"""
+CodingBuddy Index Tokenizer
+
+The parts of tokenizing that the agent, skill and checklist indexes
+share, so index builds and prompt lookups fold words the same way:
+
+- stem() folds simple English plurals
+- cjk_bigrams() splits text with Han, kana and Hangul into character
+  bigrams, so Korean, Japanese and Chinese text matches without a
+  dictionary
+
+Each index keeps its own word pattern and stopwords.
+"""
+
+from __future__ import annotations
+
+import re
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import List
+
+# Han, kana and Hangul. Compiling the ranges takes milliseconds, so the
+# patterns built from them wait for the first non-ASCII text.
+CJK_RUN_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_cjk_run_pattern = None
+
+
+def stem(word: str) -> str:
+    """Fold simple plurals (migrations -> migration, queries -> query; not class or node.js)."""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and word.isascii() and word.isalnum():
+        if len(word) > 4 and word.endswith("ies"):
+            return word[:-3] + "y"
+        return word[:-1]
+    return word
+
+
+def run_bigrams(run: str) -> List[str]:
+    """Split a run of Han, kana or Hangul into character bigrams (a lone character stays whole)."""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def cjk_bigrams(text: str) -> List[str]:
+    """Return the bigrams of every run of Han, kana and Hangul in text."""
+    global _cjk_run_pattern
+    if _cjk_run_pattern is None:
+        _cjk_run_pattern = re.compile(f"[{CJK_RUN_RANGES}]+")
+    bigrams = []
+    for run in _cjk_run_pattern.findall(text):
+        bigrams.extend(run_bigrams(run))
+    return bigrams
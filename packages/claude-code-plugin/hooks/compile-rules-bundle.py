@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+CodingBuddy Rules Bundle Compiler
+
+Compiles packages/rules/.ai-rules/keyword-modes.json and the rule files it
+references into a single compact bundle that the mode detection hook can
+mmap. With the bundle installed, the hook inlines the mode's instructions,
+agent, default specialists and rules (core.md filtered for the mode, as
+the MCP server does) instead of asking the model to call
+mcp__codingbuddy__parse_mode.
+
+Bundle layout (all text UTF-8):
+    codingbuddy-rules <format>\\n
+    <header JSON on one line>\\n
+    <rule bodies, concatenated>
+    <rendered contexts, concatenated>
+    <agent index JSON>
+    <skill index>
+
+The header holds the plugin version, a hash of the sources, the per-mode
+metadata, the normalized keyword -> mode lookup table built from each
+mode's "keywords" list, and (offset, length) byte ranges into the body
+for each rule file and for each mode's rendered context variants
+("full" and "compact", see mode_detect.CONTEXT_VARIANTS). The hook emits
+a context by slicing it out of the mapping, with no formatting work.
+
+The agent index (see codingbuddy_hooks/agent_index.py) is built from the
+primary agents in agents/*.json; its byte range is the header's
+"agent_index". Without an agents directory the bundle has no index.
+Likewise the skill index (see codingbuddy_hooks/skill_index.py) is a
+TF-IDF matrix of the "description" frontmatter of skills/*/SKILL.md,
+under "skill_index", and the checklist index (see
+codingbuddy_hooks/checklist_index.py) flattens the domains listed in
+checklists/index.json under "checklist_index".
+
+Usage:
+    python3 hooks/compile-rules-bundle.py            # write the bundle
+    python3 hooks/compile-rules-bundle.py --check    # fail if it is stale
+    python3 hooks/compile-rules-bundle.py --sizes    # context size per mode
+"""
+
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Keep in sync with codingbuddy_hooks/mode_detect.py
+BUNDLE_FILENAME = "codingbuddy-rules.bundle"
+BUNDLE_FORMAT = 2
+BUNDLE_MAGIC = b"codingbuddy-rules %d\n" % BUNDLE_FORMAT
+
+HOOKS_DIR = Path(__file__).resolve().parent
+PLUGIN_DIR = HOOKS_DIR.parent
+DEFAULT_RULES_DIR = PLUGIN_DIR.parent / "rules" / ".ai-rules"
+DEFAULT_OUTPUT = HOOKS_DIR / BUNDLE_FILENAME
+
+# The hook owns keyword normalization; reuse it so both sides agree
+sys.path.insert(0, str(HOOKS_DIR))
+from codingbuddy_hooks import agent_index, checklist_index, mode_detect, skill_index  # noqa: E402
+
+# Mode fields copied from keyword-modes.json into the bundle header
+MODE_FIELDS = ("description", "instructions", "agent", "delegates_to", "defaultSpecialists")
+
+
+def get_plugin_version(plugin_dir: Path = PLUGIN_DIR) -> str:
+    """Read the plugin version from package.json."""
+    with open(plugin_dir / "package.json", "r", encoding="utf-8") as f:
+        return json.load(f)["version"]
+
+
+def read_skill_description(skill_file: Path) -> Optional[Tuple[str, str]]:
+    """
+    Read (name, description) from the frontmatter of a SKILL.md.
+
+    Only single-line "key: value" entries are read; quotes around the
+    value are removed. The name defaults to the skill's directory name.
+
+    Returns:
+        None if the file has no frontmatter or no description
+    """
+    lines = skill_file.read_text(encoding="utf-8").splitlines()
+    if not lines or lines[0].strip() != "---":
+        return None
+    fields = {}
+    for line in lines[1:]:
+        if line.strip() == "---":
+            break
+        key, sep, value = line.partition(":")
+        if sep and not key.startswith((" ", "\t")):
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+                value = value[1:-1]
+            fields[key.strip()] = value
+    if not fields.get("description"):
+        return None
+    return fields.get("name") or skill_file.parent.name, fields["description"]
+
+
+def compile_bundle(rules_dir: Path, version: str) -> bytes:
+    """
+    Compile keyword-modes.json and its referenced rules into bundle bytes.
+
+    The output is deterministic for the same sources and version, so the
+    committed bundle can be checked for staleness.
+
+    Raises:
+        FileNotFoundError: If keyword-modes.json or a referenced rule is missing
+        ValueError: If keyword-modes.json is malformed or has invalid keywords
+    """
+    modes_file = rules_dir / "keyword-modes.json"
+    modes_raw = modes_file.read_bytes()
+    config = json.loads(modes_raw)
+    if not isinstance(config.get("modes"), dict):
+        raise ValueError(f"{modes_file}: missing 'modes' object")
+
+    digest = hashlib.sha256(modes_raw)
+    modes = {}
+    mode_keywords = {}
+    rule_paths: List[str] = []
+    for name, mode in config["modes"].items():
+        keywords = mode.get("keywords", [])
+        if not isinstance(keywords, list):
+            raise ValueError(f"{modes_file}: 'keywords' of mode {name} must be a list")
+        mode_keywords[name] = keywords
+        entry = {field: mode[field] for field in MODE_FIELDS if field in mode}
+        entry["rules"] = list(mode.get("rules", []))
+        modes[name] = entry
+        for rule_path in entry["rules"]:
+            if rule_path not in rule_paths:
+                rule_paths.append(rule_path)
+
+    body = bytearray()
+    rules = {}
+    for rule_path in rule_paths:
+        content = (rules_dir / rule_path).read_bytes()
+        digest.update(rule_path.encode("utf-8") + b"\0" + content)
+        rules[rule_path] = [len(body), len(content)]
+        body += content
+
+    def rule_text(rule_path: str) -> str:
+        offset, length = rules[rule_path]
+        return body[offset:offset + length].decode("utf-8")
+
+    contexts = {}
+    for name, entry in modes.items():
+        rendered = {
+            "full": mode_detect.render_context(name, entry, version, rule_text),
+            "compact": mode_detect.render_compact_context(name),
+        }
+        contexts[name] = {}
+        for variant in mode_detect.CONTEXT_VARIANTS:
+            data = rendered[variant].encode("utf-8")
+            contexts[name][variant] = [len(body), len(data)]
+            body += data
+
+    agents_dir = rules_dir / "agents"
+    agents = {}
+    for agent_file in sorted(agents_dir.glob("*.json")) if agents_dir.is_dir() else []:
+        content = agent_file.read_bytes()
+        digest.update(b"agents/" + agent_file.name.encode("utf-8") + b"\0" + content)
+        agents[agent_file.stem] = json.loads(content)
+    index_range = None
+    if agents:
+        data = json.dumps(agent_index.build_index(agents), sort_keys=True, separators=(",", ":")).encode("utf-8")
+        index_range = [len(body), len(data)]
+        body += data
+
+    skills = {}
+    for skill_file in sorted(rules_dir.glob("skills/*/SKILL.md")):
+        skill = read_skill_description(skill_file)
+        if skill is not None:
+            name, description = skill
+            digest.update(b"skills/" + f"{name}\0{description}".encode("utf-8"))
+            skills[name] = description
+    skill_range = None
+    if skills:
+        data = skill_index.build_skill_index(skills)
+        skill_range = [len(body), len(data)]
+        body += data
+
+    checklists_dir = rules_dir / "checklists"
+    domains = []
+    if (checklists_dir / "index.json").is_file():
+        content = (checklists_dir / "index.json").read_bytes()
+        digest.update(b"checklists/index.json\0" + content)
+        for entry in json.loads(content).get("domains", []):
+            content = (checklists_dir / entry["file"]).read_bytes()
+            digest.update(b"checklists/" + entry["file"].encode("utf-8") + b"\0" + content)
+            domains.append({**json.loads(content), "id": entry["id"], "name": entry.get("name", entry["id"])})
+    checklist_range = None
+    if domains:
+        data = json.dumps(checklist_index.build_checklist_index(domains),
+                          sort_keys=True, separators=(",", ":")).encode("utf-8")
+        checklist_range = [len(body), len(data)]
+        body += data
+
+    header = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "source_sha256": digest.hexdigest(),
+        "defaultMode": config.get("defaultMode"),
+        "keywords": mode_detect.build_keyword_table(mode_keywords),
+        "modes": modes,
+        "rules": rules,
+        "contexts": contexts,
+    }
+    if index_range:
+        header["agent_index"] = index_range
+    if skill_range:
+        header["skill_index"] = skill_range
+    if checklist_range:
+        header["checklist_index"] = checklist_range
+    header_line = json.dumps(header, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return BUNDLE_MAGIC + header_line.encode("utf-8") + b"\n" + bytes(body)
+
+
+def context_sizes(data: bytes) -> List[Tuple[str, str, int]]:
+    """Return (mode, variant, bytes) for each precomputed context in bundle data."""
+    header_line = data[len(BUNDLE_MAGIC):].split(b"\n", 1)[0]
+    contexts = json.loads(header_line)["contexts"]
+    return [
+        (mode, variant, contexts[mode][variant][1])
+        for mode in contexts
+        for variant in mode_detect.CONTEXT_VARIANTS
+    ]
+
+
+def format_context_sizes(sizes: List[Tuple[str, str, int]]) -> str:
+    """Format context sizes with a rough token estimate (4 bytes per token)."""
+    lines = [f"{'mode':<12} {'variant':<8} {'bytes':>8} {'~tokens':>8}"]
+    for mode, variant, size in sizes:
+        lines.append(f"{mode:<12} {variant:<8} {size:>8} {-(-size // 4):>8}")
+    return "\n".join(lines) + "\n"
+
+
+def write_bundle(data: bytes, output: Path) -> None:
+    """Atomically write the bundle so a running hook never sees a partial file."""
+    tmp_file = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    try:
+        tmp_file.write_bytes(data)
+        os.replace(tmp_file, output)
+    except BaseException:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        raise
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns the process exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the CodingBuddy rules bundle")
+    parser.add_argument("--rules-dir", type=Path, default=DEFAULT_RULES_DIR)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--version", help="Bundle version (default: package.json)")
+    parser.add_argument(
+        "--check", action="store_true", help="Exit 1 if the bundle is missing or stale"
+    )
+    parser.add_argument(
+        "--sizes", action="store_true", help="Print the size of each context variant and exit"
+    )
+    args = parser.parse_args(argv)
+
+    data = compile_bundle(args.rules_dir, args.version or get_plugin_version())
+    if args.sizes:
+        sys.stdout.write(format_context_sizes(context_sizes(data)))
+        return 0
+    if args.check:
+        try:
+            current = args.output.read_bytes()
+        except OSError:
+            current = b""
+        if current != data:
+            print(f"{args.output} is out of date; run compile-rules-bundle.py", file=sys.stderr)
+            return 1
+        return 0
+
+    write_bundle(data, args.output)
+    print(f"Wrote {args.output} ({len(data)} bytes)")
+    sys.stdout.write(format_context_sizes(context_sizes(data)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
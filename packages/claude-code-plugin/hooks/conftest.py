@@ -0,0 +1,15 @@
+"""Shared pytest configuration for the hook tests."""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolate_latency_ring(tmp_path, monkeypatch):
+    """Keep hooks run by tests (including subprocesses) out of the user's latency ring."""
+    monkeypatch.setenv("CODINGBUDDY_LATENCY_FILE", str(tmp_path / "latency.ring"))
+
+
+@pytest.fixture(autouse=True)
+def _isolate_session_store(tmp_path, monkeypatch):
+    """Keep hooks run by tests (including subprocesses) out of the user's session store."""
+    monkeypatch.setenv("CODINGBUDDY_SESSION_FILE", str(tmp_path / "sessions.map"))
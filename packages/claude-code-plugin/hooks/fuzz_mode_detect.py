@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Fuzz harness for detect_mode() (stdlib only).
+
+Runs detect_mode() over randomly generated prompts and checks, for each:
+
+- the result matches reference_detect_mode(), a plain character scan
+  of the stripped prompt, as the original hook matched it
+- the call stays under a time ceiling (--ceiling-ms); a call over the
+  ceiling is retimed and only fails when its fastest run is still over
+
+Prompts are built from a keyword (as written, recased, full-width,
+decomposed, with Turkish dotted/dotless I or trailing combining marks),
+a separator and a tail, behind optional whitespace runs of any Unicode
+whitespace. Tails mix scripts, combining marks, characters whose NFKC
+form is up to 18 characters long, lone surrogates and huge runs of
+whitespace, colons or token characters. A fixed set of adversarial
+inputs (pathological_inputs()) runs first.
+
+The keyword table is the hook's (the rules bundle's, or the built-in
+one). --keywords N adds N synthetic keywords per mode to it, to check
+that a growing keyword table changes neither results nor cost.
+
+Run with:
+    python3 fuzz_mode_detect.py                       # 20000 prompts, seed 0
+    python3 fuzz_mode_detect.py --iterations 200000 --seed 7 --keywords 1000
+
+Exits 1 and prints the failing prompts (as repr, truncated) on failure.
+"""
+
+import random
+import sys
+import time
+import unicodedata
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from codingbuddy_hooks import mode_detect
+
+DEFAULT_ITERATIONS = 20000
+DEFAULT_CEILING_MS = 5.0
+# Times a call over the ceiling is rerun before it counts as a failure
+RETIMES = 5
+
+WHITESPACE = (
+    " ", "\t", "\n", "\r", "\x0b", "\x0c", "\x1c", "\x85",
+    "\xa0", "\u1680", "\u2003", "\u2028", "\u2029", "\u202f", "\u3000",
+)
+SEPARATORS = (":", "：", " : ", "\u3000", " \t", "", " ", "\n")
+COMBINING_MARKS = ("\u0301", "\u0307", "\u0308", "\u0323", "\u20dd", "\u3099")
+# NFKC expands these to several characters ("ﷺ" to 18)
+EXPANDING = ("ﷺ", "ﷻ", "㎒", "⑴", "ﬃ", "Ǆ")
+SCRIPTS = (
+    (0x0041, 0x007A),  # Latin
+    (0x00C0, 0x024F),  # Latin-1 Supplement, Latin Extended
+    (0x0370, 0x03FF),  # Greek
+    (0x0400, 0x04FF),  # Cyrillic
+    (0x0590, 0x06FF),  # Hebrew, Arabic
+    (0x0900, 0x097F),  # Devanagari
+    (0x3040, 0x30FF),  # Hiragana, Katakana
+    (0x4E00, 0x9FFF),  # CJK
+    (0xAC00, 0xD7A3),  # Hangul
+    (0xFF01, 0xFF5E),  # Full-width ASCII
+    (0x1F300, 0x1F64F),  # Emoji
+)
+
+
+def reference_detect_mode(prompt: str, keyword_table: Dict[str, str]) -> Optional[str]:
+    """
+    Detect a mode keyword the way the original hook did, without regular
+    expressions and without the detect window.
+
+    The prompt (as much of it as the hook reads) is NFKC-normalized and
+    stripped. Its first token, up to a colon or whitespace, is a keyword
+    when anything follows it: the original "^KEYWORD\\s*[:\\s]" patterns
+    on the stripped prompt.
+    """
+    text = unicodedata.normalize("NFKC", prompt[:mode_detect.PROMPT_HEAD_CHARS]).strip()
+    i = 0
+    while i < len(text) and not text[i].isspace() and text[i] != ":":
+        i += 1
+    if i == 0 or i == len(text):
+        return None
+    return keyword_table.get(text[:i].lower())
+
+
+def _random_text(rng: random.Random, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        roll = rng.random()
+        if roll < 0.1:
+            chars.append(rng.choice(WHITESPACE))
+        elif roll < 0.15:
+            chars.append(rng.choice(COMBINING_MARKS))
+        elif roll < 0.18:
+            chars.append(rng.choice(EXPANDING))
+        elif roll < 0.2:
+            chars.append(rng.choice(":："))
+        elif roll < 0.21:
+            chars.append(chr(rng.randint(0xD800, 0xDFFF)))
+        elif roll < 0.25:
+            chars.append(chr(rng.choice((rng.randint(0x80, 0xD7FF), rng.randint(0xE000, 0x2FFFF)))))
+        else:
+            low, high = rng.choice(SCRIPTS)
+            chars.append(chr(rng.randint(low, high)))
+    return "".join(chars)
+
+
+def _mutate_keyword(rng: random.Random, keyword: str) -> str:
+    roll = rng.random()
+    if roll < 0.2:
+        return keyword
+    if roll < 0.35:
+        return "".join(c.upper() if rng.random() < 0.5 else c.lower() for c in keyword)
+    if roll < 0.45:
+        # Full-width forms, as typed through CJK IMEs
+        return "".join(chr(ord(c) + 0xFEE0) if "!" <= c <= "~" else c for c in keyword)
+    if roll < 0.55:
+        # Decomposed accents: "AUTOMÁTICO" as "AUTOMA\u0301TICO"
+        return unicodedata.normalize("NFD", keyword)
+    if roll < 0.65:
+        # Turkish dotted capital and dotless small I
+        return keyword.replace("I", rng.choice(("İ", "ı", "i\u0307")))
+    if roll < 0.75:
+        return keyword + "".join(rng.choice(COMBINING_MARKS) for _ in range(rng.randint(1, 3)))
+    if roll < 0.85:
+        position = rng.randint(0, len(keyword))
+        return keyword[:position] + _random_text(rng, 1) + keyword[position:]
+    if roll < 0.9:
+        return keyword.upper().lower().swapcase()
+    return keyword[:rng.randint(0, len(keyword))]
+
+
+def _whitespace_run(rng: random.Random, length: int) -> str:
+    # A random pattern of up to 64 characters, repeated to length
+    pattern = "".join(rng.choices(WHITESPACE, k=min(length, rng.choice((1, 64)))))
+    return (pattern * (length // len(pattern) + 1))[:length]
+
+
+def generate_prompt(rng: random.Random, keywords: Sequence[str]) -> str:
+    """Build one random prompt, usually starting with a (mutated) keyword."""
+    parts = []
+    if rng.random() < 0.3:
+        parts.append(_whitespace_run(rng, rng.choice((1, 3, 40, 255, 256, 5000))))
+    if rng.random() < 0.8:
+        parts.append(_mutate_keyword(rng, rng.choice(keywords)))
+    else:
+        parts.append(_random_text(rng, rng.randint(0, 12)))
+    parts.append(rng.choice(SEPARATORS))
+    roll = rng.random()
+    if roll < 0.6:
+        parts.append(_random_text(rng, rng.randint(0, 300)))
+    elif roll < 0.7:
+        parts.append(_whitespace_run(rng, rng.choice((10, 300, 100000))))
+    elif roll < 0.8:
+        parts.append(rng.choice((":", "a", "ﷺ", "\u0301", "가")) * rng.choice((300, 100000)))
+    elif roll < 0.9:
+        parts.append(_whitespace_run(rng, rng.randint(1, 300)) + _random_text(rng, rng.randint(0, 5)))
+    return "".join(parts)
+
+
+def pathological_inputs() -> Iterator[str]:
+    """Yield inputs aimed at backtracking, window edges and NFKC expansion."""
+    big = 1 << 20
+    yield ""
+    yield " " * big
+    yield "\u3000" * big
+    yield "PLAN" + " " * big
+    yield "PLAN" + " " * big + "x"
+    yield " " * big + "PLAN: x"
+    yield "a" * big
+    yield "PLAN" * (big // 4)
+    yield ":" * big
+    yield "PLAN" + " \t" * (big // 2) + ":"
+    yield "a " * (big // 2)
+    yield " a" * (big // 2)
+    yield "ﷺ" * big
+    yield "PLAN" + "\u0301" * big
+    yield "\u0301" * big
+    yield "ＰＬＡＮ" + "：" * big
+    yield "\ud800" * big
+    for offset in range(mode_detect.DETECT_WINDOW - 8, mode_detect.DETECT_WINDOW + 2):
+        yield " " * offset + "PLAN: x"
+        yield "PLAN" + " " * offset + "x"
+    # The end of the prompt head the hook reads
+    for offset in range(mode_detect.PROMPT_HEAD_CHARS - 8, mode_detect.PROMPT_HEAD_CHARS + 2):
+        yield " " * offset + "PLAN: x"
+        yield "PLAN" + " " * offset + "x"
+
+
+def synthetic_keyword_table(rng: random.Random, per_mode: int,
+                            base: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Return base (default: get_keyword_table()) plus per_mode random keywords for each mode."""
+    table = dict(mode_detect.get_keyword_table() if base is None else base)
+    for mode in sorted(set(table.values())):
+        added = 0
+        while added < per_mode:
+            candidate = _random_text(rng, rng.randint(1, 10))
+            try:
+                (key,) = mode_detect.build_keyword_table({mode: [candidate]})
+            except ValueError:
+                continue
+            if key not in table:
+                table[key] = mode
+                added += 1
+    return table
+
+
+def _time_call(prompt: str, keyword_table: Dict[str, str]) -> Tuple[Optional[str], float]:
+    started = time.perf_counter()
+    result = mode_detect.detect_mode(prompt, keyword_table)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def check_prompt(prompt: str, keyword_table: Dict[str, str], ceiling_ms: float) -> Optional[str]:
+    """Check one prompt; return a failure description or None."""
+    actual, elapsed_ms = _time_call(prompt, keyword_table)
+    if elapsed_ms > ceiling_ms:
+        elapsed_ms = min(_time_call(prompt, keyword_table)[1] for _ in range(RETIMES))
+        if elapsed_ms > ceiling_ms:
+            return f"took {elapsed_ms:.3f} ms (ceiling {ceiling_ms} ms)"
+    expected = reference_detect_mode(prompt, keyword_table)
+    if actual != expected:
+        return f"detect_mode() returned {actual!r}, reference {expected!r}"
+    return None
+
+
+def fuzz(
+    iterations: int = DEFAULT_ITERATIONS,
+    seed: int = 0,
+    ceiling_ms: float = DEFAULT_CEILING_MS,
+    keyword_table: Optional[Dict[str, str]] = None,
+) -> Tuple[Dict[str, int], List[Tuple[str, str]]]:
+    """
+    Check the pathological inputs and iterations random prompts.
+
+    Returns:
+        (stats, failures): counts of checked prompts and detected modes,
+        and (prompt, failure description) pairs
+    """
+    if keyword_table is None:
+        keyword_table = mode_detect.get_keyword_table()
+    rng = random.Random(seed)
+    keywords = sorted(keyword_table)
+    stats: Dict[str, int] = {"prompts": 0, "detected": 0}
+    failures = []
+
+    def prompts() -> Iterator[str]:
+        yield from pathological_inputs()
+        for _ in range(iterations):
+            yield generate_prompt(rng, keywords)
+
+    for prompt in prompts():
+        stats["prompts"] += 1
+        failure = check_prompt(prompt, keyword_table, ceiling_ms)
+        if failure:
+            failures.append((prompt, failure))
+        elif mode_detect.detect_mode(prompt, keyword_table):
+            stats["detected"] += 1
+    return stats, failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns the process exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fuzz detect_mode() against a reference implementation")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Random prompts to check")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--ceiling-ms", type=float, default=DEFAULT_CEILING_MS,
+                        help="Per-call time ceiling in milliseconds")
+    parser.add_argument("--keywords", type=int, default=0, metavar="N",
+                        help="Add N synthetic keywords per mode to the table")
+    args = parser.parse_args(argv)
+
+    keyword_table = mode_detect.get_keyword_table()
+    if args.keywords:
+        keyword_table = synthetic_keyword_table(random.Random(args.seed), args.keywords)
+    stats, failures = fuzz(args.iterations, args.seed, args.ceiling_ms, keyword_table)
+    sys.stdout.write(
+        f"{stats['prompts']} prompts, {stats['detected']} detected, "
+        f"{len(keyword_table)} keywords, {len(failures)} failures\n"
+    )
+    for prompt, failure in failures[:20]:
+        shown = repr(prompt[:80]) + (f" (+{len(prompt) - 80} chars)" if len(prompt) > 80 else "")
+        sys.stdout.write(f"  {failure}: {shown}\n")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
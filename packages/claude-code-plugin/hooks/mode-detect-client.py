@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+CodingBuddy Mode Detection Client
+
+Minimal UserPromptSubmit hook for resident mode. Forwards the hook payload
+to the mode detection daemon over a per-user Unix domain socket and prints
+its reply, so each prompt only pays for a bare interpreter start.
+
+If the daemon is not running, the payload is handled in-process by the
+codingbuddy_hooks package installed next to this file. The daemon itself
+is started by session-start.py.
+
+Intended to run as: python3 -I -S ~/.claude/hooks/codingbuddy-mode-client.py
+"""
+
+import io
+import os
+import socket
+import stat
+import struct
+import sys
+
+# Version header read by session-start.py to decide on upgrades
+# (kept in sync with the plugin version by scripts/sync-version.js)
+HOOK_VERSION = "3.1.0"
+
+# Keep in sync with codingbuddy_hooks/mode_detect.py
+SOCKET_ENV = "CODINGBUDDY_SOCKET"
+SOCKET_NAME = "mode-detect.sock"
+
+# Mode detection module, in the hook package next to this client
+DETECT_MODULE = os.path.join("codingbuddy_hooks", "mode_detect.py")
+
+# Seconds to wait for the daemon before falling back
+CLIENT_TIMEOUT = 2.0
+
+READ_CHUNK_SIZE = 65536
+
+
+def get_socket_path() -> str:
+    """Get the per-user Unix socket path of the resident daemon."""
+    override = os.environ.get(SOCKET_ENV)
+    if override:
+        return override
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "codingbuddy", SOCKET_NAME)
+    return os.path.join("/tmp", f"codingbuddy-{os.getuid()}", SOCKET_NAME)
+
+
+def check_socket_path(socket_path: str) -> None:
+    """
+    Make sure socket_path is a socket only the current user could have made.
+
+    Both the socket and its directory must be owned by the current user
+    and not writable by group or others, so no other local user can put
+    a daemon of their own in its place (the /tmp fallback in particular).
+
+    Raises:
+        PermissionError: If the directory or socket fails a check
+        OSError: If either does not exist
+    """
+    uid = os.getuid()
+    for path, kind in ((os.path.dirname(socket_path) or ".", stat.S_ISDIR), (socket_path, stat.S_ISSOCK)):
+        st = os.lstat(path)
+        if not kind(st.st_mode) or st.st_uid != uid or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError(f"{path} is not a private {'directory' if kind is stat.S_ISDIR else 'socket'}")
+
+
+def check_peer(sock: socket.socket) -> None:
+    """
+    Make sure the daemon on the other end runs as the current user.
+
+    Only checked where the kernel reports peer credentials (SO_PEERCRED,
+    Linux); elsewhere check_socket_path() has to suffice.
+
+    Raises:
+        PermissionError: If the peer is another user
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, peer_uid, _ = struct.unpack("3i", creds)
+    if peer_uid != os.getuid():
+        raise PermissionError(f"daemon runs as uid {peer_uid}")
+
+
+def connect_daemon(socket_path: str) -> socket.socket:
+    """
+    Connect to the daemon, after checking who owns its socket.
+
+    Raises:
+        OSError: If the daemon is not running, or PermissionError if the
+            socket or the daemon belongs to someone else
+    """
+    check_socket_path(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CLIENT_TIMEOUT)
+    try:
+        sock.connect(socket_path)
+        check_peer(sock)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def query_daemon(sock: socket.socket, stream: io.BufferedIOBase) -> bytes:
+    """
+    Stream a hook payload to the daemon and return its reply.
+
+    The payload is forwarded chunk by chunk, so large prompts are never
+    held in memory by the client.
+
+    Raises:
+        OSError: If the daemon goes away or does not answer in time
+    """
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        sock.sendall(chunk)
+    sock.shutdown(socket.SHUT_WR)
+    chunks = []
+    while True:
+        chunk = sock.recv(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def find_detect_hook() -> str:
+    """Return the directory holding the hook package next to this client, or ''."""
+    hooks_dir = os.path.dirname(os.path.abspath(__file__))
+    if os.path.isfile(os.path.join(hooks_dir, DETECT_MODULE)):
+        return hooks_dir
+    return ""
+
+
+def run_in_process(hooks_dir: str) -> None:
+    """Handle stdin with the hook package from hooks_dir in this process."""
+    sys.path.insert(0, hooks_dir)
+    from codingbuddy_hooks import mode_detect
+
+    mode_detect.main()
+
+
+def main():
+    """Main entry point for the client."""
+    try:
+        sock = connect_daemon(get_socket_path())
+    except OSError:
+        # Not running, or not ours: handle the prompt in-process
+        sock = None
+
+    if sock is not None:
+        with sock:
+            try:
+                reply = query_daemon(sock, sys.stdin.buffer)
+            except OSError as e:
+                # Payload already consumed - skip context rather than block
+                print(f"CodingBuddy client error: {e}", file=sys.stderr)
+                sys.exit(0)
+        sys.stdout.buffer.write(reply)
+        sys.stdout.flush()
+        sys.exit(0)
+
+    detect_hook = find_detect_hook()
+    if not detect_hook:
+        print("CodingBuddy: mode detection hook not found", file=sys.stderr)
+        sys.exit(0)
+
+    run_in_process(detect_hook)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Stress harness for concurrent session starts (stdlib only).
+
+Starts N session-start.py processes at once against a fresh temporary
+home, the way CI or a tmux layout starts many Claude Code sessions, and
+checks that they install once:
+
+- every process exits 0 without writing to stderr
+- settings.json has exactly one UserPromptSubmit entry for the hook
+- exactly one process reports the install (the install lease holder),
+  or, when session starts ran out of their latency budget, the install
+  report of the background worker they handed the install to
+- the install stamp is current afterwards
+
+The wall time is that of the session start processes; waiting for a
+background worker is not part of it.
+
+Run with:
+    python3 stress_session_start.py                   # 30 sessions, 3 rounds
+    python3 stress_session_start.py --sessions 100 --rounds 10
+
+Prints the wall time of each round (first spawn to last exit) and exits
+1 on any failed check.
+"""
+
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from codingbuddy_hooks import install_stamp, session_start
+
+HOOKS_DIR = Path(__file__).parent
+PLUGIN_DIR = HOOKS_DIR.parent
+
+DEFAULT_SESSIONS = 30
+DEFAULT_ROUNDS = 3
+
+# Upper bound on the wait for a background install worker
+WORKER_TIMEOUT = 30.0
+
+
+def hook_entries(settings_file: Path) -> List[str]:
+    """Return every codingbuddy UserPromptSubmit command registered in settings_file."""
+    settings = json.loads(settings_file.read_text(encoding="utf-8"))
+    known = set(session_start.HOOK_COMMANDS.values()) | set(session_start.LEGACY_HOOK_COMMANDS)
+    return [
+        hook.get("command")
+        for group in settings.get("hooks", {}).get("UserPromptSubmit", [])
+        for hook in group.get("hooks", [])
+        if hook.get("command") in known
+    ]
+
+
+def check_home(home: Path) -> List[str]:
+    """Check the installation in home; return the failed checks."""
+    settings_file = home / ".claude" / "settings.json"
+    hooks_dir = home / ".claude" / "hooks"
+    try:
+        entries = hook_entries(settings_file)
+    except (OSError, ValueError) as e:
+        return [f"settings.json unreadable: {e}"]
+    problems = []
+    if entries != [session_start.HOOK_COMMAND]:
+        problems.append(f"expected one UserPromptSubmit entry, found {entries}")
+    stamp = install_stamp.compute_stamp(
+        str(hooks_dir), str(settings_file), install_stamp.HOOK_MODE_CLASSIC, str(PLUGIN_DIR)
+    )
+    if not install_stamp.is_stamp_current(str(hooks_dir / install_stamp.STAMP_FILENAME), stamp):
+        problems.append("install stamp is not current")
+    return problems
+
+
+def wait_for_install_worker(home: Path, reported: int, timeout: float = WORKER_TIMEOUT) -> int:
+    """
+    Wait until no install is in progress in home.
+
+    Session starts out of budget hand the install to a detached worker,
+    which writes its report after releasing the install lease. Waits for
+    the lease to be free with the stamp current and, if no session start
+    reported the install itself, for the worker's report.
+
+    Returns:
+        The number of installs the worker report holds
+    """
+    hooks_dir = home / ".claude" / "hooks"
+    report_file = hooks_dir / install_stamp.INSTALL_REPORT_FILENAME
+    installed = session_start.MESSAGES["en"]["installed"]
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            report = report_file.read_text(encoding="utf-8").partition("\0")[0]
+        except OSError:
+            report = ""
+        worker_installs = report.count(installed)
+        if not check_home(home) and (reported or worker_installs):
+            try:
+                lease_fd, _ = session_start.acquire_install_lease(hooks_dir, 0)
+            except session_start.InstallLeaseTimeout:
+                pass
+            else:
+                session_start.release_install_lease(lease_fd)
+                return worker_installs
+        if time.monotonic() >= deadline:
+            return worker_installs
+        time.sleep(0.05)
+
+
+def run_round(sessions: int, home: Path) -> Dict[str, object]:
+    """
+    Start sessions session-start.py processes at once against home.
+
+    Returns:
+        {"wall_ms", "installs", "problems"}
+    """
+    env = {
+        **os.environ,
+        "HOME": str(home),
+        "CLAUDE_PLUGIN_DIR": str(PLUGIN_DIR),
+        "LANG": "en_US.UTF-8",
+        # Keep the samples of this run out of the user's latency ring
+        "CODINGBUDDY_LATENCY": "0",
+    }
+    for name in (install_stamp.HOOK_MODE_ENV, install_stamp.INSTALL_ENV, install_stamp.PROFILE_ENV):
+        env.pop(name, None)
+    args = [sys.executable, "-I", "-S", str(HOOKS_DIR / "session-start.py")]
+
+    started = time.perf_counter()
+    procs = [
+        subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+        for _ in range(sessions)
+    ]
+    outputs = [proc.communicate() for proc in procs]
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    problems = []
+    installed = session_start.MESSAGES["en"]["installed"]
+    installs = sum(installed in out for out, _ in outputs)
+    installs += wait_for_install_worker(home, installs)
+    for proc, (_, err) in zip(procs, outputs):
+        if proc.returncode != 0 or err:
+            problems.append(f"session start exited {proc.returncode}: {err.strip()[:200]}")
+    if installs != 1:
+        problems.append(f"expected one process or install worker to report the install, {installs} did")
+    problems.extend(check_home(home))
+    return {"wall_ms": round(wall_ms, 1), "installs": installs, "problems": problems}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns the process exit code."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Start many session-start.py processes at once")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="Parallel session starts")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Rounds, each with a fresh home")
+    args = parser.parse_args(argv)
+
+    walls = []
+    failed = False
+    for round_number in range(1, args.rounds + 1):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            result = run_round(args.sessions, Path(tmpdir))
+        finally:
+            # A worker that started late may still be reading the home
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        walls.append(result["wall_ms"])
+        status = "ok" if not result["problems"] else "FAILED"
+        sys.stdout.write(f"round {round_number}: {args.sessions} sessions in {result['wall_ms']:.1f} ms, {status}\n")
+        for problem in result["problems"]:
+            sys.stdout.write(f"  - {problem}\n")
+        failed = failed or bool(result["problems"])
+    sys.stdout.write(f"median wall time: {statistics.median(walls):.1f} ms\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
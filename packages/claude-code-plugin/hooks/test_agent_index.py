@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/agent_index.py
+
+Run with: python3 -m pytest test_agent_index.py -v
+"""
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from codingbuddy_hooks import agent_index, mode_detect
+
+AGENTS_DIR = Path(__file__).parent.parent.parent / "rules" / ".ai-rules" / "agents"
+
+
+def _agent(role_type="primary", **role):
+    return {"description": "", "role": {"type": role_type, **role}}
+
+
+AGENTS = {
+    "backend-developer": _agent(title="Backend Developer", expertise=["GraphQL APIs", "Node.js"]),
+    "frontend-developer": _agent(expertise=["React components", "CSS"], supported_frameworks={
+        "list": ["Next.js"], "note": "GraphQL clients welcome",
+    }),
+    "data-engineer": _agent(expertise=["Database migrations", "APIs"]),
+    "code-reviewer": _agent("utility", expertise=["GraphQL review"]),
+}
+
+
+class TestTerms:
+    """Tests for the tokenizer shared by index and prompts."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Add a GraphQL endpoint", {"add", "graphql", "endpoint"}),
+        ("Node.js, C++ and C#.", {"node.js", "c++", "c#"}),
+        ("Database migrations", {"database", "migration"}),
+        ("class access", {"class", "access"}),
+        ("N+1 queries in libraries", {"n+1", "query", "library"}),
+        ("API 엔드포인트", {"api", "엔드", "드포", "포인", "인트"}),
+        ("数据库 迁移", {"数据", "据库", "迁移"}),
+    ])
+    def test_terms(self, text, expected):
+        assert agent_index.terms(text) == expected
+
+
+class TestBuildIndex:
+    """Tests for build_index."""
+
+    def test_indexes_primary_agents_only(self):
+        index = agent_index.build_index(AGENTS)
+
+        assert index["agents"] == ["backend-developer", "data-engineer", "frontend-developer"]
+        # Listed by backend-developer only, so it carries the largest weight
+        assert index["terms"]["graphql"] == [1099, 0]
+        assert index["terms"]["api"] == [405, 0, 1]
+        assert "note" not in index["terms"] and "client" not in index["terms"]
+
+    def test_terms_every_agent_lists_are_dropped(self):
+        agents = {name: _agent(expertise=["Testing", name]) for name in ("a-x", "b-y")}
+
+        assert "testing" not in agent_index.build_index(agents)["terms"]
+
+    def test_rejects_other_formats(self):
+        with pytest.raises(ValueError):
+            agent_index.AgentIndex({"format": 99, "agents": [], "terms": {}})
+        with pytest.raises(ValueError):
+            agent_index.AgentIndex({"format": agent_index.INDEX_FORMAT})
+
+
+class TestRecommend:
+    """Tests for AgentIndex.recommend."""
+
+    @pytest.fixture
+    def index(self):
+        return agent_index.AgentIndex(json.loads(json.dumps(agent_index.build_index(AGENTS))))
+
+    def test_recommends_clear_winner(self, index):
+        assert index.recommend("add a GraphQL API for orders") == ("backend-developer", ["api", "graphql"])
+
+    def test_matches_agents_described_in_cjk(self):
+        agents = {**AGENTS, "data-engineer": _agent(expertise=["데이터베이스 마이그레이션", "APIs"])}
+        index = agent_index.AgentIndex(agent_index.build_index(agents))
+
+        agent, matched = index.recommend("PLAN: 주문 테이블 마이그레이션 설계")
+        assert agent == "data-engineer"
+        assert "마이" in matched
+
+    def test_no_recommendation_below_minimum(self, index):
+        assert index.recommend("add an API") is None
+        assert index.recommend("fix the build") is None
+
+    def test_no_recommendation_on_tie(self, index):
+        assert index.recommend("GraphQL with CSS") is None
+
+    def test_render(self):
+        block = agent_index.render_recommendation("backend-developer", ["api", "graphql"])
+
+        assert "SUGGESTED_PRIMARY_AGENT: backend-developer\nMATCHED_TERMS: api, graphql\n" in block
+
+
+@pytest.fixture(scope="module")
+def shipped_index():
+    agents = {path.stem: json.loads(path.read_text(encoding="utf-8")) for path in AGENTS_DIR.glob("*.json")}
+    return agent_index.AgentIndex(agent_index.build_index(agents))
+
+
+@pytest.mark.skipif(not AGENTS_DIR.is_dir(), reason="agent definitions not available")
+class TestShippedAgents:
+    """The index built from packages/rules/.ai-rules/agents."""
+
+    @pytest.mark.parametrize("prompt,expected", [
+        ("PLAN: add a GraphQL endpoint for orders", "backend-developer"),
+        ("ACT: build a React component for the login form", "frontend-developer"),
+        ("PLAN: design the database schema and migrations", "data-engineer"),
+        ("ACT: deploy to kubernetes with terraform", "platform-engineer"),
+        ("PLAN: add RAG with embeddings and an LLM", "ai-ml-engineer"),
+        ("ACT: set up eslint and prettier in the monorepo", "tooling-engineer"),
+    ])
+    def test_recommendations(self, shipped_index, prompt, expected):
+        assert shipped_index.recommend(prompt)[0] == expected
+
+    def test_scoring_is_sub_millisecond(self, shipped_index):
+        prompt = "PLAN: add a GraphQL endpoint with auth and rate limiting for the orders service " * 8
+        shipped_index.recommend(prompt)
+        started = time.perf_counter()
+        for _ in range(100):
+            shipped_index.recommend(prompt)
+        assert (time.perf_counter() - started) / 100 < 0.001
+
+    def test_committed_bundle_has_index(self):
+        bundle = mode_detect.load_rules_bundle(str(Path(__file__).parent / mode_detect.BUNDLE_FILENAME))
+
+        assert bundle.agent_index().agents == sorted(
+            path.stem for path in AGENTS_DIR.glob("*.json")
+            if json.loads(path.read_text(encoding="utf-8"))["role"].get("type") == "primary"
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/batch.py
+
+Run with: python3 -m pytest test_batch.py -v
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from codingbuddy_hooks import batch
+
+PROMPTS = [
+    "PLAN: design the login form",
+    "계획: 로그인 폼 설계",
+    "ＰＬＡＮ：ログイン",
+    "EVALUAR: revisar",
+    "please fix the build",
+    "PALN: typo here",
+    "**ACT**: implement it",
+    "ok, so EVAL: the result",
+    "AUTO",
+]
+
+
+def _write_prompts(path: Path, prompts, repeat: int = 1) -> Path:
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(repeat):
+            for prompt in prompts:
+                f.write(json.dumps({"prompt": prompt}, ensure_ascii=False) + "\n")
+    return path
+
+
+def _transcript_line(content) -> str:
+    return json.dumps({"type": "user", "message": {"role": "user", "content": content}}) + "\n"
+
+
+class TestClassifier:
+    """Tests for per-prompt classification."""
+
+    def test_counts_modes_languages_and_keywords(self):
+        classifier = batch.Classifier()
+        for prompt in PROMPTS:
+            classifier.add(prompt)
+
+        counts = classifier.counts
+        assert counts["modes"]["PLAN"] == 3
+        assert counts["modes"]["EVAL"] == 1
+        assert counts["languages"][("PLAN", "ko")] == 1
+        assert counts["languages"][("EVAL", "es")] == 1
+        assert counts["keywords"][("PLAN", "plan")] == 2
+
+    @pytest.mark.parametrize("prompt,expected", [
+        ("PALN: design", ("typo", "plan")),
+        ("## ACT: go", ("late", "act")),
+        ("**ACT**: go", ("marked", "act")),
+        ("AUTO", ("bare", "auto")),
+        ("ok, so EVAL: the result", ("late", "eval")),
+        ("please fix the build", None),
+    ])
+    def test_near_miss(self, prompt, expected):
+        assert batch.Classifier().near_miss(prompt) == expected
+
+    def test_near_misses_are_bounded(self):
+        classifier = batch.Classifier(near_miss_capacity=3)
+        for i in range(50):
+            classifier.add(f"PALN: variant {i}")
+        classifier.add("PALN: variant 0")
+
+        assert len(classifier.counts["near_misses"]) == 3
+        assert sum(classifier.counts["near_misses"].values()) == 51
+
+    def test_within_one_edit(self):
+        assert batch._within_one_edit("paln", "plan")
+        assert batch._within_one_edit("pln", "plan")
+        assert batch._within_one_edit("plans", "plan")
+        assert not batch._within_one_edit("plan", "plan")
+        assert not batch._within_one_edit("apple", "plan")
+
+
+class TestExtractPrompt:
+    """Tests for prompt-file and transcript entries."""
+
+    def test_prompt_file_entry(self):
+        assert batch.extract_prompt({"prompt": "ACT: x"}) == "ACT: x"
+
+    def test_transcript_text_parts(self):
+        entry = json.loads(_transcript_line([{"type": "text", "text": "AUTO: build"}]))
+        assert batch.extract_prompt(entry) == "AUTO: build"
+
+    def test_transcript_tool_result_and_assistant_are_ignored(self):
+        tool = json.loads(_transcript_line([{"type": "tool_result", "content": "PLAN: x"}]))
+        assistant = {"type": "assistant", "message": {"content": "PLAN: x"}}
+        assert batch.extract_prompt(tool) is None
+        assert batch.extract_prompt(assistant) is None
+
+
+class TestSharding:
+    """Tests for byte-range shards."""
+
+    def test_every_line_is_read_once_across_shards(self, tmp_path):
+        path = _write_prompts(tmp_path / "p.jsonl", PROMPTS, repeat=20)
+        expected = path.read_bytes().splitlines(keepends=True)
+
+        for shard_bytes in (1, 7, 64, 1000, 1 << 20):
+            lines = [
+                line
+                for shard in batch.plan_shards([str(path)], shard_bytes)
+                for line in batch.iter_shard_lines(shard)
+            ]
+            assert lines == expected, shard_bytes
+
+    def test_long_lines_are_skipped(self, tmp_path):
+        path = tmp_path / "p.jsonl"
+        path.write_text(
+            json.dumps({"prompt": "PLAN: " + "x" * 5000}) + "\n" + json.dumps({"prompt": "ACT: y"}) + "\n"
+        )
+
+        (shard,) = batch.plan_shards([str(path)])
+        lines = list(batch.iter_shard_lines(shard, max_line_bytes=1000))
+
+        assert lines[0] is None
+        assert json.loads(lines[1]) == {"prompt": "ACT: y"}
+
+    def test_directories_are_searched_for_jsonl(self, tmp_path):
+        project = tmp_path / "projects" / "demo"
+        project.mkdir(parents=True)
+        (project / "session.jsonl").write_text(_transcript_line("PLAN: x"))
+        (project / "notes.txt").write_text("PLAN: ignored")
+
+        files = list(batch.iter_input_files([str(tmp_path / "projects")]))
+
+        assert files == [str(project / "session.jsonl")]
+
+
+class TestClassifyPaths:
+    """Tests for the batch API."""
+
+    def test_results_do_not_depend_on_sharding_or_jobs(self, tmp_path):
+        path = _write_prompts(tmp_path / "p.jsonl", PROMPTS, repeat=50)
+
+        single = batch.build_report(batch.classify_paths([str(path)], jobs=1))
+        sharded = batch.build_report(batch.classify_paths([str(path)], jobs=2, shard_bytes=1024))
+
+        for key in ("prompts", "lines", "modes", "languages", "keywords", "near_misses"):
+            assert single[key] == sharded[key]
+        assert sharded["shards"] > 1
+        assert single["prompts"] == len(PROMPTS) * 50
+
+    def test_invalid_and_long_lines_are_counted(self, tmp_path):
+        path = tmp_path / "p.jsonl"
+        path.write_text('{"prompt": broken\n' + json.dumps({"prompt": "x" * 3000}) + "\n")
+
+        counts = batch.classify_paths([str(path)], jobs=1, max_line_bytes=1000)
+
+        assert counts["lines"] == 2
+        assert counts["skipped_lines"] == 2
+        assert counts["prompts"] == 0
+
+    def test_report_lists_top_near_misses(self, tmp_path):
+        path = _write_prompts(tmp_path / "p.jsonl", ["PALN: often"] * 5 + ["**ACT**: once"])
+
+        report = batch.build_report(batch.classify_paths([str(path)], jobs=1), top=1)
+
+        assert report["near_misses"] == [
+            {"prompt": "PALN: often", "reason": "typo", "keyword": "plan", "count": 5}
+        ]
+
+
+class TestCli:
+    """Tests for classify-prompts.py."""
+
+    def test_json_report(self, tmp_path):
+        path = _write_prompts(tmp_path / "p.jsonl", PROMPTS)
+        script = Path(__file__).parent / "classify-prompts.py"
+
+        result = subprocess.run(
+            [sys.executable, str(script), "--json", "-j", "1", str(path)],
+            capture_output=True, text=True,
+        )
+
+        assert result.returncode == 0, result.stderr
+        report = json.loads(result.stdout)
+        assert report["modes"]["PLAN"] == 3
+
+    def test_missing_input_fails(self, tmp_path, capsys):
+        assert batch.main([str(tmp_path / "missing.jsonl")]) == 1
+        assert "classify-prompts" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
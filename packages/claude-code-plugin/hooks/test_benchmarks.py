@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Unit tests for benchmarks.py
+
+Run with: python3 -m pytest test_benchmarks.py -v
+"""
+
+import json
+
+import pytest
+
+import benchmarks
+from codingbuddy_hooks import install_stamp, session_start
+
+
+def _metric(median_ms: float) -> dict:
+    return {"median_ms": median_ms, "min_ms": median_ms, "max_ms": median_ms}
+
+
+class TestCompareResults:
+    """Tests for compare_results function."""
+
+    def test_reports_regression_beyond_tolerance(self):
+        baseline = {"detect_mode": {"en/10B": _metric(10.0)}}
+        current = {"detect_mode": {"en/10B": _metric(13.0)}}
+
+        (message,) = benchmarks.compare_results(baseline, current, tolerance=0.25, min_delta_ms=0)
+
+        assert message.startswith("detect_mode/en/10B: 10.000 ms -> 13.000 ms")
+
+    def test_within_tolerance_passes(self):
+        baseline = {"detect_mode": {"en/10B": _metric(10.0)}}
+        current = {"detect_mode": {"en/10B": _metric(12.0)}}
+        assert benchmarks.compare_results(baseline, current, tolerance=0.25, min_delta_ms=0) == []
+
+    def test_ignores_tiny_absolute_slowdowns(self):
+        baseline = {"detect_mode": {"en/10B": _metric(0.001)}}
+        current = {"detect_mode": {"en/10B": _metric(0.004)}}
+        assert benchmarks.compare_results(baseline, current, tolerance=0.25, min_delta_ms=0.5) == []
+
+    def test_skips_metrics_missing_from_baseline(self):
+        current = {"session_start": {"fast": _metric(5.0)}}
+        assert benchmarks.compare_results({}, current) == []
+
+
+class TestBaselines:
+    """Tests for saving, loading and comparing baselines."""
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        results = {"version_discovery": {"indexed/100": _metric(0.2)}}
+
+        benchmarks.save_baseline(path, results, quick=True)
+
+        assert benchmarks.load_baseline(path) == results
+        assert json.loads((tmp_path / "baseline.json").read_text())["quick"] is True
+
+    def test_rejects_unknown_format(self, tmp_path):
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps({"format": 99, "results": {}}))
+        with pytest.raises(ValueError):
+            benchmarks.load_baseline(str(path))
+
+    def test_compare_mode_fails_on_regression(self, tmp_path, capsys):
+        path = str(tmp_path / "baseline.json")
+        results = benchmarks.bench_version_discovery(quick=True)
+        faster = {name: _metric(0.0) for name in results}
+        benchmarks.save_baseline(path, {"version_discovery": faster}, quick=True)
+
+        code = benchmarks.main([
+            "version_discovery", "--quick", "--compare", path, "--min-delta-ms", "0",
+        ])
+
+        assert code == 1
+        assert "REGRESSION version_discovery/" in capsys.readouterr().err
+
+    def test_skill_match_scales_with_skill_count(self):
+        results = benchmarks.bench_skill_match(quick=True)
+
+        assert {"load/15", "match/100", "total/500", "cold/en/500", "cold/ko/500"} <= results.keys()
+        assert len(benchmarks.synthetic_skills(40)) == 40
+        assert benchmarks.synthetic_skills(5) == benchmarks.synthetic_skills(5)
+
+    def test_session_start_iteration_installs_the_hook(self):
+        with benchmarks._session_start_home(session_start, 2, 1 << 10) as home:
+            benchmarks._run_session_start(session_start)
+
+            hooks_dir = home / ".claude" / "hooks"
+            for module in install_stamp.HOOK_PACKAGE_MODULES:
+                assert (hooks_dir / install_stamp.PACKAGE_NAME / module).exists()
+
+    def test_session_start_iteration_fails_without_install(self):
+        with benchmarks._session_start_home(session_start, 1, 1 << 10) as home:
+            source = home / session_start.PLUGIN_CACHE_PATHS[0] / "1.0.0" / "hooks"
+            (source / install_stamp.PACKAGE_NAME / "mode_detect.py").unlink()
+
+            with pytest.raises(RuntimeError, match="did not install"):
+                benchmarks._run_session_start(session_start)
+
+    def test_compare_mode_passes_without_comparable_metrics(self, tmp_path):
+        path = str(tmp_path / "baseline.json")
+        benchmarks.save_baseline(path, {"version_discovery": {}}, quick=True)
+        assert benchmarks.main(["version_discovery", "--quick", "--compare", path]) == 0
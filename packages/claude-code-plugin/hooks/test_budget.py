@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/budget.py and the hooks' degradation
+
+Run with: python3 -m pytest test_budget.py -v
+"""
+
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from codingbuddy_hooks import budget, latency, mode_detect, session_start
+
+HOOKS_DIR = Path(__file__).parent
+PROMPT_ENV = budget.BUDGET_ENVS["user-prompt-submit"]
+SESSION_ENV = budget.BUDGET_ENVS["session-start"]
+
+needs_alarm = pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="hard stop needs setitimer()")
+
+
+class TestGetBudget:
+    """Tests for the per-hook deadline settings."""
+
+    @pytest.mark.parametrize("value,expected", [
+        ("", 30.0),
+        ("12.5", 12.5),
+        ("0", None),
+        ("off", None),
+        ("-5", None),
+        ("soon", 30.0),
+    ])
+    def test_prompt_budget(self, monkeypatch, value, expected):
+        monkeypatch.setenv(PROMPT_ENV, value)
+
+        assert budget.get_budget_ms("user-prompt-submit") == expected
+
+    def test_session_default_and_unbudgeted_hooks(self, monkeypatch):
+        monkeypatch.delenv(SESSION_ENV, raising=False)
+
+        assert budget.get_budget_ms("session-start") == 200.0
+        assert budget.get_budget_ms("session-install") is None
+        assert budget.start_budget("session-install") is None
+
+
+class TestBudget:
+    """Tests for the checks between phases and the hard stop."""
+
+    def test_allows_until_deadline(self):
+        spent = budget.Budget(0)
+        ample = budget.Budget(60)
+
+        assert not spent.allows("agent")
+        assert spent.skipped == ["agent"] and spent.degraded
+        assert ample.allows("agent") and not ample.degraded
+        assert ample.remaining() > 59 and ample.overrun() == 0
+
+    @needs_alarm
+    def test_hard_stop_interrupts_phase(self):
+        run = budget.Budget(0.02)
+        assert run.arm()
+        started = time.monotonic()
+        try:
+            with pytest.raises(budget.BudgetExceeded):
+                time.sleep(2)
+        finally:
+            run.disarm()
+
+        assert time.monotonic() - started < 1
+        assert run.stopped and run.degraded
+
+    @needs_alarm
+    def test_disarm_cancels_hard_stop(self):
+        run = budget.Budget(0.02)
+        assert run.arm()
+        run.disarm()
+        run.disarm()
+
+        time.sleep(0.05)
+        assert not run.stopped
+
+    def test_no_hard_stop_outside_main_thread_or_past_deadline(self):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(budget.Budget(60).arm()))
+        thread.start()
+        thread.join()
+
+        assert results == [False]
+        assert not budget.Budget(0).arm()
+
+
+@pytest.fixture
+def bundle():
+    return mode_detect.load_rules_bundle(str(HOOKS_DIR / mode_detect.BUNDLE_FILENAME))
+
+
+def _process(prompt, run_budget, **payload):
+    return mode_detect.process_input(io.StringIO(json.dumps({"prompt": prompt, **payload})), budget=run_budget)
+
+
+class TestPromptDegradation:
+    """process_input() with a spent or interrupted budget."""
+
+    def test_spent_budget_emits_basic_context(self, bundle):
+        run = budget.Budget(0)
+        with patch.object(mode_detect, "load_rules_bundle", return_value=bundle):
+            output = _process("EVAL: check the auth flow", run, session_id="s1")
+
+        assert output == mode_detect.CONTEXT_TEMPLATE.format(mode="EVAL")
+        assert run.skipped == ["session", "context", "agent", "skills", "checklist"]
+
+    def test_spent_budget_without_mode_emits_nothing(self):
+        assert _process("please fix the build", budget.Budget(0)) == ""
+
+    @needs_alarm
+    def test_hard_stop_keeps_context_built_so_far(self, bundle):
+        run = budget.Budget(0.5)
+
+        def hang(*args):
+            time.sleep(5)
+
+        with patch.object(mode_detect, "load_rules_bundle", return_value=bundle), \
+                patch.object(mode_detect, "suggest_skills", side_effect=hang):
+            output = _process("EVAL: check the auth flow", run)
+
+        assert output.startswith(mode_detect.build_context("EVAL", bundle))
+        assert "<codingbuddy-skills>" not in output and "<codingbuddy-checklist>" not in output
+        assert run.stopped
+
+    def test_hook_records_degraded_run(self, tmp_path):
+        ring = str(tmp_path / "latency.ring")
+        result = subprocess.run(
+            [sys.executable, str(HOOKS_DIR / "user-prompt-submit.py")],
+            input=json.dumps({"prompt": "PLAN: design the API"}),
+            capture_output=True, text=True,
+            env={**os.environ, latency.RING_ENV: ring, PROMPT_ENV: "0.001"},
+        )
+
+        assert result.returncode == 0
+        assert result.stdout == mode_detect.CONTEXT_TEMPLATE.format(mode="PLAN") + "\n"
+        assert "degraded" in [r[3] for r in latency.read_records(ring)]
+
+
+class TestSessionStartDegradation:
+    """session_start.main() out of budget hands the install to the worker."""
+
+    def test_spent_budget_spawns_worker(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(SESSION_ENV, "0.001")
+        monkeypatch.setenv("CLAUDE_PLUGIN_DIR", str(HOOKS_DIR.parent))
+        with patch.object(Path, "home", return_value=tmp_path), \
+                patch.object(session_start.install_stamp, "spawn_install_worker") as spawn, \
+                pytest.raises(SystemExit):
+            session_start.main()
+
+        spawn.assert_called_once_with(str(HOOKS_DIR.parent / "hooks" / session_start.LAUNCHER_FILENAME))
+        assert not (tmp_path / ".claude" / "hooks" / session_start.HOOK_FILENAME).exists()
+        # No lease is left held for the worker to find
+        fd, contended = session_start.acquire_install_lease(tmp_path / ".claude" / "hooks", 0)
+        session_start.release_install_lease(fd)
+        assert not contended
+
+    @needs_alarm
+    def test_install_is_not_interrupted(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(SESSION_ENV, "100")
+        monkeypatch.setenv("CLAUDE_PLUGIN_DIR", str(HOOKS_DIR.parent))
+        install = session_start.install_hook_file
+
+        def slow_install(*args):
+            time.sleep(0.05)
+            install(*args)
+
+        with patch.object(Path, "home", return_value=tmp_path), \
+                patch.object(session_start, "install_hook_file", side_effect=slow_install) as installs, \
+                patch.object(session_start.install_stamp, "spawn_install_worker") as spawn, \
+                pytest.raises(SystemExit):
+            session_start.main()
+
+        # Every file is installed past the deadline; settings.json is left to the worker
+        hooks_dir = tmp_path / ".claude" / "hooks"
+        assert installs.call_count > 2
+        for args in installs.call_args_list:
+            assert args[0][1].read_bytes() == args[0][0].read_bytes()
+        spawn.assert_called_once()
+        assert not (tmp_path / ".claude" / "settings.json").exists()
+        assert not (hooks_dir / session_start.STAMP_FILENAME).exists()
+
+    def test_worker_has_no_budget(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(SESSION_ENV, "0.001")
+        monkeypatch.setenv("CLAUDE_PLUGIN_DIR", str(HOOKS_DIR.parent))
+        with patch.object(Path, "home", return_value=tmp_path), \
+                patch.object(session_start.install_stamp, "spawn_install_worker") as spawn:
+            session_start.install_worker_main()
+
+        spawn.assert_not_called()
+        assert (tmp_path / ".claude" / "hooks" / session_start.HOOK_FILENAME).exists()
+
+
+class TestDefaultBudgets:
+    """Both hooks end to end with the shipped budgets."""
+
+    def test_install_then_prompt(self, tmp_path, monkeypatch):
+        for name in budget.BUDGET_ENVS.values():
+            monkeypatch.delenv(name, raising=False)
+        ring = str(tmp_path / "latency.ring")
+        home = tmp_path / "home"
+        hooks_dir = home / ".claude" / "hooks"
+        env = {
+            **os.environ, latency.RING_ENV: ring, "HOME": str(home),
+            "CLAUDE_PLUGIN_DIR": str(HOOKS_DIR.parent), "LANG": "en_US.UTF-8",
+        }
+
+        started = subprocess.run(
+            [sys.executable, "-I", "-S", str(HOOKS_DIR / "session-start.py")],
+            capture_output=True, text=True, env=env,
+        )
+        assert started.returncode == 0 and started.stderr == ""
+        # Out of budget, the install is finished by the background worker
+        for _ in range(200):
+            if (hooks_dir / session_start.STAMP_FILENAME).exists():
+                break
+            time.sleep(0.05)
+
+        bundle = mode_detect.load_rules_bundle(str(hooks_dir / mode_detect.BUNDLE_FILENAME))
+        result = subprocess.run(
+            [sys.executable, "-I", "-S", str(hooks_dir / session_start.HOOK_FILENAME)],
+            input=json.dumps({"prompt": "EVAL: check the auth flow", "session_id": "s1"}),
+            capture_output=True, text=True, env=env,
+        )
+
+        assert result.returncode == 0 and result.stderr == ""
+        phases = [r[3] for r in latency.read_records(ring) if r[2] == "user-prompt-submit"]
+        full = mode_detect.build_context("EVAL", bundle)
+        if "degraded" in phases:
+            # A slow machine gets what fit: the inlined context or the basic one
+            assert result.stdout.startswith((full, mode_detect.CONTEXT_TEMPLATE.format(mode="EVAL")))
+        else:
+            assert result.stdout.startswith(full)
+            assert "<codingbuddy-checklist>" in result.stdout
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/checklist_index.py
+
+Run with: python3 -m pytest test_checklist_index.py -v
+"""
+
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from codingbuddy_hooks import checklist_index, mode_detect
+
+CHECKLISTS_DIR = Path(__file__).parent.parent.parent / "rules" / ".ai-rules" / "checklists"
+
+
+def _category(name, items, **triggers):
+    return {"name": name, "triggers": triggers, "items": [
+        {"id": item_id, "text": text, "priority": priority, "reason": ""} for item_id, text, priority in items
+    ]}
+
+
+DOMAINS = [
+    {"id": "security", "name": "Security", "categories": [
+        _category("authentication", [
+            ("sec-auth-001", "Hash passwords using bcrypt", "critical"),
+            ("sec-auth-002", "Rate limit login attempts", "high"),
+        ], files=["**/auth/**", "**/login*"], imports=["bcrypt", "next-auth", "@auth/core"]),
+    ]},
+    {"id": "performance", "name": "Performance", "categories": [
+        _category("data_fetching", [
+            ("perf-data-001", "Implement proper caching strategy", "high"),
+            ("perf-data-002", "Paginate large lists", "medium"),
+        ], patterns=["useQuery", "fetch("]),
+    ]},
+]
+
+
+@pytest.fixture
+def index():
+    return checklist_index.ChecklistIndex(json.loads(json.dumps(checklist_index.build_checklist_index(DOMAINS))))
+
+
+class TestBuildChecklistIndex:
+    """Tests for build_checklist_index."""
+
+    def test_trigger_terms(self):
+        triggers = checklist_index.build_checklist_index(DOMAINS)["triggers"]
+
+        assert triggers["auth"] == [0, 1]
+        assert triggers["bcrypt"] == [0, 1]
+        assert triggers["usequery"] == [2, 3]
+        # From PROMPT_TRIGGERS
+        assert triggers["n+1"] == [2, 3]
+        # Multi-word package names would trigger on their parts
+        assert "next" not in triggers
+
+    def test_text_words_are_weaker_evidence(self):
+        data = checklist_index.build_checklist_index(DOMAINS)
+
+        assert data["words"]["paginate"] == [3]
+        assert "bcrypt" not in data["words"]
+
+    def test_rejects_other_formats(self):
+        with pytest.raises(ValueError):
+            checklist_index.ChecklistIndex({"format": 99})
+        with pytest.raises(ValueError):
+            checklist_index.ChecklistIndex({"format": checklist_index.INDEX_FORMAT, "items": []})
+
+
+class TestSelect:
+    """Tests for ChecklistIndex.select."""
+
+    def test_selects_items_of_matched_categories(self, index):
+        matched, items = index.select("review the auth flow for N+1 problems")
+
+        assert matched == ["auth", "n+1"]
+        assert [item[2] for item in items] == ["sec-auth-001", "sec-auth-002", "perf-data-001", "perf-data-002"]
+        assert items[0][:2] == ["security", "authentication"]
+
+    def test_one_text_word_is_not_enough(self, index):
+        assert index.select("paginate") is None
+        assert index.select("paginate the large lists")[1][0][2] == "perf-data-002"
+        assert index.select("how did it go?") is None
+
+    def test_limit_keeps_best_scored_then_priority(self, index):
+        _, items = index.select("auth with bcrypt, and caching", limit=1)
+
+        assert [item[2] for item in items] == ["sec-auth-001"]
+
+    def test_render(self, index):
+        block = checklist_index.render_selection(*index.select("auth"))
+
+        assert block.startswith("<codingbuddy-checklist>\nCHECKLIST_DOMAINS: security\nMATCHED_TERMS: auth\n")
+        assert "- [critical] sec-auth-001: Hash passwords using bcrypt\n" in block
+
+
+@pytest.mark.skipif(not CHECKLISTS_DIR.is_dir(), reason="checklists not available")
+class TestShippedChecklists:
+    """The index in the committed rules bundle."""
+
+    @pytest.fixture
+    def shipped(self):
+        bundle = mode_detect.load_rules_bundle(str(Path(__file__).parent / mode_detect.BUNDLE_FILENAME))
+        return bundle.checklist_index()
+
+    def test_indexes_listed_domains(self, shipped):
+        listed = json.loads((CHECKLISTS_DIR / "index.json").read_text(encoding="utf-8"))["domains"]
+
+        assert [domain[0] for domain in shipped.domains] == [entry["id"] for entry in listed]
+
+    @pytest.mark.parametrize("prompt,expected", [
+        ("EVAL: check the auth flow for N+1 queries", {"sec-auth-001", "perf-data-001"}),
+        ("EVAL: review the signup form labels for a11y", {"a11y-form-001"}),
+        ("EVAL: are the API tests mocking enough?", {"test-api-001"}),
+    ])
+    def test_selections(self, shipped, prompt, expected):
+        _, items = shipped.select(prompt)
+
+        assert expected <= {item[2] for item in items}
+
+    def test_selection_is_sub_millisecond(self, shipped):
+        prompt = "EVAL: check the auth flow for N+1 queries and missing form labels " * 8
+        shipped.select(prompt)
+        started = time.perf_counter()
+        for _ in range(100):
+            shipped.select(prompt)
+        assert (time.perf_counter() - started) / 100 < 0.001
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Unit tests for compile-rules-bundle.py
+
+Run with: python3 -m pytest test_compile_rules_bundle.py -v
+"""
+
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Import the module under test
+import importlib.util
+spec = importlib.util.spec_from_file_location(
+    "compile_rules_bundle", Path(__file__).parent / "compile-rules-bundle.py"
+)
+compiler = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(compiler)
+
+
+def _make_rules_dir(root: Path) -> Path:
+    """Create a minimal .ai-rules tree and return it."""
+    rules_dir = root / ".ai-rules"
+    (rules_dir / "rules").mkdir(parents=True)
+    (rules_dir / "rules" / "core.md").write_text("# Core\n", encoding="utf-8")
+    (rules_dir / "rules" / "extra.md").write_text("# 추가 규칙\n", encoding="utf-8")
+    (rules_dir / "keyword-modes.json").write_text(json.dumps({
+        "modes": {
+            "PLAN": {
+                "keywords": ["PLAN", "계획"],
+                "description": "Plan",
+                "instructions": "Design first",
+                "rules": ["rules/core.md"],
+                "agent": "plan-mode",
+                "defaultSpecialists": ["architecture-specialist"],
+            },
+            "EVAL": {
+                "keywords": ["EVAL"],
+                "instructions": "Review",
+                "rules": ["rules/core.md", "rules/extra.md"],
+                "agent": "eval-mode",
+            },
+        },
+        "defaultMode": "PLAN",
+    }), encoding="utf-8")
+    return rules_dir
+
+
+def _parse(data: bytes):
+    """Split bundle bytes into (header, body)."""
+    assert data.startswith(compiler.BUNDLE_MAGIC)
+    header_line, body = data[len(compiler.BUNDLE_MAGIC):].split(b"\n", 1)
+    return json.loads(header_line), body
+
+
+class TestCompileBundle:
+    """Tests for compile_bundle function."""
+
+    def test_header_describes_modes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            header, _ = _parse(compiler.compile_bundle(_make_rules_dir(Path(tmpdir)), "1.2.3"))
+
+            assert header["format"] == compiler.BUNDLE_FORMAT
+            assert header["version"] == "1.2.3"
+            assert header["defaultMode"] == "PLAN"
+            assert header["modes"]["PLAN"]["agent"] == "plan-mode"
+            assert header["modes"]["EVAL"]["rules"] == ["rules/core.md", "rules/extra.md"]
+
+    def test_shared_rules_are_stored_once(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            header, body = _parse(compiler.compile_bundle(_make_rules_dir(Path(tmpdir)), "1.0.0"))
+
+            assert sorted(header["rules"]) == ["rules/core.md", "rules/extra.md"]
+            offset, length = header["rules"]["rules/extra.md"]
+            assert body[offset:offset + length].decode("utf-8") == "# 추가 규칙\n"
+            contexts = [span for variants in header["contexts"].values() for span in variants.values()]
+            assert len(body) == sum(length for _, length in [*header["rules"].values(), *contexts])
+
+    def test_contexts_are_precomputed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            header, body = _parse(compiler.compile_bundle(_make_rules_dir(Path(tmpdir)), "1.0.0"))
+
+            offset, length = header["contexts"]["EVAL"]["full"]
+            full = body[offset:offset + length].decode("utf-8")
+            offset, length = header["contexts"]["EVAL"]["compact"]
+            compact = body[offset:offset + length].decode("utf-8")
+
+            assert "INSTRUCTIONS: Review" in full
+            assert '<rule path="rules/extra.md">\n# 추가 규칙\n</rule>' in full
+            assert compact == compiler.mode_detect.render_compact_context("EVAL")
+            assert len(compact) < len(full)
+
+    def test_agent_index_is_bundled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            assert "agent_index" not in _parse(compiler.compile_bundle(rules_dir, "1.0.0"))[0]
+            (rules_dir / "agents").mkdir()
+            for name, role_type in (("backend-developer", "primary"), ("code-reviewer", "utility")):
+                (rules_dir / "agents" / f"{name}.json").write_text(json.dumps({
+                    "name": name, "role": {"type": role_type, "expertise": ["GraphQL APIs"]},
+                }), encoding="utf-8")
+
+            header, body = _parse(compiler.compile_bundle(rules_dir, "1.0.0"))
+
+            offset, length = header["agent_index"]
+            index = json.loads(body[offset:offset + length])
+            assert index["agents"] == ["backend-developer"]
+
+    def test_skill_index_is_bundled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            for name, frontmatter in (
+                ("refactoring", 'name: refactoring\ndescription: "Use when improving code structure"'),
+                ("no-description", "name: no-description"),
+            ):
+                (rules_dir / "skills" / name).mkdir(parents=True)
+                (rules_dir / "skills" / name / "SKILL.md").write_text(
+                    f"---\n{frontmatter}\n---\n\n# Body\n", encoding="utf-8"
+                )
+
+            header, body = _parse(compiler.compile_bundle(rules_dir, "1.0.0"))
+
+            offset, length = header["skill_index"]
+            index = compiler.skill_index.SkillIndex(body[offset:offset + length])
+            assert index.skills == ["refactoring"]
+
+    def test_checklist_index_is_bundled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            (rules_dir / "checklists").mkdir()
+            (rules_dir / "checklists" / "index.json").write_text(json.dumps({"domains": [
+                {"id": "security", "name": "Security", "file": "security.json"},
+            ]}), encoding="utf-8")
+            (rules_dir / "checklists" / "security.json").write_text(json.dumps({"categories": [{
+                "name": "authentication",
+                "triggers": {"files": ["**/auth/**"]},
+                "items": [{"id": "sec-auth-001", "text": "Hash passwords", "priority": "critical"}],
+            }]}), encoding="utf-8")
+            # Not listed in index.json, so not bundled
+            (rules_dir / "checklists" / "conventions.json").write_text("{}", encoding="utf-8")
+
+            header, body = _parse(compiler.compile_bundle(rules_dir, "1.0.0"))
+
+            offset, length = header["checklist_index"]
+            index = compiler.checklist_index.ChecklistIndex(json.loads(body[offset:offset + length]))
+            assert index.select("review the auth module")[1] == [
+                ["security", "authentication", "sec-auth-001", "critical", "Hash passwords"],
+            ]
+
+    @pytest.mark.parametrize("text,expected", [
+        ("---\nname: x\ndescription: Use when testing\n---\n", ("x", "Use when testing")),
+        ("---\ndescription: 'Quoted: yes'\nlicense: MIT\n---\n", ("dir", "Quoted: yes")),
+        ("# No frontmatter\ndescription: no\n", None),
+        ("---\nname: x\n---\ndescription: after\n", None),
+    ])
+    def test_read_skill_description(self, text, expected):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            skill_file = Path(tmpdir) / "dir" / "SKILL.md"
+            skill_file.parent.mkdir()
+            skill_file.write_text(text, encoding="utf-8")
+
+            assert compiler.read_skill_description(skill_file) == expected
+
+    def test_output_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            assert compiler.compile_bundle(rules_dir, "1.0.0") == compiler.compile_bundle(rules_dir, "1.0.0")
+
+    def test_source_hash_tracks_rule_content(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            before, _ = _parse(compiler.compile_bundle(rules_dir, "1.0.0"))
+            (rules_dir / "rules" / "core.md").write_text("# Core v2\n", encoding="utf-8")
+            after, _ = _parse(compiler.compile_bundle(rules_dir, "1.0.0"))
+
+            assert before["source_sha256"] != after["source_sha256"]
+
+    def test_header_holds_normalized_keyword_table(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            header, _ = _parse(compiler.compile_bundle(_make_rules_dir(Path(tmpdir)), "1.0.0"))
+            assert header["keywords"] == {"plan": "PLAN", "계획": "PLAN", "eval": "EVAL"}
+
+    def test_custom_modes_and_locales_need_no_code_change(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            config = json.loads((rules_dir / "keyword-modes.json").read_text(encoding="utf-8"))
+            config["modes"]["PLAN"]["keywords"].append("PLANEJAR")
+            config["modes"]["REVIEW"] = {"keywords": ["REVIEW", "검토"], "instructions": "Check"}
+            (rules_dir / "keyword-modes.json").write_text(json.dumps(config), encoding="utf-8")
+
+            header, _ = _parse(compiler.compile_bundle(rules_dir, "1.0.0"))
+
+            assert header["keywords"]["planejar"] == "PLAN"
+            assert header["keywords"]["검토"] == "REVIEW"
+            assert compiler.mode_detect.detect_mode("review: this diff", header["keywords"]) == "REVIEW"
+
+    @pytest.mark.parametrize("keywords", ["PLAN", ["EVAL"], ["TWO WORDS"], [""]])
+    def test_invalid_keywords_raise(self, keywords):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            config = json.loads((rules_dir / "keyword-modes.json").read_text(encoding="utf-8"))
+            config["modes"]["PLAN"]["keywords"] = keywords
+            (rules_dir / "keyword-modes.json").write_text(json.dumps(config), encoding="utf-8")
+
+            with pytest.raises(ValueError):
+                compiler.compile_bundle(rules_dir, "1.0.0")
+
+    def test_missing_rule_file_raises(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            (rules_dir / "rules" / "extra.md").unlink()
+
+            with pytest.raises(FileNotFoundError):
+                compiler.compile_bundle(rules_dir, "1.0.0")
+
+
+class TestMain:
+    """Tests for the command-line entry point."""
+
+    def test_writes_and_checks_bundle(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+            output = Path(tmpdir) / compiler.BUNDLE_FILENAME
+            args = ["--rules-dir", str(rules_dir), "--output", str(output), "--version", "1.0.0"]
+
+            assert compiler.main(args + ["--check"]) == 1
+            assert compiler.main(args) == 0
+            assert compiler.main(args + ["--check"]) == 0
+
+            (rules_dir / "rules" / "core.md").write_text("# Changed\n", encoding="utf-8")
+            assert compiler.main(args + ["--check"]) == 1
+
+    def test_reports_context_sizes(self, capsys):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            rules_dir = _make_rules_dir(Path(tmpdir))
+
+            assert compiler.main(["--rules-dir", str(rules_dir), "--version", "1.0.0", "--sizes"]) == 0
+
+            lines = capsys.readouterr().out.splitlines()
+            assert lines[0].split() == ["mode", "variant", "bytes", "~tokens"]
+            assert [line.split()[:2] for line in lines[1:]] == [
+                ["EVAL", "full"], ["EVAL", "compact"], ["PLAN", "full"], ["PLAN", "compact"],
+            ]
+
+    def test_builtin_keywords_match_keyword_modes(self):
+        """The hook's fallback keywords must match packages/rules."""
+        if not compiler.DEFAULT_RULES_DIR.is_dir():
+            pytest.skip("rules package not available")
+        header, _ = _parse(compiler.compile_bundle(compiler.DEFAULT_RULES_DIR, "0"))
+        assert header["keywords"] == compiler.mode_detect.DEFAULT_KEYWORD_TABLE
+
+    # Full context of each mode for the shipped rules, in bytes. Only AUTO
+    # gets all of core.md (see mode_detect.filter_rule).
+    CONTEXT_BUDGETS = {"PLAN": 40 << 10, "ACT": 40 << 10, "EVAL": 40 << 10, "AUTO": 96 << 10}
+
+    def test_full_contexts_fit_budget(self):
+        if not compiler.DEFAULT_RULES_DIR.is_dir():
+            pytest.skip("rules package not available")
+        sizes = compiler.context_sizes(compiler.compile_bundle(compiler.DEFAULT_RULES_DIR, "0"))
+
+        full = {mode: size for mode, variant, size in sizes if variant == "full"}
+
+        assert full.keys() == self.CONTEXT_BUDGETS.keys()
+        assert all(full[mode] <= budget for mode, budget in self.CONTEXT_BUDGETS.items()), full
+
+    def test_committed_bundle_is_current(self):
+        """The bundle shipped with the plugin must match packages/rules."""
+        if not compiler.DEFAULT_RULES_DIR.is_dir():
+            pytest.skip("rules package not available")
+        assert compiler.main(["--check"]) == 0
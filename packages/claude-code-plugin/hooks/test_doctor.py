@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/doctor.py
+
+Run with: python3 -m pytest test_doctor.py -v
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from unittest.mock import patch
+
+from codingbuddy_hooks import doctor, install_stamp, session_start
+
+HOOKS_DIR = Path(__file__).parent
+
+
+def _snapshot(root: Path) -> dict:
+    """Map every path under root to its content (None for directories)."""
+    return {
+        str(path.relative_to(root)): None if path.is_dir() else path.read_bytes()
+        for path in sorted(root.rglob("*"))
+    }
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """A home with a cached plugin version and a settings.json."""
+    monkeypatch.delenv("CLAUDE_PLUGIN_DIR", raising=False)
+    monkeypatch.delenv(install_stamp.HOOK_MODE_ENV, raising=False)
+    hooks_dir = tmp_path / session_start.PLUGIN_CACHE_PATHS[0] / "1.0.0" / "hooks"
+    hooks_dir.mkdir(parents=True)
+    (hooks_dir / session_start.SOURCE_FILENAME).write_text('HOOK_VERSION = "1.0.0"\n')
+    (tmp_path / ".claude" / "settings.json").write_text('{"permissions": {}}')
+    return tmp_path
+
+
+class TestFsCallCounter:
+    """Tests for filesystem call counting."""
+
+    def test_counts_each_kind(self, tmp_path):
+        (tmp_path / "a").write_text("x")
+
+        with doctor.FsCallCounter() as counter:
+            (tmp_path / "a").exists()
+            with open(tmp_path / "a") as f:
+                f.read()
+            list(tmp_path.iterdir())
+            (tmp_path / "a").resolve()
+
+        assert counter.counts == {"stat": 1, "open": 1, "iterdir": 1, "resolve": 1}
+
+    def test_restores_patched_functions(self):
+        originals = (os.stat, open, os.scandir, Path.resolve)
+
+        with doctor.FsCallCounter():
+            assert os.stat is not originals[0]
+
+        assert (os.stat, open, os.scandir, Path.resolve) == originals
+
+    def test_step_records_errors(self):
+        def fail() -> str:
+            raise OSError("boom")
+
+        step = doctor.run_step("broken", fail)
+
+        assert step["error"] == "OSError: boom"
+
+
+class TestDiagnose:
+    """Tests for the read-only session start diagnosis."""
+
+    def test_reports_every_step(self, home):
+        report = doctor.diagnose(home)
+
+        names = [step["step"] for step in report["steps"]]
+        assert names[:3] == ["stamp", "env CLAUDE_PLUGIN_DIR", "version index"]
+        assert names[3:6] == [f"cache ~/{path}" for path in session_start.PLUGIN_CACHE_PATHS]
+        assert names[6:-2] == [f"dev ~/{pattern}" for pattern in session_start.DEV_SOURCE_PATTERNS]
+        assert names[-2:] == ["settings read", "registration"]
+
+        steps = {step["step"]: step for step in report["steps"]}
+        cache_step = steps[f"cache ~/{session_start.PLUGIN_CACHE_PATHS[0]}"]
+        assert cache_step["result"].endswith(session_start.SOURCE_FILENAME)
+        assert cache_step["iterdir"] == 1
+        assert steps["registration"]["result"] == "not registered, not installed"
+        assert report["settings_bytes"] == len('{"permissions": {}}')
+
+    def test_has_no_side_effects(self, home):
+        before = _snapshot(home)
+
+        doctor.diagnose(home)
+
+        assert _snapshot(home) == before
+
+    def test_corrupted_settings_are_not_backed_up(self, home):
+        (home / ".claude" / "settings.json").write_text("{broken")
+
+        report = doctor.diagnose(home)
+
+        steps = {step["step"]: step for step in report["steps"]}
+        assert steps["settings read"]["result"].endswith("invalid JSON")
+        assert not (home / ".claude" / "settings.json.bak").exists()
+
+    def test_flags_large_settings(self, home):
+        with patch.object(doctor, "LARGE_SETTINGS_BYTES", 10):
+            report = doctor.diagnose(home)
+
+        assert any("settings.json is" in warning for warning in report["warnings"])
+
+
+class TestWarnings:
+    """Tests for slow filesystem detection."""
+
+    def test_network_filesystem(self):
+        assert "network filesystem (nfs4)" in doctor.find_warnings([], "nfs4", None)[0]
+        assert doctor.find_warnings([], "ext4", None) == []
+
+    def test_slow_calls_and_steps(self):
+        step = {"step": "cache", "ms": 900.0, "fs_ms": 880.0, "stat": 40, "open": 0, "iterdir": 1, "resolve": 3}
+
+        warnings = doctor.find_warnings([step], "ext4", None)
+
+        assert any("filesystem calls average" in warning for warning in warnings)
+        assert "step 'cache' took 900.0 ms" in warnings
+
+    def test_filesystem_type_uses_longest_mount(self, tmp_path):
+        mountinfo = tmp_path / "mountinfo"
+        mountinfo.write_text(
+            "22 1 8:1 / / rw,relatime - ext4 /dev/sda1 rw\n"
+            "40 22 0:50 / /home/remote\\040dir rw - nfs4 server:/home rw\n"
+        )
+
+        assert doctor.filesystem_type(Path("/home/remote dir/u/.claude"), str(mountinfo)) == "nfs4"
+        assert doctor.filesystem_type(Path("/home/local"), str(mountinfo)) == "ext4"
+        assert doctor.filesystem_type(Path("/"), str(tmp_path / "missing")) is None
+
+
+class TestCli:
+    """Tests for session-start.py --doctor."""
+
+    def test_json_report(self, home):
+        env = {**os.environ, "HOME": str(home)}
+        env.pop("CLAUDE_PLUGIN_DIR", None)
+
+        result = subprocess.run(
+            [sys.executable, str(HOOKS_DIR / "session-start.py"), "--doctor", "--json"],
+            capture_output=True, text=True, env=env,
+        )
+
+        assert result.returncode == 0, result.stderr
+        report = json.loads(result.stdout)
+        assert report["home"] == str(home)
+        assert not (home / ".claude" / "hooks").exists()
+
+    def test_text_report(self, home, capsys):
+        with patch.object(Path, "home", return_value=home):
+            assert doctor.main(["--doctor"]) == 0
+
+        out = capsys.readouterr().out
+        assert "settings read" in out
+        assert "iterdir" in out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
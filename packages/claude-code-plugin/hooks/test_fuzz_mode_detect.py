@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Unit tests for fuzz_mode_detect.py
+
+Run with: python3 -m pytest test_fuzz_mode_detect.py -v
+"""
+
+import random
+import re
+import time
+
+import pytest
+from unittest.mock import patch
+
+import fuzz_mode_detect
+from codingbuddy_hooks import mode_detect
+
+TABLE = mode_detect.get_keyword_table()
+
+
+class TestReference:
+    """Tests for the regex-free reference implementation."""
+
+    @pytest.mark.parametrize("prompt,expected", [
+        ("PLAN: design", "PLAN"),
+        ("  plan   :", "PLAN"),
+        ("PLAN design", "PLAN"),
+        ("PLAN ", None),
+        ("PLAN", None),
+        ("PLANNING: x", None),
+        ("ＰＬＡＮ：ログイン", "PLAN"),
+        ("AUTOMA\u0301TICO: x", "AUTO"),
+        ("PLANİFİCAR: x", None),
+        ("planificar\u0307: x", None),
+        (": PLAN x", None),
+        # Whitespace runs longer than the detect window
+        (" " * 300 + "PLAN: x", "PLAN"),
+        ("PLAN" + " " * 300 + "x", "PLAN"),
+        ("PLAN" + " " * 300, None),
+    ])
+    def test_cases(self, prompt, expected):
+        assert fuzz_mode_detect.reference_detect_mode(prompt, TABLE) == expected
+        assert mode_detect.detect_mode(prompt, TABLE) == expected
+
+
+class TestFuzz:
+    """Tests for the fuzz run itself."""
+
+    def test_default_table(self):
+        stats, failures = fuzz_mode_detect.fuzz(iterations=2000, seed=1)
+
+        assert failures == []
+        assert stats["prompts"] == 2000 + len(list(fuzz_mode_detect.pathological_inputs()))
+        # The generator mostly starts prompts with keywords, so both outcomes are covered
+        assert 0 < stats["detected"] < stats["prompts"]
+
+    def test_grown_keyword_table(self):
+        table = fuzz_mode_detect.synthetic_keyword_table(random.Random(2), 200)
+
+        stats, failures = fuzz_mode_detect.fuzz(iterations=1000, seed=2, keyword_table=table)
+
+        assert len(table) == len(TABLE) + 200 * len(set(TABLE.values()))
+        assert failures == []
+
+    def test_pathological_inputs_stay_under_ceiling(self):
+        for prompt in fuzz_mode_detect.pathological_inputs():
+            assert fuzz_mode_detect.check_prompt(prompt, TABLE, fuzz_mode_detect.DEFAULT_CEILING_MS) is None
+
+    def test_catches_divergent_matcher(self):
+        # Accepts a keyword followed by trailing whitespace only
+        loose = re.compile(r"\s*([^\s:]+)(?:\s*:|\s+)")
+        with patch.object(mode_detect, "_KEYWORD_TOKEN", loose):
+            _, failures = fuzz_mode_detect.fuzz(iterations=500, seed=3)
+
+        assert failures
+        assert all("reference" in failure for _, failure in failures)
+
+    def test_catches_window_before_strip_matcher(self):
+        # Slicing the window before skipping leading whitespace
+        failures = [
+            prompt for prompt in fuzz_mode_detect.pathological_inputs()
+            if mode_detect.detect_mode(prompt[:mode_detect.DETECT_WINDOW], TABLE)
+            != fuzz_mode_detect.reference_detect_mode(prompt, TABLE)
+        ]
+
+        assert failures
+
+    def test_catches_slow_calls(self):
+        detect_mode = mode_detect.detect_mode
+
+        def slow_detect_mode(prompt, keyword_table=None):
+            time.sleep(0.002)
+            return detect_mode(prompt, keyword_table)
+
+        with patch.object(mode_detect, "detect_mode", slow_detect_mode):
+            failure = fuzz_mode_detect.check_prompt("PLAN: x", TABLE, ceiling_ms=1.0)
+
+        assert failure.startswith("took ")
+
+    def test_cli(self, capsys):
+        assert fuzz_mode_detect.main(["--iterations", "200", "--keywords", "10"]) == 0
+
+        assert "0 failures" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/latency.py
+
+Run with: python3 -m pytest test_latency.py -v
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from unittest.mock import patch
+
+from codingbuddy_hooks import budget, latency
+
+# The phase lists below are those of runs that fit their budget
+NO_BUDGETS = {env: "0" for env in budget.BUDGET_ENVS.values()}
+
+
+@pytest.fixture
+def ring(tmp_path):
+    return str(tmp_path / "cache" / "latency.ring")
+
+
+class TestRecord:
+    """Tests for recording into the ring buffer."""
+
+    def test_round_trip(self, ring):
+        latency.record("session-start", [("discovery", 0.0015), ("total", 0.004)], ring)
+
+        records = latency.read_records(ring)
+
+        assert [(r[2], r[3], r[4]) for r in records] == [
+            ("session-start", "discovery", 1500),
+            ("session-start", "total", 4000),
+        ]
+
+    def test_ring_size_is_fixed(self, ring):
+        for _ in range(3):
+            latency.record("user-prompt-submit", [("detect", 0.001)] * latency.RING_SLOTS, ring)
+
+        assert os.path.getsize(ring) == latency._ring_size(latency.RING_SLOTS)
+        records = latency.read_records(ring)
+        assert len(records) == latency.RING_SLOTS
+        assert records[-1][0] == 3 * latency.RING_SLOTS
+
+    def test_ignores_unknown_hooks_and_phases(self, ring):
+        latency.record("other-hook", [("detect", 0.001)], ring)
+        latency.record("user-prompt-submit", [("unknown", 0.001)], ring)
+        assert latency.read_records(ring) == []
+
+    def test_disabled_by_env(self, ring):
+        with patch.dict(os.environ, {latency.ENABLE_ENV: "0"}):
+            latency.record("user-prompt-submit", [("detect", 0.001)], ring)
+        assert not os.path.exists(ring)
+
+    def test_resets_foreign_file(self, ring):
+        os.makedirs(os.path.dirname(ring))
+        Path(ring).write_bytes(b"not a ring")
+
+        latency.record("user-prompt-submit", [("parse", 0.002)], ring)
+
+        assert [r[3] for r in latency.read_records(ring)] == ["parse"]
+
+    def test_never_raises(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        latency.record("user-prompt-submit", [("parse", 0.002)], str(blocker / "latency.ring"))
+
+    def test_timer_records_laps_and_total(self, ring):
+        timer = latency.PhaseTimer("user-prompt-submit")
+        timer.lap("parse")
+        timer.lap("detect")
+        timer.flush(ring)
+
+        phases = [r[3] for r in latency.read_records(ring)]
+        assert phases == ["startup", "parse", "detect", "total"]
+
+
+class TestReport:
+    """Tests for percentile reporting."""
+
+    def test_quantile_nearest_rank(self):
+        values = list(range(1, 101))
+        assert latency.quantile(values, 0.5) == 50
+        assert latency.quantile(values, 0.95) == 95
+        assert latency.quantile(values, 0.99) == 99
+        assert latency.quantile([7], 0.99) == 7
+
+    def test_openmetrics_summary(self, ring):
+        latency.record("user-prompt-submit", [("detect", 0.001), ("detect", 0.003)], ring)
+
+        text = latency.format_openmetrics(latency.summarize(latency.read_records(ring)))
+
+        assert f"# TYPE {latency.METRIC_NAME} summary" in text
+        labels = 'hook="user-prompt-submit",phase="detect"'
+        assert f'{latency.METRIC_NAME}{{{labels},quantile="0.5"}} 0.001' in text
+        assert f"{latency.METRIC_NAME}_count{{{labels}}} 2" in text
+        assert text.endswith("# EOF\n")
+
+    def test_cli_writes_output_file(self, ring, tmp_path, capsys):
+        latency.record("session-start", [("stamp", 0.0002)], ring)
+        output = tmp_path / "codingbuddy.prom"
+
+        assert latency.main(["--ring", ring, "--openmetrics", "--output", str(output)]) == 0
+
+        assert 'phase="stamp"' in output.read_text()
+        assert capsys.readouterr().out == ""
+
+    def test_cli_table(self, ring, capsys):
+        latency.record("user-prompt-submit", [("parse", 0.0005)], ring)
+
+        latency.main(["--ring", ring])
+
+        out = capsys.readouterr().out
+        assert "p95 ms" in out
+        assert "parse" in out
+
+
+class TestHookInstrumentation:
+    """The hooks record their phases when run."""
+
+    def test_user_prompt_submit_records_phases(self, ring):
+        hook_path = Path(__file__).parent / "user-prompt-submit.py"
+        subprocess.run(
+            [sys.executable, str(hook_path)],
+            input=json.dumps({"prompt": "PLAN: x"}),
+            capture_output=True, text=True,
+            env={**os.environ, **NO_BUDGETS, latency.RING_ENV: ring},
+        )
+
+        phases = [r[3] for r in latency.read_records(ring) if r[2] == "user-prompt-submit"]
+        assert phases == ["startup", "parse", "detect", "context", "agent", "skills", "checklist", "total"]
+
+    def test_user_prompt_submit_records_session_phase(self, ring):
+        hook_path = Path(__file__).parent / "user-prompt-submit.py"
+        subprocess.run(
+            [sys.executable, str(hook_path)],
+            input=json.dumps({"prompt": "PLAN: x", "session_id": "s1"}),
+            capture_output=True, text=True,
+            env={**os.environ, **NO_BUDGETS, latency.RING_ENV: ring},
+        )
+
+        phases = [r[3] for r in latency.read_records(ring) if r[2] == "user-prompt-submit"]
+        assert phases == ["startup", "parse", "detect", "session", "context", "agent", "skills", "checklist", "total"]
+
+    def test_session_start_records_phases(self, ring, tmp_path):
+        hook_path = Path(__file__).parent / "session-start.py"
+        subprocess.run(
+            [sys.executable, str(hook_path)],
+            capture_output=True, text=True,
+            env={
+                **os.environ,
+                **NO_BUDGETS,
+                latency.RING_ENV: ring,
+                "HOME": str(tmp_path),
+                "CLAUDE_PLUGIN_DIR": str(Path(__file__).parent.parent),
+            },
+        )
+
+        phases = [r[3] for r in latency.read_records(ring) if r[2] == "session-start"]
+        assert phases == [
+            "startup", "stamp", "lease", "discovery", "install", "settings_read", "settings_write", "total",
+        ]
+
+    def test_session_start_fast_path_records_stamp(self, ring, tmp_path):
+        hook_path = Path(__file__).parent / "session-start.py"
+        env = {
+            **os.environ,
+            **NO_BUDGETS,
+            latency.RING_ENV: ring,
+            "HOME": str(tmp_path),
+            "CLAUDE_PLUGIN_DIR": str(Path(__file__).parent.parent),
+        }
+        for _ in range(2):
+            subprocess.run([sys.executable, str(hook_path)], capture_output=True, text=True, env=env)
+
+        phases = [r[3] for r in latency.read_records(ring) if r[2] == "session-start"]
+        assert phases[-3:] == ["startup", "stamp", "total"]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/profiling.py
+
+Run with: python3 -m pytest test_profiling.py -v
+"""
+
+import json
+import os
+import pstats
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from codingbuddy_hooks import budget
+from codingbuddy_hooks import profiling as profile
+
+HOOKS_DIR = Path(__file__).parent
+
+
+def _run_hook(script: str, profile_mode: str, profile_dir: Path, **env: str):
+    """Run a hook script with profiling enabled and a PLAN prompt on stdin."""
+    return subprocess.run(
+        [sys.executable, str(HOOKS_DIR / script)],
+        input=json.dumps({"prompt": "PLAN: profile me"}),
+        capture_output=True, text=True,
+        env={
+            **os.environ,
+            # Profiled runs are slower; a spent budget would change their output
+            **{name: "0" for name in budget.BUDGET_ENVS.values()},
+            profile.PROFILE_ENV: profile_mode,
+            profile.PROFILE_DIR_ENV: str(profile_dir),
+            **env,
+        },
+    )
+
+
+class TestRun:
+    """Tests for run function."""
+
+    def test_cpu_profile_is_written_and_exit_propagates(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(profile.PROFILE_DIR_ENV, str(tmp_path))
+
+        def main():
+            sum(range(1000))
+            sys.exit(0)
+
+        with pytest.raises(SystemExit):
+            profile.run(main, "session-start", "cpu")
+
+        (prof,) = tmp_path.glob("session-start-*.prof")
+        assert pstats.Stats(str(prof)).total_calls > 0
+        assert "cumulative" in prof.with_suffix(".txt").read_text()
+
+    def test_mem_profile_lists_allocations(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(profile.PROFILE_DIR_ENV, str(tmp_path))
+        blocks = []
+
+        profile.run(lambda: blocks.append(bytearray(1 << 20)), "user-prompt-submit", "mem")
+
+        (report,) = tmp_path.glob("user-prompt-submit-*.txt")
+        text = report.read_text()
+        assert text.startswith("tracemalloc:")
+        assert "test_profiling.py" in text
+
+    def test_unknown_mode_runs_unprofiled(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv(profile.PROFILE_DIR_ENV, str(tmp_path))
+        calls = []
+
+        profile.run(lambda: calls.append(1), "session-start", "gpu")
+
+        assert calls == [1]
+        assert "unknown" in capsys.readouterr().err
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestHookIntegration:
+    """Both hooks honor CODINGBUDDY_PROFILE without changing stdout."""
+
+    @pytest.mark.parametrize("mode", ["cpu", "mem", "imports"])
+    def test_user_prompt_submit_stdout_unchanged(self, mode, tmp_path):
+        plain = _run_hook("user-prompt-submit.py", "", tmp_path / "none")
+        profiled = _run_hook("user-prompt-submit.py", mode, tmp_path)
+
+        assert profiled.returncode == 0
+        assert profiled.stdout == plain.stdout
+        assert list(tmp_path.glob("user-prompt-submit-*.txt"))
+
+    def test_imports_trace_is_captured(self, tmp_path):
+        _run_hook("user-prompt-submit.py", "imports", tmp_path)
+
+        (report,) = tmp_path.glob("user-prompt-submit-*.txt")
+        assert "import time:" in report.read_text()
+
+    def test_session_start_cpu_profile(self, tmp_path):
+        home = tmp_path / "home"
+        result = _run_hook(
+            "session-start.py", "cpu", tmp_path,
+            HOME=str(home), CLAUDE_PLUGIN_DIR=str(HOOKS_DIR.parent),
+        )
+
+        assert result.returncode == 0
+        (prof,) = tmp_path.glob("session-start-*.prof")
+        functions = {func for _, _, func in pstats.Stats(str(prof)).stats}
+        assert "find_plugin_source" in functions
@@ -7,15 +7,20 @@ Run with: python3 -m pytest test_session_start.py -v
 
 import json
 import os
+import subprocess
+import sys
 import tempfile
+import time
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
 # Import the module under test
-import importlib.util
-spec = importlib.util.spec_from_file_location("session_hook", Path(__file__).parent / "session-start.py")
-session_hook = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(session_hook)
+from codingbuddy_hooks import budget, install_stamp
+from codingbuddy_hooks import session_start as session_hook
+
+# These tests check what session start does, not how fast: without a
+# budget a slow machine cannot hand the install to the background worker
+NO_BUDGET = {budget.BUDGET_ENVS["session-start"]: "0"}
 
 
 class TestFindPluginSource:
@@ -71,6 +76,238 @@ class TestFindPluginSource:
                     assert result is None
 
 
+def _make_cached_version(home: Path, version: str) -> Path:
+    """Create a versioned plugin cache entry and return its hook source."""
+    hooks_dir = home / ".claude/plugins/cache/jeremydev87/codingbuddy" / version / "hooks"
+    hooks_dir.mkdir(parents=True)
+    source_file = hooks_dir / "user-prompt-submit.py"
+    source_file.write_text(f"# version {version}")
+    return source_file.resolve()
+
+
+class TestSourceDiscoveryCache:
+    """Tests for the persisted plugin source discovery cache."""
+
+    def _find(self, home: Path):
+        with patch.dict(os.environ, {"CLAUDE_PLUGIN_DIR": ""}), \
+                patch.object(Path, "home", return_value=home):
+            return session_hook.find_plugin_source()
+
+    def test_reuses_cached_source_while_roots_unchanged(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            source_file = _make_cached_version(home, "3.0.0")
+            assert self._find(home) == source_file
+
+            with patch.object(session_hook, "_find_source_from_cache") as scan:
+                assert self._find(home) == source_file
+            scan.assert_not_called()
+
+    def test_new_version_invalidates_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _make_cached_version(home, "3.0.0")
+            self._find(home)
+
+            newer = _make_cached_version(home, "3.1.0")
+            # Make sure the root mtime moves even on coarse-grained filesystems
+            root = home / session_hook.PLUGIN_CACHE_PATHS[0]
+            os.utime(root, ns=(root.stat().st_atime_ns, root.stat().st_mtime_ns + 10**9))
+
+            assert self._find(home) == newer
+
+    def test_removed_source_falls_back_to_scan(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            source_file = _make_cached_version(home, "3.0.0")
+            self._find(home)
+            source_file.unlink()
+
+            assert self._find(home) is None
+
+    def test_rejects_cached_symlink(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _make_cached_version(home, "3.0.0")
+            self._find(home)
+
+            cache_file = home / ".claude" / "hooks" / session_hook.SOURCE_CACHE_FILENAME
+            evil_target = home / "evil.py"
+            evil_target.write_text("# not the hook")
+            evil_link = home / "link.py"
+            evil_link.symlink_to(evil_target)
+            cached = json.loads(cache_file.read_text())
+            cached["source"] = str(evil_link)
+            cache_file.write_text(json.dumps(cached))
+
+            with patch.object(Path, "home", return_value=home):
+                roots = session_hook._cache_root_signatures(home)
+            assert session_hook._load_cached_source(cache_file, roots) is None
+
+    def test_use_cache_false_skips_cache_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _make_cached_version(home, "3.0.0")
+
+            with patch.dict(os.environ, {"CLAUDE_PLUGIN_DIR": ""}), \
+                    patch.object(Path, "home", return_value=home):
+                session_hook.find_plugin_source(use_cache=False)
+
+            cache_file = home / ".claude" / "hooks" / session_hook.SOURCE_CACHE_FILENAME
+            assert not cache_file.exists()
+
+
+class TestVersionIndex:
+    """Tests for the incremental plugin cache version index."""
+
+    def test_index_lists_versions_newest_first(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            for version in ["1.0.0", "10.0.0", "3.0.0"]:
+                _make_cached_version(home, version)
+            index = {}
+
+            session_hook._find_source_from_cache(home, index)
+
+            (entry,) = index["roots"].values()
+            assert [name for name, _ in entry["versions"]] == ["10.0.0", "3.0.0", "1.0.0"]
+
+    def test_unchanged_root_is_not_listed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            source_file = _make_cached_version(home, "3.0.0")
+            index = {}
+            session_hook._find_source_from_cache(home, index)
+
+            with patch.object(session_hook, "_scan_version_names") as scan:
+                assert session_hook._find_source_from_cache(home, index) == source_file
+            scan.assert_not_called()
+
+    def test_rescan_parses_only_new_versions(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            for i in range(20):
+                _make_cached_version(home, f"1.0.{i}")
+            index = {}
+            session_hook._find_source_from_cache(home, index)
+            newest = _make_cached_version(home, "2.0.0")
+            root = home / session_hook.PLUGIN_CACHE_PATHS[0]
+            os.utime(root, ns=(root.stat().st_atime_ns, root.stat().st_mtime_ns + 10**9))
+
+            parsed = []
+            original = session_hook.parse_version
+            with patch.object(session_hook, "parse_version",
+                              side_effect=lambda v: parsed.append(v) or original(v)):
+                assert session_hook._find_source_from_cache(home, index) == newest
+            assert parsed == ["2.0.0"]
+
+    def test_skips_newest_version_without_hook(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            valid = _make_cached_version(home, "1.0.0")
+            (home / session_hook.PLUGIN_CACHE_PATHS[0] / "2.0.0").mkdir()
+
+            assert session_hook._find_source_from_cache(home, {}) == valid
+
+    def test_find_plugin_source_persists_index(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _make_cached_version(home, "3.0.0")
+
+            with patch.dict(os.environ, {"CLAUDE_PLUGIN_DIR": ""}), \
+                    patch.object(Path, "home", return_value=home):
+                session_hook.find_plugin_source()
+
+            index_file = home / ".claude" / "hooks" / session_hook.VERSION_INDEX_FILENAME
+            assert session_hook.load_version_index(index_file)["roots"]
+
+
+class TestPluginCacheGC:
+    """Tests for plugin cache garbage collection."""
+
+    def _versions(self, home: Path) -> list:
+        root = home / session_hook.PLUGIN_CACHE_PATHS[0]
+        return sorted(p.name for p in root.iterdir())
+
+    def test_keeps_newest_versions(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            for version in ["1.0.0", "2.0.0", "3.0.0", "10.0.0"]:
+                _make_cached_version(home, version)
+
+            removed = session_hook.gc_plugin_cache(home, retention=2)
+
+            assert sorted(p.name for p in removed) == ["1.0.0", "2.0.0"]
+            assert self._versions(home) == ["10.0.0", "3.0.0"]
+
+    def test_dry_run_removes_nothing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            for version in ["1.0.0", "2.0.0"]:
+                _make_cached_version(home, version)
+
+            removed = session_hook.gc_plugin_cache(home, retention=1, dry_run=True)
+
+            assert [p.name for p in removed] == ["1.0.0"]
+            assert self._versions(home) == ["1.0.0", "2.0.0"]
+
+    def test_never_removes_kept_version(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            in_use = _make_cached_version(home, "1.0.0")
+            _make_cached_version(home, "2.0.0")
+
+            session_hook.gc_plugin_cache(home, retention=1, keep=(in_use,))
+
+            assert self._versions(home) == ["1.0.0", "2.0.0"]
+
+    def test_ignores_non_version_directories_and_symlinks(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _make_cached_version(home, "2.0.0")
+            root = home / session_hook.PLUGIN_CACHE_PATHS[0]
+            (root / "notes").mkdir()
+            outside = home / "outside"
+            outside.mkdir()
+            (root / "1.0.0").symlink_to(outside)
+
+            session_hook.gc_plugin_cache(home, retention=1)
+
+            assert self._versions(home) == ["1.0.0", "2.0.0", "notes"]
+            assert outside.exists()
+
+    def test_zero_retention_disables_gc(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _make_cached_version(home, "1.0.0")
+
+            assert session_hook.gc_plugin_cache(home, retention=0) == []
+
+    def test_reads_retention_from_env(self):
+        with patch.dict(os.environ):
+            os.environ.pop(session_hook.CACHE_RETENTION_ENV, None)
+            assert session_hook.get_cache_retention() == 0
+        with patch.dict(os.environ, {session_hook.CACHE_RETENTION_ENV: "5"}):
+            assert session_hook.get_cache_retention() == 5
+        with patch.dict(os.environ, {session_hook.CACHE_RETENTION_ENV: "many"}):
+            assert session_hook.get_cache_retention() == session_hook.DEFAULT_CACHE_RETENTION
+
+    def test_session_start_prunes_only_when_opted_in(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            for version in ["1.0.0", "2.0.0", "3.0.0", "4.0.0"]:
+                _make_cached_version(home, version)
+
+            with patch.dict(os.environ):
+                os.environ.pop(session_hook.CACHE_RETENTION_ENV, None)
+                _run_main(home)
+            assert self._versions(home) == ["1.0.0", "2.0.0", "3.0.0", "4.0.0"]
+
+            (home / ".claude" / "hooks" / session_hook.STAMP_FILENAME).unlink()
+            _run_main(home, **{session_hook.CACHE_RETENTION_ENV: "2"})
+            assert self._versions(home) == ["3.0.0", "4.0.0"]
+
+
 class TestIsHookRegistered:
     """Tests for is_hook_registered function."""
 
@@ -191,6 +428,675 @@ class TestRegisterHookInSettings:
             assert backup_file.exists()
 
 
+HOOKS_DIR = Path(__file__).parent
+
+# Runs in a child process: import session_start and apply one update
+_CHILD_SCRIPT = """
+import sys
+from pathlib import Path
+sys.path.insert(0, sys.argv[1])
+from codingbuddy_hooks import session_start as s
+settings_file = Path(sys.argv[2])
+if sys.argv[3] == "register":
+    s.register_hook_in_settings(settings_file)
+else:
+    s.update_settings(settings_file, lambda d: d.setdefault("keys", []).append(sys.argv[3]) or True)
+"""
+
+
+def _spawn_updates(settings_file: Path, args: list) -> None:
+    """Run one settings update per arg in parallel child processes."""
+    procs = [
+        subprocess.Popen([
+            sys.executable, "-c", _CHILD_SCRIPT,
+            str(HOOKS_DIR), str(settings_file), arg,
+        ])
+        for arg in args
+    ]
+    for proc in procs:
+        assert proc.wait(timeout=30) == 0
+
+
+class TestSettingsTransaction:
+    """Tests for locked, atomic settings.json updates."""
+
+    def test_concurrent_registration_adds_single_entry(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+            settings_file.write_text(json.dumps({"model": "opus"}))
+
+            _spawn_updates(settings_file, ["register"] * 12)
+
+            settings = json.loads(settings_file.read_text())
+            assert len(settings["hooks"]["UserPromptSubmit"]) == 1
+            assert settings["model"] == "opus"
+
+    def test_concurrent_updates_are_not_lost(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+            keys = [f"k{i}" for i in range(12)]
+
+            _spawn_updates(settings_file, keys)
+
+            settings = json.loads(settings_file.read_text())
+            assert sorted(settings["keys"]) == sorted(keys)
+            assert session_hook.get_lock_stats(settings_file)["acquisitions"] == 12
+
+    def test_update_without_change_does_not_write(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+            settings_file.write_text("{}")
+            before = settings_file.stat().st_mtime_ns
+
+            assert session_hook.update_settings(settings_file, lambda s: False) is False
+            assert settings_file.stat().st_mtime_ns == before
+
+    def test_lock_timeout_raises(self):
+        if not session_hook.HAS_FCNTL:
+            return
+        import fcntl
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+            lock_path = settings_file.with_name(
+                settings_file.name + session_hook.SETTINGS_LOCK_SUFFIX
+            )
+            timeouts = session_hook.LOCK_METRICS["timeouts"]
+            with open(lock_path, "w") as holder:
+                fcntl.flock(holder.fileno(), fcntl.LOCK_EX)
+                try:
+                    with session_hook.settings_lock(settings_file, timeout=0.05):
+                        raise AssertionError("lock should not be acquired")
+                except session_hook.SettingsLockTimeout:
+                    pass
+            assert session_hook.LOCK_METRICS["timeouts"] == timeouts + 1
+
+    def test_write_preserves_file_mode(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+            settings_file.write_text("{}")
+            settings_file.chmod(0o600)
+
+            session_hook.register_hook_in_settings(settings_file)
+
+            assert settings_file.stat().st_mode & 0o777 == 0o600
+
+    def test_write_keeps_symlinked_settings(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            real_file = Path(tmpdir) / "dotfiles-settings.json"
+            real_file.write_text("{}")
+            settings_file = Path(tmpdir) / "settings.json"
+            settings_file.symlink_to(real_file)
+
+            session_hook.register_hook_in_settings(settings_file)
+
+            assert settings_file.is_symlink()
+            assert session_hook.is_hook_registered(real_file)
+
+    def test_leaves_no_temp_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+
+            session_hook.register_hook_in_settings(settings_file)
+
+            leftovers = [p.name for p in Path(tmpdir).iterdir() if p.name.endswith(".tmp")]
+            assert leftovers == []
+
+
+class TestHookModes:
+    """Tests for classic/resident hook mode registration."""
+
+    def test_defaults_to_classic_mode(self):
+        with patch.dict(os.environ, {install_stamp.HOOK_MODE_ENV: ""}):
+            assert session_hook.get_hook_mode() == session_hook.HOOK_MODE_CLASSIC
+
+    def test_reads_resident_mode_from_env(self):
+        with patch.dict(os.environ, {install_stamp.HOOK_MODE_ENV: "Resident"}):
+            assert session_hook.get_hook_mode() == session_hook.HOOK_MODE_RESIDENT
+
+    def test_ignores_unknown_mode(self):
+        with patch.dict(os.environ, {install_stamp.HOOK_MODE_ENV: "turbo"}):
+            assert session_hook.get_hook_mode() == session_hook.HOOK_MODE_CLASSIC
+
+    def test_registers_client_command(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+
+            result = session_hook.register_hook_in_settings(
+                settings_file, session_hook.CLIENT_COMMAND
+            )
+
+            assert result is True
+            assert session_hook.is_hook_registered(settings_file, session_hook.CLIENT_COMMAND)
+            assert not session_hook.is_hook_registered(settings_file)
+
+    def test_switching_mode_replaces_previous_entry(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            settings_file = Path(tmpdir) / "settings.json"
+            settings_file.write_text(json.dumps({
+                "hooks": {
+                    "UserPromptSubmit": [
+                        {"hooks": [{"type": "command", "command": session_hook.HOOK_COMMAND}]},
+                        {"hooks": [{"type": "command", "command": "other-hook"}]},
+                    ]
+                }
+            }))
+
+            result = session_hook.register_hook_in_settings(
+                settings_file, session_hook.CLIENT_COMMAND
+            )
+
+            assert result is True
+            settings = json.loads(settings_file.read_text())
+            commands = [
+                h["command"]
+                for group in settings["hooks"]["UserPromptSubmit"]
+                for h in group["hooks"]
+            ]
+            assert commands == ["other-hook", session_hook.CLIENT_COMMAND]
+
+    def test_main_installs_client_in_resident_mode(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            plugin_hooks = Path(__file__).parent
+            env = {
+                "CLAUDE_PLUGIN_DIR": str(plugin_hooks.parent),
+                install_stamp.HOOK_MODE_ENV: session_hook.HOOK_MODE_RESIDENT,
+                **NO_BUDGET,
+            }
+
+            with patch.dict(os.environ, env), \
+                    patch.object(Path, "home", return_value=home), \
+                    patch.object(session_hook, "start_daemon") as start_daemon:
+                try:
+                    session_hook.main()
+                except SystemExit:
+                    pass
+
+            hooks_dir = home / ".claude" / "hooks"
+            assert (hooks_dir / session_hook.HOOK_FILENAME).exists()
+            assert (hooks_dir / session_hook.CLIENT_FILENAME).exists()
+            assert session_hook.is_hook_registered(
+                home / ".claude" / "settings.json", session_hook.CLIENT_COMMAND
+            )
+            start_daemon.assert_called_once()
+
+
+def _run_main(home: Path, **env: str) -> None:
+    """Run session_hook.main() against a temporary home directory."""
+    plugin_dir = str(Path(__file__).parent.parent)
+    with patch.dict(os.environ, {"CLAUDE_PLUGIN_DIR": plugin_dir, **NO_BUDGET, **env}), \
+            patch.object(Path, "home", return_value=home):
+        try:
+            session_hook.main()
+        except SystemExit:
+            pass
+
+
+class TestInstallStamp:
+    """Tests for the install stamp fast path."""
+
+    def test_writes_stamp_after_install(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+
+            _run_main(home)
+
+            stamp_file = home / ".claude" / "hooks" / session_hook.STAMP_FILENAME
+            stamp = session_hook.read_stamp(stamp_file)
+            assert stamp["format"] == install_stamp.STAMP_FORMAT
+            assert stamp["hook_sha256"]
+            assert stamp["settings"] is not None
+
+    def test_fast_path_skips_discovery_and_settings_parse(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+
+            with patch.object(session_hook, "find_plugin_source") as find_source, \
+                    patch.object(session_hook, "register_hook_in_settings") as register:
+                _run_main(home)
+
+            find_source.assert_not_called()
+            register.assert_not_called()
+
+    def test_settings_edit_invalidates_stamp(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+            settings_file = home / ".claude" / "settings.json"
+            settings_file.write_text(json.dumps({"hooks": {}}))
+
+            _run_main(home)
+
+            assert session_hook.is_hook_registered(settings_file)
+
+    def test_deleted_hook_invalidates_stamp(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+            target_file = home / ".claude" / "hooks" / session_hook.HOOK_FILENAME
+            target_file.unlink()
+
+            _run_main(home)
+
+            assert target_file.exists()
+
+    def test_replaced_package_module_invalidates_stamp(self, tmp_path):
+        _run_main(tmp_path)
+        hooks_dir = tmp_path / ".claude" / "hooks"
+        settings_file = tmp_path / ".claude" / "settings.json"
+
+        def is_current() -> bool:
+            stamp = session_hook.compute_stamp(hooks_dir, settings_file, "classic")
+            return session_hook.is_stamp_current(hooks_dir / session_hook.STAMP_FILENAME, stamp)
+
+        assert is_current()
+
+        package_dir = hooks_dir / install_stamp.PACKAGE_NAME
+        replacement = package_dir / ".budget.py.tmp"
+        replacement.write_text("# edited\n")
+        os.replace(replacement, package_dir / "budget.py")
+
+        assert not is_current()
+
+    def test_stamp_cost_does_not_grow_with_package(self, tmp_path):
+        _run_main(tmp_path)
+        hooks_dir = str(tmp_path / ".claude" / "hooks")
+        settings_file = str(tmp_path / ".claude" / "settings.json")
+
+        with patch.object(install_stamp, "file_signature", wraps=install_stamp.file_signature) as stat:
+            install_stamp.compute_stamp(hooks_dir, settings_file, "classic", str(Path(__file__).parent.parent))
+
+        assert stat.call_count == 7 + 2 * len(install_stamp.SUPPORT_FILENAMES)
+
+    def test_plugin_upgrade_changes_stamp(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            hooks_dir = home / ".claude" / "hooks"
+            settings_file = home / ".claude" / "settings.json"
+            before = session_hook.compute_stamp(hooks_dir, settings_file, "classic")
+
+            new_plugin = home / "plugins" / "codingbuddy" / "9.9.9" / "hooks"
+            new_plugin.mkdir(parents=True)
+            (new_plugin / session_hook.SOURCE_FILENAME).write_text("# new")
+            module = new_plugin / "codingbuddy_hooks" / "session_start.py"
+            with patch.object(session_hook, "__file__", str(module)):
+                after = session_hook.compute_stamp(hooks_dir, settings_file, "classic")
+
+            assert before != after
+
+    def test_mode_switch_invalidates_stamp(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+
+            with patch.object(session_hook, "start_daemon"):
+                _run_main(home, **{install_stamp.HOOK_MODE_ENV: session_hook.HOOK_MODE_RESIDENT})
+
+            assert session_hook.is_hook_registered(
+                home / ".claude" / "settings.json", session_hook.CLIENT_COMMAND
+            )
+
+    def test_ignores_corrupted_stamp(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            stamp_file = Path(tmpdir) / session_hook.STAMP_FILENAME
+            stamp_file.write_text("not valid json")
+
+            assert session_hook.is_stamp_current(stamp_file, {"format": 1}) is False
+
+
+class TestHookUpgrade:
+    """Tests for version-aware hook upgrades."""
+
+    def _write_hook(self, path: Path, version: str, body: str = "pass") -> Path:
+        path.write_text(f'HOOK_VERSION = "{version}"\n{body}\n')
+        return path
+
+    def test_reads_version_header_from_source(self):
+        source = Path(__file__).parent / session_hook.SOURCE_FILENAME
+        package = json.loads((Path(__file__).parent.parent / "package.json").read_text())
+        assert session_hook.read_hook_version(source) == package["version"]
+
+    def test_needs_upgrade_when_target_missing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = self._write_hook(Path(tmpdir) / "src.py", "1.0.0")
+            assert session_hook.needs_upgrade(source, Path(tmpdir) / "missing.py") is True
+
+    def test_no_upgrade_after_install(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = self._write_hook(Path(tmpdir) / "src.py", "1.0.0")
+            target = Path(tmpdir) / "target.py"
+            session_hook.install_hook_file(source, target)
+
+            with patch.object(session_hook, "_file_sha256") as sha:
+                assert session_hook.needs_upgrade(source, target) is False
+            sha.assert_not_called()
+
+    def test_upgrade_on_version_change(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = self._write_hook(Path(tmpdir) / "src.py", "2.0.0")
+            target = self._write_hook(Path(tmpdir) / "target.py", "1.0.0")
+            assert session_hook.needs_upgrade(source, target) is True
+
+    def test_hashes_only_when_metadata_is_ambiguous(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = self._write_hook(Path(tmpdir) / "src.py", "1.0.0", "a = 1")
+            target = self._write_hook(Path(tmpdir) / "target.py", "1.0.0", "a = 2")
+            os.utime(target, ns=(0, 10**9))
+            assert session_hook.needs_upgrade(source, target) is True
+
+            target.write_text(source.read_text())
+            os.utime(target, ns=(0, 10**9))
+            assert session_hook.needs_upgrade(source, target) is False
+
+    def test_main_replaces_outdated_hook(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            target = home / ".claude" / "hooks" / session_hook.HOOK_FILENAME
+            target.parent.mkdir(parents=True)
+            self._write_hook(target, "0.0.1")
+
+            _run_main(home)
+
+            source = Path(__file__).parent / session_hook.SOURCE_FILENAME
+            assert target.read_bytes() == source.read_bytes()
+            assert os.access(target, os.X_OK)
+            assert session_hook.is_hook_registered(home / ".claude" / "settings.json")
+
+    def test_main_installs_support_files_next_to_hook(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+
+            _run_main(home)
+
+            for name in session_hook.SUPPORT_FILENAMES:
+                source = Path(__file__).parent / name
+                target = home / ".claude" / "hooks" / name
+                assert target.read_bytes() == source.read_bytes()
+                assert not os.access(target, os.X_OK)
+
+    def test_main_installs_precompiled_hook_package(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+
+            _run_main(home)
+
+            package_dir = home / ".claude" / "hooks" / session_hook.PACKAGE_NAME
+            for name in session_hook.HOOK_PACKAGE_MODULES:
+                source = Path(__file__).parent / session_hook.PACKAGE_NAME / name
+                assert (package_dir / name).read_bytes() == source.read_bytes()
+                assert os.path.isfile(session_hook.install_stamp.pyc_path(str(package_dir / name)))
+            assert not (package_dir / "session_start.py").exists()
+
+    def test_deleted_bytecode_is_recompiled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+            module = home / ".claude" / "hooks" / session_hook.PACKAGE_NAME / "mode_detect.py"
+            pyc = Path(session_hook.install_stamp.pyc_path(str(module)))
+            pyc.unlink()
+
+            _run_main(home)
+
+            assert pyc.is_file()
+
+    def test_main_removes_legacy_files_and_commands(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            hooks_dir = home / ".claude" / "hooks"
+            hooks_dir.mkdir(parents=True)
+            for name in session_hook.LEGACY_SUPPORT_FILENAMES:
+                (hooks_dir / name).write_text("# old")
+            settings_file = home / ".claude" / "settings.json"
+            settings_file.write_text(json.dumps({"hooks": {"UserPromptSubmit": [
+                session_hook._create_hook_entry(session_hook.LEGACY_HOOK_COMMANDS[0])
+            ]}}))
+
+            _run_main(home)
+
+            for name in session_hook.LEGACY_SUPPORT_FILENAMES:
+                assert not (hooks_dir / name).exists()
+            settings = json.loads(settings_file.read_text())
+            assert session_hook._registered_commands(settings) == [session_hook.HOOK_COMMAND]
+
+    def test_missing_bundle_invalidates_stamp(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+            target = home / ".claude" / "hooks" / install_stamp.BUNDLE_FILENAME
+            target.unlink()
+
+            _run_main(home)
+
+            assert target.is_file()
+
+    def test_main_keeps_current_hook(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+            target = home / ".claude" / "hooks" / session_hook.HOOK_FILENAME
+            (target.parent / session_hook.STAMP_FILENAME).unlink()
+
+            with patch.object(session_hook, "install_hook_file") as install:
+                _run_main(home)
+
+            install.assert_not_called()
+
+
+class TestInstallLease:
+    """Tests for single-flight installs across concurrent session starts."""
+
+    def _hold_lease(self, home: Path):
+        import fcntl
+
+        hooks_dir = home / ".claude" / "hooks"
+        hooks_dir.mkdir(parents=True, exist_ok=True)
+        lock = open(hooks_dir / session_hook.INSTALL_LOCK_FILENAME, "w")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _run(self, home: Path, lease_timeout: float) -> None:
+        plugin_dir = str(Path(__file__).parent.parent)
+        with patch.dict(os.environ, {"CLAUDE_PLUGIN_DIR": plugin_dir, **NO_BUDGET}), \
+                patch.object(Path, "home", return_value=home):
+            try:
+                session_hook.main(lease_timeout=lease_timeout)
+            except SystemExit:
+                pass
+
+    def test_waiter_reuses_holders_install(self):
+        import threading
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+            lock = self._hold_lease(home)
+            threading.Timer(0.1, lock.close).start()
+
+            # Stale when the waiter starts, current once the holder is done
+            with patch.object(session_hook, "is_stamp_current", side_effect=[False, True]), \
+                    patch.object(session_hook, "find_plugin_source") as find_source:
+                self._run(home, lease_timeout=5)
+
+            find_source.assert_not_called()
+
+    def test_waiter_installs_if_holder_did_not(self):
+        import threading
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            lock = self._hold_lease(home)
+            threading.Timer(0.1, lock.close).start()
+
+            self._run(home, lease_timeout=5)
+
+            assert (home / ".claude" / "hooks" / session_hook.HOOK_FILENAME).exists()
+
+    def test_gives_up_after_deadline(self, capsys):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            with self._hold_lease(home):
+                self._run(home, lease_timeout=0.05)
+
+            assert not (home / ".claude" / "hooks" / session_hook.HOOK_FILENAME).exists()
+            assert capsys.readouterr().out == ""
+
+    def test_lease_is_released(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+
+            lock_fd, contended = session_hook.acquire_install_lease(home / ".claude" / "hooks", timeout=0)
+
+            assert contended is False
+            session_hook.release_install_lease(lock_fd)
+
+
+class TestBackgroundInstall:
+    """Tests for CODINGBUDDY_INSTALL=background."""
+
+    def _run_worker(self, home: Path, **env: str) -> None:
+        plugin_dir = str(Path(__file__).parent.parent)
+        with patch.dict(os.environ, {"CLAUDE_PLUGIN_DIR": plugin_dir, "LANG": "ko_KR.UTF-8", **env}), \
+                patch.object(Path, "home", return_value=home), \
+                patch.object(session_hook, "_cached_language", None):
+            session_hook.install_worker_main()
+
+    def test_install_mode_from_env(self):
+        with patch.dict(os.environ, {install_stamp.INSTALL_ENV: " Background "}):
+            assert install_stamp.get_install_mode() == install_stamp.INSTALL_BACKGROUND
+        with patch.dict(os.environ, {install_stamp.INSTALL_ENV: "later"}):
+            assert install_stamp.get_install_mode() == install_stamp.INSTALL_FOREGROUND
+        with patch.dict(os.environ, {
+            install_stamp.INSTALL_ENV: "background", session_hook.PROFILE_ENV: "cprofile",
+        }):
+            assert install_stamp.get_install_mode() == install_stamp.INSTALL_FOREGROUND
+
+    def test_worker_installs_and_reports(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            hooks_dir = home / ".claude" / "hooks"
+
+            self._run_worker(home)
+
+            assert (hooks_dir / session_hook.HOOK_FILENAME).exists()
+            assert session_hook.is_hook_registered(home / ".claude" / "settings.json")
+            report = (hooks_dir / install_stamp.INSTALL_REPORT_FILENAME).read_text()
+            assert report == session_hook.MESSAGES["ko"]["installed"] + "\n" \
+                + session_hook.MESSAGES["ko"]["patterns"] + "\n\0"
+
+    def test_current_install_leaves_no_report(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            _run_main(home)
+
+            self._run_worker(home)
+
+            assert not (home / ".claude" / "hooks" / install_stamp.INSTALL_REPORT_FILENAME).exists()
+
+    def _run_launcher(self, home: Path) -> None:
+        env = {
+            "HOME": str(home),
+            "CLAUDE_PLUGIN_DIR": str(Path(__file__).parent.parent),
+            install_stamp.INSTALL_ENV: install_stamp.INSTALL_BACKGROUND,
+            "CODINGBUDDY_LATENCY": "0",
+        }
+        with patch.dict(os.environ, env):
+            install_stamp.run_background("session-start.py")
+
+    def test_current_stamp_spawns_no_worker(self, tmp_path):
+        _run_main(tmp_path)
+
+        with patch.object(install_stamp, "spawn_install_worker") as spawn:
+            self._run_launcher(tmp_path)
+
+        spawn.assert_not_called()
+
+    def test_stale_stamp_spawns_worker(self, tmp_path):
+        _run_main(tmp_path)
+        (tmp_path / ".claude" / "settings.json").write_text("{}")
+
+        with patch.object(install_stamp, "spawn_install_worker") as spawn:
+            self._run_launcher(tmp_path)
+
+        spawn.assert_called_once_with("session-start.py")
+
+    def test_worker_exits_while_another_runs(self):
+        import fcntl
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+            hooks_dir = home / ".claude" / "hooks"
+            hooks_dir.mkdir(parents=True)
+            with open(hooks_dir / install_stamp.INSTALL_LOCK_FILENAME, "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+                with patch.object(session_hook, "find_plugin_source") as find_source:
+                    self._run_worker(home)
+
+            find_source.assert_not_called()
+            assert not (hooks_dir / install_stamp.INSTALL_REPORT_FILENAME).exists()
+
+    def test_errors_go_to_report(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            home = Path(tmpdir)
+
+            with patch.object(session_hook, "find_plugin_source", side_effect=RuntimeError("disk on fire")):
+                self._run_worker(home)
+
+            report = (home / ".claude" / "hooks" / install_stamp.INSTALL_REPORT_FILENAME).read_text()
+            out, _, err = report.partition("\0")
+            assert out == ""
+            assert "disk on fire" in err
+
+    def test_unshown_reports_accumulate(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report_file = Path(tmpdir) / install_stamp.INSTALL_REPORT_FILENAME
+
+            session_hook.append_install_report(report_file, "first\n", "")
+            session_hook.append_install_report(report_file, "second\n", "oops\n")
+
+            assert report_file.read_text() == "first\nsecond\n\0oops\n"
+
+    def test_report_is_shown_once(self, capsys):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report_file = Path(tmpdir) / install_stamp.INSTALL_REPORT_FILENAME
+            session_hook.append_install_report(report_file, "installed\n", "warning\n")
+
+            assert install_stamp.show_install_report(str(report_file)) is True
+            assert install_stamp.show_install_report(str(report_file)) is False
+
+            captured = capsys.readouterr()
+            assert captured.out == "installed\n"
+            assert captured.err == "warning\n"
+
+    def test_launcher_returns_before_install(self, tmp_path):
+        # tmp_path outlives the test, so the worker the second run starts can finish in it
+        hooks_dir = tmp_path / ".claude" / "hooks"
+        env = {
+            **os.environ,
+            "HOME": str(tmp_path),
+            "CLAUDE_PLUGIN_DIR": str(Path(__file__).parent.parent),
+            install_stamp.INSTALL_ENV: install_stamp.INSTALL_BACKGROUND,
+            "LANG": "en_US.UTF-8",
+        }
+        launcher = [sys.executable, "-I", "-S", str(Path(__file__).parent / "session-start.py")]
+
+        first = subprocess.run(launcher, capture_output=True, text=True, env=env)
+        # The worker finishes on its own; wait for its report
+        report_file = hooks_dir / install_stamp.INSTALL_REPORT_FILENAME
+        for _ in range(200):
+            if report_file.exists():
+                break
+            time.sleep(0.05)
+        second = subprocess.run(launcher, capture_output=True, text=True, env=env)
+
+        assert first.returncode == 0
+        assert first.stdout == ""
+        assert session_hook.MESSAGES["en"]["installed"] in second.stdout
+        assert not report_file.exists()
+
+
 class TestVersionSorting:
     """Tests for version directory sorting."""
 
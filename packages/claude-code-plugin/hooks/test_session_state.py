@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/session_state.py
+
+Run with: python3 -m pytest test_session_state.py -v
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from codingbuddy_hooks import session_state
+
+HOOKS_DIR = Path(__file__).parent
+SECOND = 10**9
+
+
+@pytest.fixture
+def store(tmp_path):
+    return session_state.SessionStore(str(tmp_path / "cache" / "sessions.map"))
+
+
+class TestUpdate:
+    """Tests for recording prompts."""
+
+    def test_detected_mode_starts_entry(self, store):
+        assert store.update("s1", "PLAN", now_ns=SECOND) == ("PLAN", SECOND, 1, 1)
+        assert store.lookup("s1", now_ns=SECOND) == ("PLAN", SECOND, 1, 1)
+
+    def test_follow_up_counts_prompts(self, store):
+        store.update("s1", "PLAN", now_ns=SECOND)
+        store.update("s1", None, now_ns=2 * SECOND)
+
+        assert store.update("s1", None, now_ns=3 * SECOND) == ("PLAN", 3 * SECOND, 3, 1)
+
+    def test_same_mode_counts_detections(self, store):
+        store.update("s1", "PLAN", now_ns=SECOND)
+        store.update("s1", None, now_ns=SECOND)
+
+        assert store.update("s1", "PLAN", now_ns=2 * SECOND) == ("PLAN", 2 * SECOND, 3, 2)
+
+    def test_new_mode_resets_count(self, store):
+        store.update("s1", "PLAN", now_ns=SECOND)
+        store.update("s1", None, now_ns=SECOND)
+
+        assert store.update("s1", "ACT", now_ns=2 * SECOND) == ("ACT", 2 * SECOND, 1, 1)
+
+    def test_expired_mode_restarts_detections(self, tmp_path):
+        store = session_state.SessionStore(str(tmp_path / "sessions.map"), ttl_seconds=60)
+        store.update("s1", "PLAN", now_ns=SECOND)
+
+        assert store.update("s1", "PLAN", now_ns=62 * SECOND) == ("PLAN", 62 * SECOND, 1, 1)
+
+    def test_sessions_without_mode_are_not_stored(self, store):
+        assert store.update("s1", None) is None
+        assert store.entries() == []
+
+    def test_expired_entry_is_inactive(self, tmp_path):
+        store = session_state.SessionStore(str(tmp_path / "sessions.map"), ttl_seconds=60)
+        store.update("s1", "PLAN", now_ns=SECOND)
+
+        assert store.update("s1", None, now_ns=62 * SECOND) is None
+        assert store.lookup("s1", now_ns=62 * SECOND) is None
+
+    def test_long_session_ids(self, store):
+        long_a, long_b = "a" * 60 + "1", "a" * 60 + "2"
+        store.update(long_a, "PLAN")
+        store.update(long_b, "EVAL")
+
+        assert store.lookup(long_a)[0] == "PLAN"
+        assert store.lookup(long_b)[0] == "EVAL"
+
+    @pytest.mark.parametrize("session_id,mode", [("", "PLAN"), ("a\0b", "PLAN"), ("s1", "X" * 17)])
+    def test_rejects_invalid_input(self, store, session_id, mode):
+        with pytest.raises(ValueError):
+            store.update(session_id, mode)
+
+    def test_file_size_is_fixed(self, tmp_path):
+        store = session_state.SessionStore(str(tmp_path / "sessions.map"), slots=32)
+        for i in range(500):
+            store.update(f"session-{i}", "ACT")
+
+        assert os.path.getsize(store.path) == session_state._store_size(32)
+        assert len(store.entries()) == 32
+
+    def test_resets_foreign_file(self, store):
+        os.makedirs(os.path.dirname(store.path))
+        Path(store.path).write_bytes(b"not a store")
+
+        assert store.lookup("s1") is None
+        store.update("s1", "AUTO")
+        assert store.lookup("s1")[0] == "AUTO"
+
+
+class TestEviction:
+    """Tests for LRU eviction within the probe window."""
+
+    def test_evicts_least_recently_updated(self, tmp_path):
+        # With as many slots as the probe window, every key shares one window
+        store = session_state.SessionStore(str(tmp_path / "sessions.map"), slots=session_state.PROBE_LIMIT)
+        for i in range(session_state.PROBE_LIMIT):
+            store.update(f"s{i}", "PLAN", now_ns=(i + 1) * SECOND)
+        # s0 is the oldest until it sees another prompt
+        store.update("s0", None, now_ns=100 * SECOND)
+
+        store.update("new", "ACT", now_ns=101 * SECOND)
+
+        assert store.lookup("s0", now_ns=101 * SECOND) is not None
+        assert store.lookup("s1", now_ns=101 * SECOND) is None
+        assert store.lookup("new", now_ns=101 * SECOND)[0] == "ACT"
+
+    def test_session_is_stored_once(self, tmp_path):
+        store = session_state.SessionStore(str(tmp_path / "sessions.map"), slots=session_state.PROBE_LIMIT)
+        for i in range(50):
+            store.update(f"s{i % 20}", "PLAN")
+
+        keys = [entry[0] for entry in store.entries()]
+        assert len(keys) == len(set(keys))
+
+
+class TestTrack:
+    """Tests for the hook entry point."""
+
+    def test_never_raises(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+
+        assert session_state.track("s1", "PLAN", str(blocker / "sessions.map")) is None
+        assert session_state.track(None, "PLAN", str(tmp_path / "sessions.map")) is None
+        assert session_state.track("s1", "X" * 40, str(tmp_path / "sessions.map")) is None
+
+    def test_parallel_processes_keep_every_count(self, tmp_path):
+        path = str(tmp_path / "sessions.map")
+        sessions, prompts = 4, 50
+        child = (
+            "import sys\n"
+            "from codingbuddy_hooks import session_state\n"
+            "session_id, path, prompts = sys.argv[1], sys.argv[2], int(sys.argv[3])\n"
+            "session_state.track(session_id, 'PLAN', path)\n"
+            "for _ in range(prompts - 1):\n"
+            "    session_state.track(session_id, None, path)\n"
+            "session_state.track('shared', None, path)\n"
+        )
+        session_state.track("shared", "EVAL", path)
+
+        procs = [
+            subprocess.Popen([sys.executable, "-c", child, f"s{i}", path, str(prompts)], cwd=HOOKS_DIR)
+            for i in range(sessions)
+        ]
+        assert all(proc.wait() == 0 for proc in procs)
+
+        store = session_state.SessionStore(path)
+        for i in range(sessions):
+            assert store.lookup(f"s{i}")[2] == prompts
+        assert store.lookup("shared")[2] == 1 + sessions
+
+    def test_without_fcntl_hook_runs_without_store(self, tmp_path):
+        path = str(tmp_path / "sessions.map")
+        session_state.track("s1", "PLAN", path)
+        # As on Windows: no fcntl module
+        child = (
+            "import io, json, sys\n"
+            "sys.modules['fcntl'] = None\n"
+            "from codingbuddy_hooks import mode_detect, session_state\n"
+            "assert not session_state.HAS_FCNTL\n"
+            "assert session_state.track('s2', 'PLAN', sys.argv[1]) is None\n"
+            "assert session_state.SessionStore(sys.argv[1]).lookup('s1')[0] == 'PLAN'\n"
+            "payload = json.dumps({'prompt': 'ACT: go', 'session_id': 's1'})\n"
+            "sys.stdout.write(mode_detect.process_input(io.StringIO(payload)))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", child, path], cwd=HOOKS_DIR, capture_output=True, text=True,
+            env={**os.environ, session_state.STORE_ENV: path},
+        )
+
+        assert result.returncode == 0, result.stderr
+        assert "ACT" in result.stdout
+        assert session_state.SessionStore(path).lookup("s1")[0] == "PLAN"
+
+    def test_cli_lists_sessions(self, tmp_path, capsys):
+        path = str(tmp_path / "sessions.map")
+        session_state.track("s1", "PLAN", path)
+
+        assert session_state.main(["--store", path]) == 0
+
+        out = capsys.readouterr().out
+        assert "s1" in out
+        assert "PLAN" in out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
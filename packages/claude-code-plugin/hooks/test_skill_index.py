@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Unit tests for codingbuddy_hooks/skill_index.py
+
+Run with: python3 -m pytest test_skill_index.py -v
+"""
+
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import benchmarks
+from codingbuddy_hooks import agent_index, mode_detect, skill_index
+
+SKILLS = {
+    "refactoring": "Use when improving code structure without changing behavior, cleaning up technical debt",
+    "systematic-debugging": "Use when encountering any bug, test failure, or unexpected behavior",
+    "api-design": "Use when designing REST or GraphQL APIs - covers OpenAPI spec and versioning",
+    "코드-리뷰": "풀 리퀘스트 코드 리뷰 체크리스트",
+}
+
+
+@pytest.fixture
+def index():
+    return skill_index.SkillIndex(skill_index.build_skill_index(SKILLS))
+
+
+class TestTokenize:
+    """Tests for the multilingual tokenizer."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Use when designing REST APIs", ["designing", "rest", "api"]),
+        ("class access", ["class", "access"]),
+        ("Flaky queries and dependencies", ["flaky", "query", "dependency"]),
+        ("FAQ entries", ["faq", "entry"]),
+        ("코드 리뷰", ["코드", "리뷰"]),
+        ("코드리뷰해줘", ["코드", "드리", "리뷰", "뷰해", "해줘"]),
+        ("設計とAPI", ["設計", "計と", "api"]),
+        ("diseño de la API", ["diseño", "de", "la", "api"]),
+    ])
+    def test_tokenize(self, text, expected):
+        assert skill_index.tokenize(text) == expected
+
+    def test_shares_stemming_with_agent_index(self):
+        words = "migrations queries class APIs"
+        assert skill_index.tokenize(words) == [agent_index.terms(word).pop() for word in words.split()]
+
+    def test_ascii_words_match_token_pattern(self):
+        pattern = re.compile(skill_index.TOKEN_PATTERN)
+        rng = random.Random(0)
+        for _ in range(500):
+            text = "".join(rng.choice("aZ09_-. \t/:+#") for _ in range(rng.randrange(40)))
+            assert skill_index._ascii_words(text) == [match.group(0) for match in pattern.finditer(text)]
+
+    def test_ascii_prompt_compiles_no_pattern(self):
+        code = (
+            "from codingbuddy_hooks import skill_index\n"
+            "skill_index.tokenize('design the REST API')\n"
+            "assert skill_index._token_pattern is None\n"
+            "skill_index.tokenize('API 설계')\n"
+            "assert skill_index._token_pattern is not None\n"
+        )
+        subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent, check=True)
+
+
+class TestSkillIndex:
+    """Tests for building, loading and matching."""
+
+    def test_suggests_most_similar_skill(self, index):
+        suggestions = index.suggest("refactor to clean up technical debt in the code structure")
+
+        assert [name for name, _ in suggestions] == ["refactoring"]
+        assert 0 < suggestions[0][1] <= 1
+
+    def test_matches_hangul_without_spaces(self, index):
+        assert index.suggest("이 풀리퀘스트 코드리뷰 부탁해")[0][0] == "코드-리뷰"
+
+    def test_single_shared_term_is_not_enough(self, index):
+        assert index.suggest("fix the bug") == []
+        assert index.suggest("") == []
+
+    def test_top_k(self, index):
+        prompt = "technical debt bug failure REST API versioning structure behavior"
+
+        assert len(index.suggest(prompt, top_k=1)) == 1
+        assert len(index.suggest(prompt)) <= skill_index.TOP_K
+
+    def test_scores_are_cosine_similarities(self, index):
+        scores, matched = index.scores(SKILLS["api-design"] + " api design")
+
+        assert max(scores) == pytest.approx(1.0, abs=1e-6)
+        assert matched[index.skills.index("api-design")] > 1
+
+    @pytest.mark.parametrize("data", [b"", b"{}\n", b'{"format":99}\n'])
+    def test_rejects_other_data(self, data):
+        with pytest.raises(ValueError):
+            skill_index.SkillIndex(data)
+
+    def test_rejects_truncated_arrays(self):
+        data = skill_index.build_skill_index(SKILLS)
+
+        with pytest.raises(ValueError):
+            skill_index.SkillIndex(data[:-1])
+
+    def test_render(self):
+        block = skill_index.render_suggestions([("refactoring", 0.4321), ("api-design", 0.2)])
+
+        assert "SUGGESTED_SKILLS: refactoring (0.43), api-design (0.20)\n" in block
+
+
+class TestBudget:
+    """The latency promise of MATCH_BUDGET_MS."""
+
+    def test_load_and_match_within_budget(self):
+        data = skill_index.build_skill_index(benchmarks.synthetic_skills(skill_index.BUDGET_SKILLS))
+        prompt = "design the payment invoice export with retry and timeout handling " * 20
+        samples = []
+        for _ in range(30):
+            started = time.perf_counter()
+            skill_index.SkillIndex(data).suggest(prompt)
+            samples.append((time.perf_counter() - started) * 1000)
+
+        assert statistics.median(samples) < skill_index.MATCH_BUDGET_MS
+
+    def test_committed_bundle_has_shipped_skills(self):
+        bundle = mode_detect.load_rules_bundle(str(Path(__file__).parent / mode_detect.BUNDLE_FILENAME))
+        skills_dir = Path(__file__).parent.parent.parent / "rules" / ".ai-rules" / "skills"
+        if not skills_dir.is_dir():
+            pytest.skip("skill definitions not available")
+
+        assert bundle.skill_index().skills == sorted(path.parent.name for path in skills_dir.glob("*/SKILL.md"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Startup budget tests for the installed hook launchers.
+
+Each test installs the hooks into a temporary home with session-start.py,
+then runs a launcher the way Claude Code does and inspects the
+``python3 -X importtime`` report of its no-op path.
+
+Run with: python3 -m pytest test_startup.py -v
+"""
+
+import ast
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+HOOKS_DIR = Path(__file__).parent
+PLUGIN_DIR = HOOKS_DIR.parent
+
+# These runs check imports and the install under -X importtime, which
+# slows them down; a spent latency budget would skip what they check
+NO_BUDGETS = {"CODINGBUDDY_PROMPT_BUDGET_MS": "0", "CODINGBUDDY_SESSION_BUDGET_MS": "0"}
+
+# Modules the no-op paths must not import (documented in README.md)
+MODE_DETECT_FORBIDDEN = {
+    "typing", "unicodedata", "pathlib", "shutil", "socket", "socketserver",
+    "importlib.util", "codingbuddy_hooks.session_start", "codingbuddy_hooks.profiling",
+}
+SESSION_START_FORBIDDEN = MODE_DETECT_FORBIDDEN | {"json", "re", "codingbuddy_hooks.mode_detect"}
+
+# Self time of the codingbuddy_hooks modules, loaded from precompiled bytecode
+PACKAGE_IMPORT_BUDGET_US = 15_000
+
+
+def _import_report(stderr: str) -> dict:
+    """Parse -X importtime output into {module: self time in us}."""
+    report = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            report[name.strip()] = int(self_us)
+    return report
+
+
+def _package_self_us(report: dict) -> int:
+    return sum(us for name, us in report.items() if name.split(".")[0] == "codingbuddy_hooks")
+
+
+@pytest.fixture
+def home(tmp_path):
+    """A home directory with the hooks installed by session-start.py."""
+    env = {**os.environ, **NO_BUDGETS, "HOME": str(tmp_path), "CLAUDE_PLUGIN_DIR": str(PLUGIN_DIR)}
+    result = subprocess.run(
+        [sys.executable, str(HOOKS_DIR / "session-start.py")],
+        capture_output=True, text=True, env=env,
+    )
+    assert result.returncode == 0, result.stderr
+    return tmp_path
+
+
+def _run(args: list, home: Path, payload: str = "") -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-I", "-S", "-X", "importtime", *args],
+        input=payload, capture_output=True, text=True,
+        env={**os.environ, **NO_BUDGETS, "HOME": str(home), "CLAUDE_PLUGIN_DIR": str(PLUGIN_DIR)},
+    )
+
+
+class TestPackage:
+    """The codingbuddy_hooks package as shipped."""
+
+    def test_docstring_lists_every_module(self):
+        package_dir = HOOKS_DIR / "codingbuddy_hooks"
+        docstring = ast.get_docstring(ast.parse((package_dir / "__init__.py").read_text(encoding="utf-8")))
+        listed = {line.split()[0] for line in docstring.splitlines() if line.startswith("    ")}
+
+        assert listed == {path.stem for path in package_dir.glob("*.py")} - {"__init__"}
+
+
+class TestModeDetectStartup:
+    """The installed UserPromptSubmit launcher."""
+
+    def test_registered_command_is_isolated(self, home):
+        settings = json.loads((home / ".claude" / "settings.json").read_text())
+        (group,) = settings["hooks"]["UserPromptSubmit"]
+        assert group["hooks"][0]["command"].startswith("python3 -I -S ")
+
+    def test_package_bytecode_is_checked_hash(self, home):
+        package_dir = home / ".claude" / "hooks" / "codingbuddy_hooks"
+        tag = sys.implementation.cache_tag
+        modules = ("__init__", "mode_detect", "latency", "profiling", "session_state", "agent_index", "skill_index",
+                   "checklist_index", "tokenizer", "budget")
+        for name in modules:
+            header = (package_dir / "__pycache__" / f"{name}.{tag}.pyc").read_bytes()[:16]
+            # Flags word: bit 0 hash-based, bit 1 check_source
+            assert int.from_bytes(header[4:8], "little") == 0b11
+
+    def test_no_op_prompt_stays_within_budget(self, home):
+        launcher = home / ".claude" / "hooks" / "codingbuddy-mode-detect.py"
+
+        result = _run([str(launcher)], home, json.dumps({"prompt": "please fix the build"}))
+
+        assert result.returncode == 0
+        assert result.stdout == ""
+        report = _import_report(result.stderr)
+        assert "codingbuddy_hooks.mode_detect" in report
+        assert not MODE_DETECT_FORBIDDEN & report.keys()
+        assert _package_self_us(report) < PACKAGE_IMPORT_BUDGET_US
+
+    def test_detects_mode_without_site(self, home):
+        launcher = home / ".claude" / "hooks" / "codingbuddy-mode-detect.py"
+
+        result = _run([str(launcher)], home, json.dumps({"prompt": "PLAN: design the API"}))
+
+        assert "MODE_KEYWORD_DETECTED: PLAN" in result.stdout
+
+
+class TestSessionStartStartup:
+    """The plugin's SessionStart launcher."""
+
+    def test_fast_path_stays_within_budget(self, home):
+        result = _run([str(HOOKS_DIR / "session-start.py")], home)
+
+        assert result.returncode == 0
+        assert result.stdout == ""
+        report = _import_report(result.stderr)
+        assert "codingbuddy_hooks.install_stamp" in report
+        assert not SESSION_START_FORBIDDEN & report.keys()
+        assert _package_self_us(report) < PACKAGE_IMPORT_BUDGET_US
+
+    def test_fast_path_skips_latency_recorder_when_disabled(self, home):
+        result = subprocess.run(
+            [sys.executable, "-I", "-S", "-X", "importtime", str(HOOKS_DIR / "session-start.py")],
+            capture_output=True, text=True,
+            env={**os.environ, "HOME": str(home), "CODINGBUDDY_LATENCY": "0"},
+        )
+
+        report = _import_report(result.stderr)
+        assert "codingbuddy_hooks.latency" not in report
+        assert "mmap" not in report
+
+    def test_background_install_stays_within_budget(self, home):
+        (home / ".claude" / "settings.json").write_text("{}")
+
+        result = subprocess.run(
+            [sys.executable, "-I", "-S", "-X", "importtime", str(HOOKS_DIR / "session-start.py")],
+            capture_output=True, text=True,
+            env={**os.environ, "HOME": str(home), "CLAUDE_PLUGIN_DIR": str(PLUGIN_DIR),
+                 "CODINGBUDDY_INSTALL": "background"},
+        )
+
+        assert result.returncode == 0
+        assert result.stdout == ""
+        report = _import_report(result.stderr)
+        assert not (SESSION_START_FORBIDDEN | {"subprocess", "codingbuddy_hooks.session_start"}) & report.keys()
+
+    def test_stale_install_takes_slow_path(self, home):
+        (home / ".claude" / "settings.json").write_text("{}")
+
+        result = _run([str(HOOKS_DIR / "session-start.py")], home)
+
+        assert "codingbuddy_hooks.session_start" in _import_report(result.stderr)
+        settings = json.loads((home / ".claude" / "settings.json").read_text())
+        assert settings["hooks"]["UserPromptSubmit"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
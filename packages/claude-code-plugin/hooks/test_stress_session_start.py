@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Unit tests for stress_session_start.py
+
+Run with: python3 -m pytest test_stress_session_start.py -v
+"""
+
+import json
+
+import pytest
+
+import stress_session_start
+from codingbuddy_hooks import session_start
+
+
+class TestStress:
+    """Tests for the concurrent session start harness."""
+
+    def test_parallel_session_starts_install_once(self, tmp_path):
+        result = stress_session_start.run_round(8, tmp_path)
+
+        assert result["problems"] == []
+        assert result["installs"] == 1
+
+    def test_detects_duplicate_entries(self, tmp_path):
+        stress_session_start.run_round(2, tmp_path)
+        settings_file = tmp_path / ".claude" / "settings.json"
+        settings = json.loads(settings_file.read_text())
+        settings["hooks"]["UserPromptSubmit"].append(
+            {"hooks": [{"type": "command", "command": session_start.HOOK_COMMAND}]}
+        )
+        settings_file.write_text(json.dumps(settings))
+
+        problems = stress_session_start.check_home(tmp_path)
+
+        assert any("expected one UserPromptSubmit entry" in problem for problem in problems)
+        assert "install stamp is not current" in problems
+
+    def test_cli(self, capsys):
+        assert stress_session_start.main(["--sessions", "3", "--rounds", "1"]) == 0
+
+        assert "round 1: 3 sessions" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -5,16 +5,25 @@ Unit tests for user-prompt-submit.py
 Run with: python3 -m pytest test_user_prompt_submit.py -v
 """
 
+import io
 import json
+import os
+import shutil
+import socket
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 from pathlib import Path
+from typing import Optional
+
+import pytest
+from unittest.mock import patch
 
 # Import the module under test
 import importlib.util
-spec = importlib.util.spec_from_file_location("hook", Path(__file__).parent / "user-prompt-submit.py")
-hook = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(hook)
+from codingbuddy_hooks import mode_detect as hook
 
 
 class TestDetectMode:
@@ -111,6 +120,83 @@ class TestDetectMode:
     def test_handles_mixed_case(self):
         assert hook.detect_mode("Plan: mixed case") == "PLAN"
 
+    def test_returns_none_for_keyword_only(self):
+        assert hook.detect_mode("PLAN   ") is None
+
+    def test_returns_none_for_keyword_prefix_of_word(self):
+        assert hook.detect_mode("PLANNING: next sprint") is None
+
+    # Full-width / NFKC-equivalent input (CJK IMEs)
+    def test_detects_full_width_keyword_and_colon(self):
+        assert hook.detect_mode("ＰＬＡＮ：全角") == "PLAN"
+
+    def test_detects_full_width_colon_after_cjk_keyword(self):
+        assert hook.detect_mode("計画：テスト") == "PLAN"
+
+    def test_detects_ideographic_space(self):
+        assert hook.detect_mode("\u3000EVAL\u3000review") == "EVAL"
+
+    def test_detects_decomposed_accent(self):
+        assert hook.detect_mode("AUTOMA\u0301TICO: construir") == "AUTO"
+
+    # Bounded prefix scan
+    def test_detects_keyword_in_huge_prompt(self):
+        assert hook.detect_mode("ACT: " + "x" * 5_000_000) == "ACT"
+
+    def test_detects_keyword_after_long_leading_whitespace(self):
+        # The window starts at the first non-whitespace character, as the
+        # stripped match did
+        prompt = " \n" * hook.DETECT_WINDOW + "PLAN: far down"
+        assert hook.detect_mode(prompt) == "PLAN"
+
+    @pytest.mark.parametrize("separator", ["", ":"])
+    def test_detects_keyword_followed_by_long_whitespace(self, separator):
+        prompt = "EVAL" + " " * (hook.DETECT_WINDOW * 2) + separator + "review"
+        assert hook.detect_mode(prompt) == "EVAL"
+
+    def test_keyword_needs_text_after_long_whitespace(self):
+        assert hook.detect_mode("EVAL" + " " * (hook.DETECT_WINDOW * 2)) is None
+        assert hook.detect_mode(" " * (hook.DETECT_WINDOW * 2)) is None
+
+
+class TestKeywordTable:
+    """Tests for the keyword lookup table."""
+
+    def test_builds_normalized_table(self):
+        table = hook.build_keyword_table({"PLAN": ["Plan", "ＰＬＡＮＩＦＩＣＡＲ"]})
+        assert table == {"plan": "PLAN", "planificar": "PLAN"}
+
+    def test_rejects_keyword_shared_by_two_modes(self):
+        with pytest.raises(ValueError):
+            hook.build_keyword_table({"PLAN": ["GO"], "ACT": ["go"]})
+
+    @pytest.mark.parametrize("keyword", ["", "two words", "PLAN:", None])
+    def test_rejects_invalid_keyword(self, keyword):
+        with pytest.raises(ValueError):
+            hook.build_keyword_table({"PLAN": [keyword]})
+
+    def test_detects_custom_mode(self):
+        table = hook.build_keyword_table({"REVIEW": ["REVIEW", "검토"]})
+        assert hook.detect_mode("검토: 이 변경", table) == "REVIEW"
+        assert hook.detect_mode("PLAN: x", table) is None
+
+    def test_uses_bundle_keywords(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "rules.bundle"
+            path.write_bytes(compiler.BUNDLE_MAGIC + json.dumps({
+                "modes": {}, "rules": {}, "keywords": {"ship": "ACT"},
+            }).encode() + b"\n")
+
+            with patch.object(hook, "get_bundle_path", return_value=str(path)):
+                assert hook.detect_mode("SHIP: it") == "ACT"
+                assert hook.detect_mode("PLAN: it") is None
+
+    def test_falls_back_to_builtin_keywords(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            missing = os.path.join(tmpdir, "missing.bundle")
+            with patch.object(hook, "get_bundle_path", return_value=missing):
+                assert hook.get_keyword_table() is hook.DEFAULT_KEYWORD_TABLE
+
 
 class TestMainFunction:
     """Integration tests for the main hook function."""
@@ -124,13 +210,38 @@ class TestMainFunction:
             [sys.executable, str(hook_path)],
             input=input_data,
             capture_output=True,
-            text=True
+            text=True,
+            # Out of budget the hook would leave out the inlined context
+            env={**os.environ, "CODINGBUDDY_PROMPT_BUDGET_MS": "0"},
         )
 
         assert result.returncode == 0
         assert "<codingbuddy-mode-detected>" in result.stdout
         assert "MODE_KEYWORD_DETECTED: PLAN" in result.stdout
-        assert "MANDATORY_ACTION" in result.stdout
+        # Context is inlined from the rules bundle shipped next to the hook
+        assert "AGENT: plan-mode" in result.stdout
+        assert '<rule path="rules/core.md">' in result.stdout
+
+    def test_incomplete_package_gives_no_output(self, tmp_path):
+        """Test that a launcher next to an incomplete package stays silent."""
+        hooks_dir = Path(__file__).parent
+        launcher = tmp_path / "codingbuddy-mode-detect.py"
+        shutil.copy(hooks_dir / "user-prompt-submit.py", launcher)
+        # As the old manual installation instructions copied it: no budget.py
+        (tmp_path / "codingbuddy_hooks").mkdir()
+        for name in ("__init__.py", "mode_detect.py", "latency.py", "profiling.py"):
+            shutil.copy(hooks_dir / "codingbuddy_hooks" / name, tmp_path / "codingbuddy_hooks" / name)
+
+        result = subprocess.run(
+            [sys.executable, "-I", "-S", str(launcher)],
+            input=json.dumps({"prompt": "PLAN: test feature"}),
+            capture_output=True,
+            text=True
+        )
+
+        assert result.returncode == 0
+        assert result.stdout == ""
+        assert result.stderr == ""
 
     def test_no_output_when_no_keyword(self):
         """Test that no output when no keyword is detected."""
@@ -177,6 +288,555 @@ class TestMainFunction:
         assert result.stdout == ""
 
 
+class TestReadPayload:
+    """Tests for the streaming read_payload function."""
+
+    def _read(self, raw: str, limit: int = 8, chunk: int = 3) -> dict:
+        original = hook.READ_CHUNK_CHARS
+        hook.READ_CHUNK_CHARS = chunk
+        try:
+            return hook.read_payload(io.StringIO(raw), limit)
+        finally:
+            hook.READ_CHUNK_CHARS = original
+
+    def test_truncates_prompt_to_limit(self):
+        raw = json.dumps({"prompt": "PLAN: " + "x" * 100})
+        assert self._read(raw)["prompt"] == "PLAN: xx"
+
+    def test_keeps_keys_after_prompt(self):
+        raw = json.dumps({"prompt": "a" * 100, "session_id": "abc", "n": 12345})
+        result = self._read(raw)
+        assert result == {"prompt": "a" * 8, "session_id": "abc", "n": 12345}
+
+    def test_decodes_escapes_in_head(self):
+        raw = json.dumps({"prompt": 'a\n"\\\tb' + "c" * 100})
+        assert self._read(raw)["prompt"] == 'a\n"\\\tbcc'
+
+    def test_decodes_unicode_escapes_and_surrogate_pairs(self):
+        prompt = "계획😀😀😀😀😀😀😀😀😀"
+        raw = json.dumps({"prompt": prompt}, ensure_ascii=True)
+        assert self._read(raw, limit=4)["prompt"] == prompt[:4]
+
+    def test_never_splits_surrogate_pair_at_limit(self):
+        prompt = "😀" * 50
+        raw = json.dumps({"prompt": prompt}, ensure_ascii=True)
+        for limit in range(6):
+            assert self._read(raw, limit=limit)["prompt"] == prompt[:limit]
+
+    def test_skips_escaped_quotes_across_chunks(self):
+        prompt = 'x' * 200 + '\\"' * 50 + '\\' * 7
+        raw = json.dumps({"prompt": prompt, "cwd": "/tmp"})
+        for chunk in (1, 2, 5, 64):
+            assert self._read(raw, chunk=chunk) == {"prompt": "x" * 8, "cwd": "/tmp"}
+
+    def test_matches_full_parse_for_nested_values(self):
+        payload = {"a": {"b": [1, 2.5, None]}, "prompt": "EVAL: x" * 20, "c": True}
+        result = self._read(json.dumps(payload, indent=2))
+        assert result == {**payload, "prompt": payload["prompt"][:8]}
+
+    def test_falls_back_for_non_object_payload(self):
+        assert self._read('["prompt"]') == ["prompt"]
+
+    def test_raises_for_invalid_json(self):
+        with pytest.raises(json.JSONDecodeError):
+            self._read("not valid json")
+
+    def test_raises_for_truncated_prompt(self):
+        raw = json.dumps({"prompt": "x" * 1000})[:-10]
+        with pytest.raises(json.JSONDecodeError):
+            self._read(raw)
+
+    def test_raises_for_trailing_data(self):
+        with pytest.raises(json.JSONDecodeError):
+            self._read(json.dumps({"prompt": "x" * 1000}) + " extra")
+
+    def test_huge_prompt_is_not_decoded(self):
+        raw = json.dumps({"prompt": "ACT: " + "log line\n" * 500_000, "cwd": "/x"})
+        result = hook.read_payload(io.StringIO(raw))
+        assert len(result["prompt"]) == hook.PROMPT_HEAD_CHARS
+        assert result["cwd"] == "/x"
+
+
+class TestProcessInput:
+    """Tests for process_input function."""
+
+    def test_returns_context_for_detected_mode(self):
+        stream = io.StringIO(json.dumps({"prompt": "EVAL: review"}))
+        output = hook.process_input(stream)
+        assert "MODE_KEYWORD_DETECTED: EVAL" in output
+
+    def test_returns_empty_string_without_keyword(self):
+        stream = io.StringIO(json.dumps({"prompt": "Hello"}))
+        assert hook.process_input(stream) == ""
+
+    def test_follow_up_prompt_keeps_session_mode(self):
+        hook.process_input(io.StringIO(json.dumps({"prompt": "PLAN: design", "session_id": "s1"})))
+        hook.process_input(io.StringIO(json.dumps({"prompt": "continue", "session_id": "s1"})))
+
+        output = hook.process_input(io.StringIO(json.dumps({"prompt": "go on", "session_id": "s1"})))
+
+        assert "ACTIVE_MODE: PLAN" in output
+        assert "2 prompt(s) ago" in output
+
+    def test_new_keyword_replaces_session_mode(self):
+        hook.process_input(io.StringIO(json.dumps({"prompt": "PLAN: design", "session_id": "s1"})))
+        output = hook.process_input(io.StringIO(json.dumps({"prompt": "ACT: build", "session_id": "s1"})))
+
+        assert "MODE_KEYWORD_DETECTED: ACT" in output
+        assert "ACTIVE_MODE: ACT" in hook.process_input(
+            io.StringIO(json.dumps({"prompt": "continue", "session_id": "s1"}))
+        )
+
+    def test_sessions_are_independent(self):
+        hook.process_input(io.StringIO(json.dumps({"prompt": "PLAN: design", "session_id": "s1"})))
+        assert hook.process_input(io.StringIO(json.dumps({"prompt": "continue", "session_id": "s2"}))) == ""
+
+    def test_repeated_mode_gets_compact_context(self):
+        full = hook.process_input(io.StringIO(json.dumps({"prompt": "PLAN: design", "session_id": "s1"})))
+        repeat = hook.process_input(io.StringIO(json.dumps({"prompt": "PLAN: again", "session_id": "s1"})))
+
+        assert repeat == hook.build_context("PLAN", variant="compact")
+        assert len(repeat) < len(full)
+        # Switching modes sends the new mode in full
+        assert hook.process_input(
+            io.StringIO(json.dumps({"prompt": "ACT: build", "session_id": "s1"}))
+        ) == hook.build_context("ACT")
+
+    def test_full_context_is_resent_periodically(self):
+        outputs = [
+            hook.process_input(io.StringIO(json.dumps({"prompt": "EVAL: check", "session_id": "s1"})))
+            for _ in range(hook.FULL_CONTEXT_EVERY + 1)
+        ]
+
+        full = hook.build_context("EVAL")
+        assert outputs[0] == full
+        assert outputs[-1] == full
+        assert full not in outputs[1:-1]
+
+    def test_full_context_policy(self):
+        with patch.dict(os.environ, {hook.CONTEXT_ENV: "full"}):
+            for _ in range(2):
+                output = hook.process_input(io.StringIO(json.dumps({"prompt": "PLAN: x", "session_id": "s1"})))
+                assert output == hook.build_context("PLAN")
+
+    def test_session_store_can_be_disabled(self):
+        with patch.dict(os.environ, {"CODINGBUDDY_SESSION_STATE": "0"}):
+            hook.process_input(io.StringIO(json.dumps({"prompt": "PLAN: design", "session_id": "s1"})))
+            assert hook.process_input(io.StringIO(json.dumps({"prompt": "continue", "session_id": "s1"}))) == ""
+
+
+_compiler_spec = importlib.util.spec_from_file_location(
+    "compile_rules_bundle", Path(__file__).parent / "compile-rules-bundle.py"
+)
+compiler = importlib.util.module_from_spec(_compiler_spec)
+_compiler_spec.loader.exec_module(compiler)
+
+
+def _write_bundle(
+    path: Path, instructions: str = "Design first", agents: Optional[dict] = None, skills: Optional[dict] = None
+) -> Path:
+    """Compile a small rules bundle to path, with agents/*.json and skills/*/SKILL.md."""
+    rules_dir = path.parent / "rules-src"
+    (rules_dir / "rules").mkdir(parents=True, exist_ok=True)
+    for name, agent in (agents or {}).items():
+        (rules_dir / "agents").mkdir(exist_ok=True)
+        (rules_dir / "agents" / f"{name}.json").write_text(json.dumps(agent), encoding="utf-8")
+    for name, description in (skills or {}).items():
+        (rules_dir / "skills" / name).mkdir(parents=True, exist_ok=True)
+        (rules_dir / "skills" / name / "SKILL.md").write_text(
+            f"---\nname: {name}\ndescription: {description}\n---\n", encoding="utf-8"
+        )
+    (rules_dir / "rules" / "core.md").write_text("# Core {rules}\n", encoding="utf-8")
+    (rules_dir / "keyword-modes.json").write_text(json.dumps({"modes": {
+        "PLAN": {
+            "description": "Planning",
+            "instructions": instructions,
+            "rules": ["rules/core.md"],
+            "agent": "plan-mode",
+            "delegates_to": "frontend-developer",
+            "defaultSpecialists": ["architecture-specialist", "test-strategy-specialist"],
+        },
+        "ACT": {"rules": ["rules/core.md"], "agent": "act-mode", "delegates_to": "frontend-developer"},
+    }}), encoding="utf-8")
+    path.write_bytes(compiler.compile_bundle(rules_dir, "9.9.9"))
+    return path
+
+
+class TestRulesBundle:
+    """Tests for inlining mode context from the compiled rules bundle."""
+
+    def test_inlines_mode_context(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bundle = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "rules.bundle")))
+
+            context = hook.build_context("PLAN", bundle)
+
+            assert "MODE_KEYWORD_DETECTED: PLAN" in context
+            assert "rules bundle 9.9.9" in context
+            assert "INSTRUCTIONS: Design first" in context
+            assert "AGENT: plan-mode" in context
+            assert "DEFAULT_SPECIALISTS: architecture-specialist, test-strategy-specialist" in context
+            assert '<rule path="rules/core.md">\n# Core {rules}\n</rule>' in context
+            assert "MANDATORY_ACTION" not in context
+
+    def test_falls_back_to_parse_mode_for_unknown_mode(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bundle = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "rules.bundle")))
+            assert hook.build_context("EVAL", bundle) == hook.CONTEXT_TEMPLATE.format(mode="EVAL")
+
+    def test_missing_bundle_falls_back_to_parse_mode(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            missing = os.path.join(tmpdir, "missing.bundle")
+            with patch.object(hook, "get_bundle_path", return_value=missing):
+                assert hook.build_context("PLAN") == hook.CONTEXT_TEMPLATE.format(mode="PLAN")
+
+    @pytest.mark.parametrize("data", [
+        b"",
+        b"not a bundle",
+        b"codingbuddy-rules 1\n{broken",
+        b"codingbuddy-rules 1\n{}\n",
+        b"codingbuddy-rules 99\n{}\n",
+    ])
+    def test_unusable_bundle_is_ignored(self, data):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "rules.bundle"
+            path.write_bytes(data)
+            assert hook.load_rules_bundle(str(path)) is None
+
+    def test_out_of_range_context_falls_back(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = _write_bundle(Path(tmpdir) / "rules.bundle")
+            # Cut into the last mode's full context, which precedes its compact one
+            compact = hook.render_compact_context("ACT").encode("utf-8")
+            path.write_bytes(path.read_bytes()[:-(len(compact) + 3)])
+
+            bundle = hook.load_rules_bundle(str(path))
+
+            assert hook.build_context("ACT", bundle) == hook.CONTEXT_TEMPLATE.format(mode="ACT")
+
+    def test_renders_bundle_without_precomputed_contexts(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = _write_bundle(Path(tmpdir) / "rules.bundle")
+            data = path.read_bytes()
+            header_end = data.index(b"\n", len(compiler.BUNDLE_MAGIC))
+            header = json.loads(data[len(compiler.BUNDLE_MAGIC):header_end])
+            expected = hook.build_context("PLAN", hook.load_rules_bundle(str(path)))
+            del header["contexts"]
+            path.write_bytes(compiler.BUNDLE_MAGIC + json.dumps(header).encode() + data[header_end:])
+
+            assert hook.build_context("PLAN", hook.load_rules_bundle(str(path))) == expected
+
+    CORE = "## Core Rules\nCommon\n### Plan Mode\nPlan\n### Act Mode\nAct\n### Eval Mode\nEval\n### Communication Rules\nTalk\n"
+
+    @pytest.mark.parametrize("mode, kept, dropped", [
+        ("PLAN", ["Common", "Plan"], ["Act", "Eval", "Talk"]),
+        ("ACT", ["Common", "Act"], ["Plan\n", "Eval", "Talk"]),
+        ("EVAL", ["Common", "Eval"], ["Plan\n", "Act", "Talk"]),
+    ])
+    def test_filters_core_rules_by_mode(self, mode, kept, dropped):
+        filtered = hook.filter_rule(mode, "rules/core.md", self.CORE)
+
+        assert all(text in filtered for text in kept)
+        assert not any(text in filtered for text in dropped)
+        assert filtered.endswith(f"filtered view for {mode} mode. Full rules available in core.md -->")
+
+    def test_auto_mode_and_other_rules_are_not_filtered(self):
+        assert hook.filter_rule("AUTO", "rules/core.md", self.CORE) == self.CORE
+        assert hook.filter_rule("PLAN", "rules/project.md", self.CORE) == self.CORE
+        # Without its own section core.md is kept whole
+        assert hook.filter_rule("PLAN", "rules/core.md", "# Core\n") == "# Core\n"
+
+    def test_compact_variant(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bundle = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "rules.bundle")))
+
+            compact = hook.build_context("PLAN", bundle, variant="compact")
+
+            assert compact == hook.render_compact_context("PLAN")
+            assert len(compact) < len(hook.build_context("PLAN", bundle))
+            assert hook.build_context("EVAL", bundle, variant="compact") == hook.render_compact_context("EVAL")
+
+    def test_reloads_rebuilt_bundle(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = _write_bundle(Path(tmpdir) / "rules.bundle")
+            first = hook.load_rules_bundle(str(path))
+            assert hook.load_rules_bundle(str(path)) is first
+
+            _write_bundle(path, instructions="Design twice, build once")
+            second = hook.load_rules_bundle(str(path))
+
+            assert second is not first
+            assert "Design twice, build once" in hook.build_context("PLAN", second)
+
+
+AGENTS = {
+    "frontend-developer": {"role": {"type": "primary", "expertise": ["React components", "CSS"]}},
+    "backend-developer": {"role": {"type": "primary", "expertise": ["GraphQL endpoints", "Auth"]}},
+    "code-reviewer": {"role": {"type": "utility", "expertise": ["GraphQL review"]}},
+}
+
+
+class TestRecommendAgent:
+    """Tests for the primary agent recommendation from the bundled agent index."""
+
+    @pytest.fixture
+    def bundle(self, tmp_path):
+        return hook.load_rules_bundle(str(_write_bundle(tmp_path / "rules.bundle", agents=AGENTS)))
+
+    def test_recommends_best_matching_agent(self, bundle, tmp_path):
+        recommendation = hook.recommend_agent("ACT", "ACT: add a GraphQL endpoint", bundle, str(tmp_path))
+
+        assert "SUGGESTED_PRIMARY_AGENT: backend-developer" in recommendation
+        assert "MATCHED_TERMS: endpoint, graphql" in recommendation
+
+    def test_no_recommendation_without_match_or_index(self, bundle, tmp_path):
+        assert hook.recommend_agent("ACT", "ACT: fix the build", bundle, str(tmp_path)) == ""
+
+        bare = hook.load_rules_bundle(str(_write_bundle(tmp_path / "bare" / "rules.bundle")))
+        assert hook.recommend_agent("ACT", "ACT: GraphQL endpoint", bare, str(tmp_path)) == ""
+
+    def test_only_act_and_auto_get_recommendations(self, bundle, tmp_path):
+        # parse_mode limits PLAN to the planning agents and EVAL to code-reviewer
+        assert hook.recommend_agent("PLAN", "PLAN: GraphQL endpoint", bundle, str(tmp_path)) == ""
+        assert hook.recommend_agent("EVAL", "EVAL: GraphQL endpoint", bundle, str(tmp_path)) == ""
+
+    @pytest.mark.parametrize("filename, content", [
+        ("codingbuddy.config.json", {"ai": {"primaryAgent": "frontend-developer"}}),
+        ("codingbuddy.config.json", {"ai": {"excludeAgents": ["mobile-developer"]}}),
+        ("codingbuddy.config.js", "module.exports = { ai: { excludeAgents: ['mobile-developer'] } };\n"),
+    ])
+    def test_no_recommendation_when_project_config_picks_agents(self, bundle, tmp_path, filename, content):
+        (tmp_path / filename).write_text(content if isinstance(content, str) else json.dumps(content))
+        cwd = tmp_path / "packages" / "api"
+        cwd.mkdir(parents=True)
+
+        assert hook.recommend_agent("ACT", "ACT: GraphQL endpoint", bundle, str(cwd)) == ""
+
+    def test_unrelated_project_config_keeps_recommendation(self, bundle, tmp_path):
+        (tmp_path / "codingbuddy.config.json").write_text(json.dumps({"ai": {"defaultModel": "x"}, "language": "ko"}))
+
+        assert hook.recommend_agent("ACT", "ACT: GraphQL endpoint", bundle, str(tmp_path)) != ""
+
+    def test_corrupt_index_is_ignored(self, tmp_path):
+        path = _write_bundle(tmp_path / "rules.bundle", agents=AGENTS)
+        path.write_bytes(path.read_bytes()[:-10])
+
+        bundle = hook.load_rules_bundle(str(path))
+
+        assert hook.recommend_agent("ACT", "ACT: GraphQL endpoint", bundle, str(tmp_path)) == ""
+
+    def test_process_input_appends_recommendation(self, tmp_path):
+        path = _write_bundle(tmp_path / "rules.bundle", agents=AGENTS)
+        payload = json.dumps({"prompt": "ACT: React components", "cwd": str(tmp_path)})
+        with patch.object(hook, "get_bundle_path", return_value=str(path)):
+            output = hook.process_input(io.StringIO(payload))
+
+        context, recommendation = output.split("\n<codingbuddy-primary-agent>\n")
+        assert "MODE_KEYWORD_DETECTED: ACT" in context
+        assert recommendation.startswith("SUGGESTED_PRIMARY_AGENT: frontend-developer\n")
+
+
+def _query(socket_path: str, payload: bytes) -> bytes:
+    """Send one payload to the daemon and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(payload)
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+class TestDaemon:
+    """Tests for the resident mode detection daemon."""
+
+    def _start(self, socket_path: str, idle_timeout: float = 5.0) -> threading.Thread:
+        thread = threading.Thread(
+            target=hook.serve, args=(socket_path, idle_timeout), daemon=True
+        )
+        thread.start()
+        for _ in range(100):
+            if hook._is_socket_alive(socket_path):
+                break
+            time.sleep(0.01)
+        return thread
+
+    def test_replies_with_context_for_mode_prompt(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = os.path.join(tmpdir, "d.sock")
+            self._start(socket_path)
+
+            reply = _query(socket_path, json.dumps({"prompt": "ACT: go"}).encode())
+
+            assert "MODE_KEYWORD_DETECTED: ACT" in reply.decode()
+
+    def test_replies_empty_for_invalid_json(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = os.path.join(tmpdir, "d.sock")
+            self._start(socket_path)
+
+            assert _query(socket_path, b"not valid json") == b""
+
+    def test_exits_and_removes_socket_when_idle(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = os.path.join(tmpdir, "d.sock")
+            thread = self._start(socket_path, idle_timeout=0.1)
+
+            thread.join(timeout=5)
+
+            assert not thread.is_alive()
+            assert not os.path.exists(socket_path)
+
+    @pytest.mark.parametrize("replaced", ["mode_detect.py", "budget.py", "../codingbuddy-rules.bundle"])
+    def test_restarts_when_package_or_bundle_is_replaced(self, replaced):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = os.path.join(tmpdir, "d.sock")
+            package_dir = Path(tmpdir) / "codingbuddy_hooks"
+            package_dir.mkdir()
+            for name in ("mode_detect.py", "budget.py", "../codingbuddy-rules.bundle"):
+                (package_dir / name).write_text("# v1")
+            launcher = Path(tmpdir) / "hook.py"
+            restarted = []
+
+            with patch.object(hook, "__file__", str(package_dir / "mode_detect.py")), \
+                    patch.object(sys, "argv", [str(launcher), "--daemon"]), \
+                    patch.object(hook, "_restart_daemon", side_effect=lambda *a: restarted.append(a)):
+                thread = self._start(socket_path)
+                _query(socket_path, json.dumps({"prompt": "PLAN: x"}).encode())
+                time.sleep(0.05)
+                (package_dir / replaced).write_text("# v2 - upgraded")
+                reply = _query(socket_path, json.dumps({"prompt": "PLAN: x"}).encode())
+                thread.join(timeout=5)
+
+            # The request that noticed the upgrade is still answered
+            assert "MODE_KEYWORD_DETECTED: PLAN" in reply.decode()
+
+            assert not thread.is_alive()
+            assert restarted == [(str(launcher), socket_path)]
+
+    def test_replaces_stale_socket_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            socket_path = os.path.join(tmpdir, "d.sock")
+            stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stale.bind(socket_path)
+            stale.close()
+
+            self._start(socket_path)
+
+            reply = _query(socket_path, json.dumps({"prompt": "PLAN: x"}).encode())
+            assert "MODE_KEYWORD_DETECTED: PLAN" in reply.decode()
+
+
+SKILLS = {
+    "refactoring": "Use when improving code structure without changing behavior, cleaning up technical debt",
+    "writing-plans": "Use when you have a spec or requirements for a multi-step task",
+}
+
+
+class TestSuggestSkills:
+    """Tests for the skill suggestions from the bundled skill index."""
+
+    def test_suggests_matching_skills(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bundle = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "rules.bundle", skills=SKILLS)))
+
+            suggestions = hook.suggest_skills("ACT: clean up the technical debt", bundle)
+
+            assert suggestions.startswith("<codingbuddy-skills>\nSUGGESTED_SKILLS: refactoring (")
+
+    def test_mode_keyword_is_not_matched(self):
+        skills = {"writing-plans": "Plan plan plan: write a plan"}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bundle = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "rules.bundle", skills=skills)))
+
+            assert hook.suggest_skills("PLAN: write", bundle) == ""
+            assert "writing-plans" in hook.suggest_skills("write a plan", bundle)
+
+    @pytest.mark.parametrize("prompt, rest", [
+        ("PLAN: write a plan", " write a plan"),
+        ("  계획: 플랜 작성", " 플랜 작성"),
+        ("ＰＬＡＮ：write a plan", "write a plan"),
+        ("ＰＬＡＮ　write a plan", "write a plan"),
+        ("planning is hard", "planning is hard"),
+        ("ＰＬＡＮＮＩＮＧ： a plan", "ＰＬＡＮＮＩＮＧ： a plan"),
+    ])
+    def test_strip_keyword(self, prompt, rest):
+        assert hook.strip_keyword(prompt) == rest
+
+    def test_full_width_mode_keyword_is_not_matched(self):
+        skills = {"writing-plans": "Plan plan plan: write a plan"}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bundle = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "rules.bundle", skills=skills)))
+
+            assert hook.suggest_skills("ＰＬＡＮ：write", bundle) == ""
+
+    def test_no_suggestions_without_index_or_match(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bundle = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "rules.bundle", skills=SKILLS)))
+            assert hook.suggest_skills("PLAN: design the login form", bundle) == ""
+
+            bare = hook.load_rules_bundle(str(_write_bundle(Path(tmpdir) / "bare" / "rules.bundle")))
+            assert hook.suggest_skills("ACT: clean up the technical debt", bare) == ""
+
+    def test_corrupt_index_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = _write_bundle(Path(tmpdir) / "rules.bundle", skills=SKILLS)
+            path.write_bytes(path.read_bytes()[:-10])
+
+            bundle = hook.load_rules_bundle(str(path))
+
+            assert hook.suggest_skills("ACT: clean up the technical debt", bundle) == ""
+
+    def test_process_input_appends_suggestions_last(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = _write_bundle(Path(tmpdir) / "rules.bundle", agents=AGENTS, skills=SKILLS)
+            prompt = "ACT: clean up the technical debt in the React components"
+            with patch.object(hook, "get_bundle_path", return_value=str(path)):
+                output = hook.process_input(io.StringIO(json.dumps({"prompt": prompt, "cwd": tmpdir})))
+
+            assert output.index("<codingbuddy-primary-agent>") < output.index("<codingbuddy-skills>")
+            assert output.endswith("</codingbuddy-skills>")
+
+
+class TestSelectChecklist:
+    """Tests for the checklist items pre-selected from the committed bundle."""
+
+    @pytest.fixture
+    def bundle(self):
+        bundle = hook.load_rules_bundle(str(Path(__file__).parent / hook.BUNDLE_FILENAME))
+        if bundle is None or bundle.checklist_index() is None:
+            pytest.skip("committed bundle has no checklist index")
+        return bundle
+
+    def test_selects_items_for_eval(self, bundle):
+        block = hook.select_checklist("EVAL", "EVAL: check the auth flow for N+1 queries", bundle)
+
+        assert block.startswith(
+            "<codingbuddy-checklist>\nCHECKLIST_DOMAINS: security, performance, testing\n"
+            "MATCHED_TERMS: auth, n+1, query\n"
+        )
+        assert "sec-auth-001" in block and "perf-data-001" in block
+
+    def test_other_modes_and_unmatched_prompts_get_nothing(self, bundle):
+        assert hook.select_checklist("ACT", "ACT: fix the auth flow", bundle) == ""
+        assert hook.select_checklist("EVAL", "EVAL: how did it go?", bundle) == ""
+
+    def test_corrupt_index_is_ignored(self, bundle):
+        with patch.object(bundle, "checklist_index", side_effect=ValueError):
+            assert hook.select_checklist("EVAL", "EVAL: check the auth flow", bundle) == ""
+
+    def test_process_input_appends_checklist_last(self, bundle):
+        prompt = "EVAL: check the auth flow for N+1 queries"
+        with patch.object(hook, "load_rules_bundle", return_value=bundle):
+            output = hook.process_input(io.StringIO(json.dumps({"prompt": prompt})))
+
+        assert output.index("</codingbuddy-mode-detected>") < output.index("<codingbuddy-checklist>")
+        assert output.endswith("</codingbuddy-checklist>")
+
+
 if __name__ == "__main__":
     import pytest
     pytest.main([__file__, "-v"])
@@ -4,7 +4,8 @@
  *
  * Orchestrates the plugin build process:
  * 1. Sync version from MCP server
- * 2. Generate README
+ * 2. Compile the rules bundle used by the mode detection hook
+ * 3. Generate README
  *
  * Note: Agents, commands, and skills are NOT generated here.
  * They live in packages/rules/.ai-rules/ (single source of truth).
@@ -16,6 +17,7 @@
 
 import * as path from 'path';
 import * as fs from 'fs';
+import { execFileSync } from 'child_process';
 
 // Import utilities
 import { getErrorMessage } from '../src/utils';
@@ -86,6 +88,30 @@ function syncVersion(): BuildResult {
   return result;
 }
 
+function compileRulesBundle(): BuildResult {
+  const result: BuildResult = {
+    step: 'Rules Bundle',
+    success: true,
+    details: [],
+    errors: [],
+  };
+
+  try {
+    // keyword-modes.json + referenced rules → hooks/codingbuddy-rules.bundle
+    const output = execFileSync(
+      'python3',
+      [path.join(ROOT_DIR, 'hooks', 'compile-rules-bundle.py')],
+      { encoding: 'utf8' },
+    );
+    result.details.push(output.trim());
+  } catch (error) {
+    result.success = false;
+    result.errors.push(getErrorMessage(error));
+  }
+
+  return result;
+}
+
 function createReadme(): BuildResult {
   const result: BuildResult = {
     step: 'README Generation',
@@ -205,8 +231,12 @@ async function main(): Promise<void> {
   console.log('📦 Step 1: Syncing version...');
   results.push(syncVersion());
 
-  // Step 2: Generate README
-  console.log('📖 Step 2: Generating README...');
+  // Step 2: Compile rules bundle
+  console.log('📚 Step 2: Compiling rules bundle...');
+  results.push(compileRulesBundle());
+
+  // Step 3: Generate README
+  console.log('📖 Step 3: Generating README...');
   results.push(createReadme());
 
   // Summary
@@ -237,6 +267,7 @@ async function main(): Promise<void> {
     console.log(`\nOutput directory: ${ROOT_DIR}`);
     console.log('  ├── .claude-plugin/  (plugin manifest)');
     console.log('  ├── .mcp.json        (MCP server configuration)');
+    console.log('  ├── hooks/codingbuddy-rules.bundle (compiled mode rules)');
     console.log('  └── README.md        (plugin documentation)');
     console.log(
       '\nNote: Agents, commands, and skills are provided by MCP server',
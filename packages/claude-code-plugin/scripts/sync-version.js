@@ -18,6 +18,13 @@ const PLUGIN_MANIFEST_PATH = path.resolve(
   __dirname,
   '../.claude-plugin/plugin.json',
 );
+// Hooks carrying a HOOK_VERSION header (used by session-start.py upgrades)
+const HOOK_PATHS = [
+  path.resolve(__dirname, '../hooks/user-prompt-submit.py'),
+  path.resolve(__dirname, '../hooks/codingbuddy_hooks/__init__.py'),
+  path.resolve(__dirname, '../hooks/mode-detect-client.py'),
+];
+const HOOK_VERSION_PATTERN = /^HOOK_VERSION = "[^"]*"$/m;
 
 function syncVersion() {
   // Read MCP server version
@@ -57,6 +64,22 @@ function syncVersion() {
     console.log(`[sync-version] plugin.json already at ${version}`);
   }
 
+  // Update hook version headers
+  for (const hookPath of HOOK_PATHS) {
+    const source = fs.readFileSync(hookPath, 'utf8');
+    const updated = source.replace(
+      HOOK_VERSION_PATTERN,
+      `HOOK_VERSION = "${version}"`,
+    );
+    const hookName = path.basename(hookPath);
+    if (updated !== source) {
+      fs.writeFileSync(hookPath, updated);
+      console.log(`[sync-version] Updated ${hookName} to ${version}`);
+    } else {
+      console.log(`[sync-version] ${hookName} already at ${version}`);
+    }
+  }
+
   console.log('[sync-version] Version sync complete!');
 }
 